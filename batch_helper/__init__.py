@@ -1,5 +1,7 @@
+import re
 import time
 import json
+import asyncio
 from enum import Enum, auto
 
 import meraki
@@ -9,6 +11,10 @@ from .exceptions import *
 
 __version__ = '0.1.0a'
 
+# Errors of failed batches that name the action they belong to by its index in the batch, e.g. "Action 3: /devices/...".
+# Errors that don't, whatever their format, fail the whole batch instead of being pinned on an action
+ACTION_ERROR_PATTERN = re.compile(r'\s*action\s*#?(\d+)', re.IGNORECASE)
+
 
 class BatchHelperStatus(Enum):
     """Batch helper statuses."""
@@ -20,6 +26,100 @@ class BatchHelperStatus(Enum):
     FAILED = auto()
 
 
+def is_retryable(errors):
+    """ Whether every one of the errors of an action may go away if the action is submitted again. """
+    return all(any(fragment in error.lower() for fragment in RETRYABLE_ACTION_ERRORS) for error in errors)
+
+
+class AdaptivePoller:
+    """Decides how long to wait between batch queue polls.
+
+    Learns how many seconds each action takes from the batches of the current run. A batch is taken to have completed
+    halfway between the last poll that saw it pending and the first that didn't, so the estimate can shrink as well as
+    grow. The next poll is timed for the predicted completion of the earliest active batch, and the interval doubles
+    for every poll that finds no batch finished, between MINIMUM_POLL_INTERVAL and MAXIMUM_POLL_INTERVAL.
+    """
+
+    def __init__(self,
+                 seconds_per_action: float = MINIMUM_INTERVAL_FACTOR,
+                 minimum_interval: float = MINIMUM_POLL_INTERVAL,
+                 maximum_interval: float = MAXIMUM_POLL_INTERVAL,
+                 learning_rate: float = POLL_LEARNING_RATE):
+        """ Creates the poller.
+        @param seconds_per_action: initial estimate of the seconds each action takes, until a batch has completed
+        @param minimum_interval: shortest wait between polls, in seconds
+        @param maximum_interval: longest wait between polls, in seconds
+        @param learning_rate: weight of the latest completed batch in the estimate, between 0 and 1
+        """
+        self.seconds_per_action = seconds_per_action
+        self.minimum_interval = minimum_interval
+        self.maximum_interval = maximum_interval
+        self.learning_rate = learning_rate
+        # batch ID: [submission time, number of actions, time it was last seen pending]
+        self.submitted_batches = dict()
+        self.learned_batches = 0
+        self.misses = 0
+
+    def submitted(self, batch_id, number_of_actions):
+        """ Starts timing a batch that was just submitted. """
+        now = time.monotonic()
+        self.submitted_batches[batch_id] = [now, number_of_actions, now]
+        self.misses = 0
+
+    def completed(self, batch_id):
+        """ Learns from a timed batch that was just seen complete. """
+        if batch_id not in self.submitted_batches:
+            return
+        submitted_at, number_of_actions, last_pending = self.submitted_batches.pop(batch_id)
+        finished_at = (last_pending + time.monotonic()) / 2
+        observed = (finished_at - submitted_at) / max(number_of_actions, 1)
+        if self.learned_batches == 0:
+            self.seconds_per_action = observed
+        else:
+            self.seconds_per_action += self.learning_rate * (observed - self.seconds_per_action)
+        self.learned_batches += 1
+        self.misses = 0
+
+    def still_pending(self, batch_ids):
+        """ Records a poll that found the given batches still pending and nothing finished, so the next one waits
+        longer. """
+        now = time.monotonic()
+        for batch_id in batch_ids:
+            if batch_id in self.submitted_batches:
+                self.submitted_batches[batch_id][2] = now
+        self.misses += 1
+
+    def update(self, pending_batch_ids):
+        """ Learns from the timed batches that left the pending queue, and returns how many did. """
+        finished = [batch_id for batch_id in self.submitted_batches if batch_id not in pending_batch_ids]
+        for batch_id in finished:
+            self.completed(batch_id)
+        if finished:
+            # Only the ones still pending get their last seen time moved forward
+            now = time.monotonic()
+            for batch_id in pending_batch_ids:
+                if batch_id in self.submitted_batches:
+                    self.submitted_batches[batch_id][2] = now
+        else:
+            self.still_pending(pending_batch_ids)
+        return len(finished)
+
+    def predicted_wait(self, batches):
+        """ Returns the seconds until the earliest of the given action batches is predicted to complete. """
+        now = time.monotonic()
+        predictions = list()
+        for batch in batches:
+            submitted_at, number_of_actions, _ = self.submitted_batches.get(
+                batch['id'], (now, len(batch['actions']), now))
+            predictions.append(submitted_at + number_of_actions * self.seconds_per_action - now)
+        return min(predictions) if predictions else 0
+
+    def next_interval(self, batches):
+        """ Returns the seconds to wait before polling again, while the given action batches run. """
+        interval = max(self.predicted_wait(batches), self.minimum_interval * 2 ** self.misses)
+        return round(min(max(interval, self.minimum_interval), self.maximum_interval), 2)
+
+
 class BatchHelper:
 
     def __init__(self,
@@ -34,7 +134,8 @@ class BatchHelper:
                  synchronous_new_batches: bool = False,
                  actions_per_new_batch: int = MAX_ACTIONS_ASYNC,
                  interval_factor: float = MINIMUM_INTERVAL_FACTOR,
-                 maximum_wait: int = MAXIMUM_WAIT):
+                 maximum_wait: int = MAXIMUM_WAIT,
+                 maximum_action_retries: int = MAXIMUM_ACTION_RETRIES):
         """ Creates the batch helper.
         @param dashboard_session: the Meraki Python SDK dashboard session used for executing the batch
         @param organizationId: the Meraki organization ID of the relevant organization where the batch will be run
@@ -49,6 +150,7 @@ class BatchHelper:
         @param actions_per_new_batch: maximum number of actions to group into a single batch
         @param interval_factor: the factor to use for determining wait time
         @param maximum_wait: the maximum wait time in seconds for the entire list of new_actions
+        @param maximum_action_retries: how many times an action that failed with a retryable error is resubmitted
         """
 
         # self assignments
@@ -64,16 +166,28 @@ class BatchHelper:
         self.actions_per_new_batch = actions_per_new_batch
         self.interval_factor = interval_factor
         self.maximum_wait = maximum_wait
+        self.maximum_action_retries = maximum_action_retries
         self.status = BatchHelperStatus.PENDING
 
         # defaults prior to preparation
         self.preview = ''
+        self.preview_file = None
         self.new_batches = list()
         self.new_batches_responses = list()
         self.submitted_new_batches_ids = list()
         self.successful_new_batch_ids = list()
         self.failed_new_batch_ids = list()
 
+        # actions of the submitted batches whose results haven't been checked yet, by batch ID
+        self.submitted_batch_actions = dict()
+        # retries used by each action, by id() of the action, since the same action objects are resubmitted
+        self.action_retries = dict()
+        self.completed_actions = list()
+        self.failed_actions = list()
+
+        # learns how long actions take in this run, to time the polls of the batch queue
+        self.poller = AdaptivePoller(seconds_per_action=interval_factor)
+
         # Validate batch helper input against common mistakes.
         print(f'Validating input...')
 
@@ -124,17 +238,20 @@ class BatchHelper:
 
         # Add each new batch to the new_batches list
         for action_list in grouped_actions_list:
-            batch = {
-                "organizationId": self.organizationId,
-                "actions": action_list,
-                "synchronous": self.synchronous_new_batches,
-                "confirmed": self.confirmed_new_batches
-            }
-            created_batches.append(batch)
+            created_batches.append(self.new_batch(action_list))
 
         self.new_batches = created_batches
         self.status = BatchHelperStatus.PREPARED
 
+    def new_batch(self, action_list):
+        """ Returns a new batch of the given actions. """
+        return {
+            "organizationId": self.organizationId,
+            "actions": action_list,
+            "synchronous": self.synchronous_new_batches,
+            "confirmed": self.confirmed_new_batches
+        }
+
     def wait_for_required_batch(self):
         """ When the batches are dependent or linear, waits for the required batch to finish. """
 
@@ -155,6 +272,7 @@ class BatchHelper:
             if required_batch['status']['completed']:
                 # If it's complete, stop waiting
                 self.successful_new_batch_ids.append(required_batch['id'])
+                self.poller.completed(required_batch['id'])
                 completed = True
 
             if not required_batch['confirmed']:
@@ -165,6 +283,11 @@ class BatchHelper:
             # if it's started, but it's not complete, check its status on an interval
             if required_batch['confirmed'] and not required_batch['status']['completed']:
                 if required_batch['status']['failed']:
+                    if required_batch['id'] in self.submitted_batch_actions:
+                        # one of the new batches, whose actions worth another try are submitted next
+                        self.requeue_failed_batch(required_batch)
+                        return True
+
                     # if it failed, then stop waiting
                     self.status = BatchHelperStatus.FAILED
                     self.failed_new_batch_ids.append(required_batch['id'])
@@ -172,9 +295,9 @@ class BatchHelper:
                     raise RequiredBatchFailureError(self.required_batch_id,
                                                     batch_errors=required_batch['status']['errors'])
 
-                # wait a reasonable interval dependent upon the number of actions in the batch
-                length_of_required_batch_actions = len(required_batch['actions'])
-                interval = length_of_required_batch_actions * self.interval_factor
+                # wait until the batch is predicted to complete, longer the later it runs
+                self.poller.still_pending([required_batch['id']])
+                interval = self.poller.next_interval([required_batch])
 
                 # don't wait longer than the maximum
                 if time_waited + interval > MAXIMUM_WAIT:
@@ -205,6 +328,7 @@ class BatchHelper:
             organizationId=self.organizationId,
             status='pending')
         active_action_batches = [batch for batch in pending_action_batches if batch['confirmed']]
+        self.poller.update({batch['id'] for batch in pending_action_batches})
 
         # Dashboard API supports up to MAXIMUM_ACTIVE_ACTION_BATCHES.
         batch_queue_is_full = True if len(active_action_batches) >= MAXIMUM_ACTIVE_ACTION_BATCHES else False
@@ -218,31 +342,15 @@ class BatchHelper:
         number_of_active_batches = len(active_action_batches)
         print(f'There are {number_of_active_batches} active action batches.')
 
-        if len(active_action_batches):
-            # If there are any active action batches, then flatten the list of actions; we want to know how many total
-            # actions are pending, so we can calculate a reasonable wait time. Waiting too long is no fun, but
-            # checking too frequently is inefficient, and might impact other API applications.
-            print(f'Finding batch queue capacity...')
-
-            # Gather all the action lists for the existing action batches
-            active_batch_action_lists = [batch['actions'] for batch in active_action_batches]
-
-            # Flatten the list of action lists into a single list of actions
-            active_batch_actions = [action for action_list in active_batch_action_lists for action in action_list]
+        while batch_queue_is_full:
+            # Wait for space in the queue until there's an open slot, polling when the earliest active batch is
+            # predicted to complete
+            interval = self.poller.next_interval(active_action_batches)
+            print(f'There are already {len(active_action_batches)} active action batches. Waiting {interval} '
+                  f'seconds before trying again.')
+            time.sleep(interval)
 
-            # Calculate the mean number of actions per batch
-            mean_actions_per_batch = len(active_batch_actions) / number_of_active_batches
-
-            # Set an interval based on the interval_factor and the mean actions per batch
-            interval = self.interval_factor * mean_actions_per_batch
-
-            while batch_queue_is_full:
-                # Wait for space in the queue until there's an open slot.
-                print(f'There are already {number_of_active_batches} active action batches. Waiting {interval} '
-                      f'seconds before trying again.')
-                time.sleep(interval)
-
-                active_action_batches, active_action_batches, batch_queue_is_full = self.check_batch_queue()
+            pending_action_batches, active_action_batches, batch_queue_is_full = self.check_batch_queue()
         return True
 
     def confirm_readiness_for_new_batch(self):
@@ -255,14 +363,18 @@ class BatchHelper:
 
     def submit_action_batches(self):
         """ Submit the next batch and remove it from the list of remaining batches. """
+        new_batch = self.new_batches.pop(0)
         try:
-            new_batch_response = self.dashboard_session.organizations.createOrganizationActionBatch(**self.new_batches.pop(0))
+            new_batch_response = self.dashboard_session.organizations.createOrganizationActionBatch(**new_batch)
         except meraki.APIError:
             self.status = BatchHelperStatus.FAILED
             raise BatchCreationFailureError()
 
         self.new_batches_responses.append(new_batch_response)
         self.submitted_new_batches_ids.append(new_batch_response['id'])
+        self.submitted_batch_actions[new_batch_response['id']] = new_batch['actions']
+        self.write_preview(new_batch, new_batch_response['id'])
+        self.poller.submitted(new_batch_response['id'], len(new_batch['actions']))
 
         print(f'Creating the next action batch. {len(self.new_batches)} action batches remain.')
 
@@ -274,38 +386,323 @@ class BatchHelper:
             self.dependent = True
             self.required_batch_id = new_batch_response['id']
 
-    def generate_preview(self):
-        """ Generates a JSON preview of the new batches. """
-        self.prepare()
+    def sort_failed_actions(self, actions, errors):
+        """ Splits the actions of a failed batch into the ones to resubmit and the ones that failed for good. Only
+        errors naming their action are retried, and only if they may go away. """
+        errors_by_action = dict()
+        unattributed_errors = list()
+        for error in errors:
+            match = ACTION_ERROR_PATTERN.match(error)
+            if match and int(match.group(1)) < len(actions):
+                errors_by_action.setdefault(int(match.group(1)), list()).append(error)
+            else:
+                unattributed_errors.append(error)
+        if not errors_by_action and not unattributed_errors:
+            unattributed_errors.append('The action batch failed without any errors.')
+
+        if unattributed_errors:
+            # Errors that can't be traced to an action fail every action of the batch rather than resubmitting it
+            # blindly, so a permanent error never uses up the retries of the actions around it
+            return list(), [{'action': action,
+                             'errors': errors_by_action.get(index, list()) + unattributed_errors,
+                             'attempts': self.action_retries.get(id(action), 0) + 1}
+                            for index, action in enumerate(actions)]
+
+        retry_actions = list()
+        failed_actions = list()
+        for index, action in enumerate(actions):
+            action_errors = errors_by_action.get(index, list())
+            retries = self.action_retries.get(id(action), 0)
+            if not action_errors:
+                # rolled back only because another action failed, so it's resubmitted as it is
+                retry_actions.append(action)
+            elif is_retryable(action_errors) and retries < self.maximum_action_retries:
+                self.action_retries[id(action)] = retries + 1
+                retry_actions.append(action)
+            else:
+                failed_actions.append({'action': action, 'errors': action_errors, 'attempts': retries + 1})
+        return retry_actions, failed_actions
+
+    def resolve_submitted_batches(self, failed_batches):
+        """ Sorts the actions of the finished batches into completed, retried and failed, and queues new batches for the
+        retried ones. Returns whether any batch was queued. """
+        failed_batches = {batch['id']: batch for batch in failed_batches}
+        retry_actions = list()
+        for batch_id, actions in list(self.submitted_batch_actions.items()):
+            if batch_id not in failed_batches:
+                if batch_id not in self.successful_new_batch_ids:
+                    self.successful_new_batch_ids.append(batch_id)
+                self.completed_actions.extend(actions)
+                continue
+
+            retry_actions.extend(self.requeue_failed_batch(failed_batches[batch_id]))
+        self.submitted_batch_actions = dict()
+        return len(retry_actions) > 0
+
+    def requeue_failed_batch(self, batch):
+        """ Sorts the actions of a submitted batch that failed, and queues the ones worth another try ahead of the
+        remaining batches, so linear batches keep their order. Returns the queued actions. """
+        actions = self.submitted_batch_actions.pop(batch['id'], batch['actions'])
+        self.failed_new_batch_ids.append(batch['id'])
+        retry_actions, failed_actions = self.sort_failed_actions(actions, batch['status']['errors'])
+        self.failed_actions.extend(failed_actions)
+        self.new_batches[0:0] = [self.new_batch(retry_actions[i:i + self.actions_per_new_batch])
+                                 for i in range(0, len(retry_actions), self.actions_per_new_batch)]
+        print(f'Action batch {batch["id"]} failed. Resubmitting {len(retry_actions)} of its actions, '
+              f'{len(failed_actions)} failed for good.')
+
+        if self.required_batch_id == batch['id']:
+            # nothing depends on a batch whose actions are resubmitted
+            self.dependent = False
+            self.required_batch_id = '__default__'
+        return retry_actions
+
+    def retry_failed_actions(self):
+        """ Waits for the submitted batches to finish, then queues the actions of the failed ones that are worth
+        another try. Returns whether any batch was queued. """
+        if not self.confirmed_new_batches or not self.submitted_batch_actions:
+            # unconfirmed batches don't run, so they have no results yet
+            return False
+
+        time_waited = 0
+        while True:
+            pending_action_batches, active_action_batches, batch_queue_is_full = self.check_batch_queue()
+            running_batches = [batch for batch in pending_action_batches
+                               if batch['id'] in self.submitted_batch_actions]
+            if not running_batches:
+                break
+            if time_waited >= self.maximum_wait:
+                self.status = BatchHelperStatus.FAILED
+                raise SubmittedBatchesStillInProgress([batch['id'] for batch in running_batches], self.organizationId)
+
+            interval = min(self.poller.next_interval(running_batches), self.maximum_wait - time_waited)
+            time_waited += interval
+            print(f'{len(running_batches)} submitted action batches in progress. Waiting {interval} seconds for '
+                  f'them to complete.')
+            time.sleep(interval)
 
-        preview_json = json.dumps(self.new_batches, indent=2)
-        with open('batch_helper_preview.json', 'w+', encoding='utf-8', newline='') as preview_file:
-            preview_file.write(preview_json)
+        failed_batches = self.dashboard_session.organizations.getOrganizationActionBatches(
+            organizationId=self.organizationId,
+            status='failed')
+        return self.resolve_submitted_batches(failed_batches)
+
+    def stream_preview(self, path: str = PREVIEW_FILE):
+        """ Writes every batch to a JSON lines preview as execute submits it, one batch per line with its ID, instead
+        of writing them all before the first is sent. """
+        self.preview_file = open(path, 'w', encoding='utf-8', newline='', buffering=1)
+        self.preview = path
+
+    def write_preview(self, batch, batch_id):
+        """ Adds a submitted batch to the streamed preview, if there is one. """
+        if self.preview_file is not None:
+            self.preview_file.write(json.dumps({'id': batch_id, **batch}) + '\n')
+
+    def close_preview(self):
+        """ Closes the streamed preview, if there is one. """
+        if self.preview_file is not None:
+            self.preview_file.close()
+            self.preview_file = None
 
     def execute(self):
-        """ Submits new batches. """
-        while len(self.new_batches):
-            self.status = BatchHelperStatus.WORKING
-            # Loop as long as there are batches left to process
-            print(f'Confirming readiness for batch submission...')
-
-            # Check that the environment is ready for the new batch. Set a single variable false until it passes all the
-            # while loop gates
-            ready_for_new_batch = False
-            while not ready_for_new_batch:
-                # Confirm readiness before proceeding. Need to figure out how to pass this required batch ID in such a
-                # way that it can change from the initial required batch, to the linear preceding batch, if linear
-                ready_for_new_batch = self.confirm_readiness_for_new_batch()
-
-            ready_for_new_batch = False
-            while not ready_for_new_batch:
-                ready_for_new_batch = self.find_batch_queue_capacity()
-
-            print(f'Submitting new batch.')
-            # submit new batch(es)
-            self.submit_action_batches()
-
-        self.status = BatchHelperStatus.COMPLETE
+        """ Submits new batches, then resubmits the actions of the failed ones that are worth another try. """
+        try:
+            while len(self.new_batches):
+                self.status = BatchHelperStatus.WORKING
+                # Loop as long as there are batches left to process
+                print(f'Confirming readiness for batch submission...')
+
+                # Check that the environment is ready for the new batch. Set a single variable false until it passes all
+                # the while loop gates
+                ready_for_new_batch = False
+                while not ready_for_new_batch:
+                    # Confirm readiness before proceeding. Need to figure out how to pass this required batch ID in such
+                    # a way that it can change from the initial required batch, to the linear preceding batch, if linear
+                    ready_for_new_batch = self.confirm_readiness_for_new_batch()
+
+                ready_for_new_batch = False
+                while not ready_for_new_batch:
+                    ready_for_new_batch = self.find_batch_queue_capacity()
+
+                print(f'Submitting new batch.')
+                # submit new batch(es)
+                self.submit_action_batches()
+
+                if not len(self.new_batches):
+                    # check the results once everything is submitted, which may queue new batches
+                    self.retry_failed_actions()
+
+            self.status = BatchHelperStatus.COMPLETE
+        finally:
+            # batches submitted before a failure stay in the preview
+            self.close_preview()
 
         return True
 
+
+
+class AsyncBatchHelper(BatchHelper):
+    """asyncio version of the batch helper, for meraki.aio.AsyncDashboardAPI sessions.
+
+    Instead of checking the batch queue before every submission, it polls the organization's pending batches once per
+    round, and fills every free slot out of MAXIMUM_ACTIVE_ACTION_BATCHES at once, so the queue stays saturated. Linear
+    and dependent batches still wait for the batch they depend on to complete.
+    """
+
+    async def wait_for_required_batch(self):
+        """ When the batches are dependent or linear, waits for the required batch to finish. """
+
+        time_waited = 0
+        while time_waited < self.maximum_wait:
+            try:
+                # Check on the required batch
+                required_batch = await self.dashboard_session.organizations.getOrganizationActionBatch(
+                    self.required_batch_org_id, self.required_batch_id
+                )
+            except meraki.AsyncAPIError:
+                # If it doesn't exist, raise error
+                self.status = BatchHelperStatus.FAILED
+                raise RequiredBatchNotFoundError(self.required_batch_id, self.required_batch_org_id)
+
+            if required_batch['status']['completed']:
+                # If it's complete, stop waiting
+                self.successful_new_batch_ids.append(required_batch['id'])
+                self.poller.completed(required_batch['id'])
+                return True
+
+            if not required_batch['confirmed']:
+                # If it's not confirmed, then it hasn't started, so stop waiting.
+                self.status = BatchHelperStatus.FAILED
+                raise RequiredBatchNotStartedError(self.required_batch_id, self.required_batch_org_id)
+
+            if required_batch['status']['failed']:
+                if required_batch['id'] in self.submitted_batch_actions:
+                    # one of the new batches, whose actions worth another try are submitted next
+                    self.requeue_failed_batch(required_batch)
+                    return True
+
+                # if it failed, then stop waiting
+                self.status = BatchHelperStatus.FAILED
+                self.failed_new_batch_ids.append(required_batch['id'])
+                raise RequiredBatchFailureError(self.required_batch_id,
+                                                batch_errors=required_batch['status']['errors'])
+
+            # wait until the batch is predicted to complete, longer the later it runs, but not past the maximum
+            self.poller.still_pending([required_batch['id']])
+            interval = min(self.poller.next_interval([required_batch]), self.maximum_wait - time_waited)
+            time_waited += interval
+
+            print(f'Required batch ID {self.required_batch_id} in progress. Waiting {interval} seconds for it to '
+                  f'complete.')
+            await asyncio.sleep(interval)
+
+        # error if it's taken too long
+        self.status = BatchHelperStatus.FAILED
+        raise RequiredBatchStillInProgress(self.required_batch_id, self.required_batch_org_id)
+
+    async def retry_failed_actions(self):
+        """ Waits for the submitted batches to finish, then queues the actions of the failed ones that are worth
+        another try. Returns whether any batch was queued. """
+        if not self.confirmed_new_batches or not self.submitted_batch_actions:
+            # unconfirmed batches don't run, so they have no results yet
+            return False
+
+        time_waited = 0
+        while True:
+            pending_action_batches = await self.dashboard_session.organizations.getOrganizationActionBatches(
+                organizationId=self.organizationId,
+                status='pending')
+            self.poller.update({batch['id'] for batch in pending_action_batches})
+            running_batches = [batch for batch in pending_action_batches
+                               if batch['id'] in self.submitted_batch_actions]
+            if not running_batches:
+                break
+            if time_waited >= self.maximum_wait:
+                self.status = BatchHelperStatus.FAILED
+                raise SubmittedBatchesStillInProgress([batch['id'] for batch in running_batches], self.organizationId)
+
+            interval = min(self.poller.next_interval(running_batches), self.maximum_wait - time_waited)
+            time_waited += interval
+            print(f'{len(running_batches)} submitted action batches in progress. Waiting {interval} seconds for '
+                  f'them to complete.')
+            await asyncio.sleep(interval)
+
+        failed_batches = await self.dashboard_session.organizations.getOrganizationActionBatches(
+            organizationId=self.organizationId,
+            status='failed')
+        return self.resolve_submitted_batches(failed_batches)
+
+    async def submit_action_batch(self, batch):
+        """ Submits a single batch. """
+        try:
+            new_batch_response = await self.dashboard_session.organizations.createOrganizationActionBatch(**batch)
+        except meraki.AsyncAPIError:
+            self.status = BatchHelperStatus.FAILED
+            raise BatchCreationFailureError()
+
+        self.new_batches_responses.append(new_batch_response)
+        self.submitted_new_batches_ids.append(new_batch_response['id'])
+        self.submitted_batch_actions[new_batch_response['id']] = batch['actions']
+        self.write_preview(batch, new_batch_response['id'])
+        self.poller.submitted(new_batch_response['id'], len(batch['actions']))
+        return new_batch_response
+
+    async def execute(self):
+        """ Submits new batches, as many at a time as the batch queue has room for, then resubmits the actions of the
+        failed ones that are worth another try. """
+        try:
+            if self.dependent:
+                # if dependent, check that the required batch has completed before submitting anything
+                await self.wait_for_required_batch()
+
+            while len(self.new_batches):
+                self.status = BatchHelperStatus.WORKING
+
+                # A single poll shows every batch occupying a slot, whoever submitted it
+                pending_action_batches = await self.dashboard_session.organizations.getOrganizationActionBatches(
+                    organizationId=self.organizationId,
+                    status='pending')
+                active_action_batches = [batch for batch in pending_action_batches if batch['confirmed']]
+                self.poller.update({batch['id'] for batch in pending_action_batches})
+
+                if not self.confirmed_new_batches:
+                    # Unconfirmed batches don't run, so they don't take up slots
+                    free_slots = len(self.new_batches)
+                else:
+                    free_slots = MAXIMUM_ACTIVE_ACTION_BATCHES - len(active_action_batches)
+
+                if self.linear_new_batches:
+                    # Only one batch at a time, once the previous one has completed
+                    free_slots = min(free_slots, 1)
+                    if self.dependent:
+                        if any(batch['id']==self.required_batch_id for batch in pending_action_batches):
+                            free_slots = 0
+                        else:
+                            # It left the queue, make sure it completed rather than failed
+                            await self.wait_for_required_batch()
+
+                if free_slots>0:
+                    batches = [self.new_batches.pop(0) for _ in range(min(free_slots, len(self.new_batches)))]
+                    responses = await asyncio.gather(*[self.submit_action_batch(batch) for batch in batches])
+                    print(f'Submitted {len(batches)} action batches. {len(self.new_batches)} action batches remain.')
+
+                    if self.linear_new_batches:
+                        self.dependent = True
+                        self.required_batch_id = responses[-1]['id']
+                        self.required_batch_org_id = self.organizationId
+                else:
+                    # Poll again when the earliest active batch is predicted to complete
+                    interval = self.poller.next_interval(active_action_batches)
+                    print(f'There are {len(active_action_batches)} active action batches. Waiting {interval} seconds '
+                          f'before trying again.')
+                    await asyncio.sleep(interval)
+
+                if not len(self.new_batches):
+                    # check the results once everything is submitted, which may queue new batches
+                    await self.retry_failed_actions()
+
+            self.status = BatchHelperStatus.COMPLETE
+        finally:
+            # batches submitted before a failure stay in the preview
+            self.close_preview()
+
+        return True
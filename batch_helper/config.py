@@ -15,6 +15,27 @@ MIN_ACTIONS: int = 2
 # more API calls to no positive end.
 MINIMUM_INTERVAL_FACTOR: float = 0.05
 
+# Bounds of the adaptive polling interval, in seconds. The interval follows the predicted completion of the running
+# batches, learned from how long the batches of the current run took per action, and doubles while they run late.
+MINIMUM_POLL_INTERVAL: float = 1.0
+MAXIMUM_POLL_INTERVAL: float = 60.0
+
+# Weight of the latest completed batch in the learned seconds per action, between 0 and 1
+POLL_LEARNING_RATE: float = 0.5
+
+# Number of times an action that failed for a reason that may go away, like a timeout, is resubmitted in a new batch
+# before it's reported as failed. Only actions the errors of their batch name by index are retried. Actions that were
+# only rolled back because another action of their batch failed are resubmitted without using up their retries.
+MAXIMUM_ACTION_RETRIES: int = 2
+
+# Lowercase fragments of the action errors worth retrying. Any other error, like a camera or profile that doesn't exist,
+# fails the action for good.
+RETRYABLE_ACTION_ERRORS: tuple = ('rate limit', 'timeout', 'timed out', 'try again', 'temporarily', 'unavailable',
+                                  'internal server error', 'internal error', 'concurrent')
+
+# File the preview of the batches is written to, as JSON lines, one batch per line
+PREVIEW_FILE: str = 'batch_helper_preview.jsonl'
+
 # Less configurable
 # --------------------------------------------------
 # These values reflect API limits and are 'the law'. Raising them probably doesn't make sense.
@@ -174,6 +174,24 @@ class RequiredBatchStillInProgress(BatchHelperError):
         super().__init__(self.message)
 
 
+class SubmittedBatchesStillInProgress(BatchHelperError):
+    """
+    Raised when the submitted batches don't finish in time to check their results.
+
+    Attributes:
+        batch_ids -- the IDs of the batches still in progress
+        organizationId -- the ID of the org where the batches are
+        message -- explanation of the error
+    """
+
+    def __init__(self, batch_ids, organizationId):
+        self.batch_ids = batch_ids
+        self.organizationId = organizationId
+        self.message = f'The submitted batches with IDs {self.batch_ids} in org ID {self.organizationId} did not' \
+                       f' complete within the maximum wait time.'
+        super().__init__(self.message)
+
+
 class BatchCreationFailureError(BatchHelperError):
     """
     Raised when the required batch is not found.
@@ -0,0 +1,148 @@
+import pytest
+from batch_helper import AdaptivePoller, BatchHelper, is_retryable
+
+class Clock:
+    """ Stands in for time.monotonic, moved forward by the tests. """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr('batch_helper.time.monotonic', clock)
+    return clock
+
+def batch(batch_id, actions):
+    return {"id": batch_id, "actions": [{}] * actions}
+
+def test_poller_learns_from_the_midpoint_of_the_last_two_polls(clock):
+    poller = AdaptivePoller(seconds_per_action=1.0, minimum_interval=1, maximum_interval=60, learning_rate=0.5)
+    poller.submitted('1', 10)
+    clock.now += 4
+    assert poller.update({'1'})==0
+    clock.now += 2
+    assert poller.update(set())==1
+
+    # Taken to have completed at 5 seconds, halfway between the polls at 4 and 6
+    assert poller.seconds_per_action==pytest.approx(0.5)
+
+def test_poller_weighs_later_batches_by_the_learning_rate(clock):
+    poller = AdaptivePoller(seconds_per_action=1.0, minimum_interval=1, maximum_interval=60, learning_rate=0.5)
+    for batch_id, seconds in (('1', 10), ('2', 30)):
+        poller.submitted(batch_id, 10)
+        clock.now += seconds
+        poller.update({batch_id})
+        poller.update(set())
+
+    # 1 second per action from the first batch, then halfway to 3 from the second
+    assert poller.seconds_per_action==pytest.approx(2.0)
+
+def test_poller_only_moves_the_last_seen_time_of_batches_still_pending(clock):
+    poller = AdaptivePoller(seconds_per_action=1.0, minimum_interval=1, maximum_interval=60, learning_rate=1)
+    poller.submitted('1', 10)
+    poller.submitted('2', 10)
+    clock.now += 10
+    assert poller.update({'2'})==1
+    clock.now += 10
+    poller.update(set())
+
+    # Batch 2 was last seen pending at 10 seconds, and found finished at 20
+    assert poller.seconds_per_action==pytest.approx(1.5)
+
+def test_poller_waits_for_the_predicted_completion_of_the_earliest_batch(clock):
+    poller = AdaptivePoller(seconds_per_action=0.5, minimum_interval=1, maximum_interval=60)
+    poller.submitted('1', 20)
+    poller.submitted('2', 40)
+    clock.now += 4
+
+    assert poller.predicted_wait([batch('1', 20), batch('2', 40)])==pytest.approx(6)
+    assert poller.next_interval([batch('1', 20), batch('2', 40)])==6
+
+def test_poller_predicts_batches_it_did_not_time_from_now(clock):
+    poller = AdaptivePoller(seconds_per_action=0.5, minimum_interval=1, maximum_interval=60)
+
+    assert poller.predicted_wait([batch('9', 10)])==pytest.approx(5)
+    assert poller.predicted_wait([])==0
+
+def test_poller_backs_off_while_batches_run_late_and_resets_once_one_finishes(clock):
+    poller = AdaptivePoller(seconds_per_action=0.1, minimum_interval=1, maximum_interval=10)
+    poller.submitted('1', 10)
+    poller.submitted('2', 10)
+    clock.now += 5
+    intervals = []
+    for _ in range(5):
+        poller.update({'1', '2'})
+        intervals.append(poller.next_interval([batch('1', 10), batch('2', 10)]))
+
+    assert intervals==[2, 4, 8, 10, 10]
+    poller.update({'2'})
+    assert poller.next_interval([batch('2', 10)])==1
+
+def action(number):
+    return {"resource": f"/devices/{number}/camera/qualityAndRetention", "operation": "update", "body": {}}
+
+@pytest.fixture
+def helper():
+    return BatchHelper(None, '1000', [action(n) for n in range(3)], maximum_action_retries=2)
+
+def test_sort_failed_actions_resubmits_actions_rolled_back_by_another_action(helper):
+    actions = [action(n) for n in range(3)]
+
+    retry, failed = helper.sort_failed_actions(actions, ["Action 1: /devices/1 - Not found"])
+
+    assert retry==[actions[0], actions[2]]
+    assert failed==[{"action": actions[1], "errors": ["Action 1: /devices/1 - Not found"], "attempts": 1}]
+    # Actions rolled back by another action keep all of their retries
+    assert helper.action_retries=={}
+
+def test_sort_failed_actions_retries_transient_errors_until_out_of_retries(helper):
+    actions = [action(n) for n in range(2)]
+    errors = ["Action 0: /devices/0 - Internal server error, please try again"]
+
+    for attempt in range(2):
+        retry, failed = helper.sort_failed_actions(actions, errors)
+        assert (retry, failed)==(actions, [])
+    retry, failed = helper.sort_failed_actions(actions, errors)
+
+    assert retry==[actions[1]]
+    assert failed==[{"action": actions[0], "errors": errors, "attempts": 3}]
+
+def test_sort_failed_actions_fails_every_action_on_errors_naming_no_action(helper):
+    actions = [action(n) for n in range(2)]
+
+    retry, failed = helper.sort_failed_actions(actions, ["Internal server error, please try again"])
+
+    assert retry==[]
+    assert [entry['action'] for entry in failed]==actions
+    assert all(entry['attempts']==1 for entry in failed)
+
+def test_sort_failed_actions_fails_every_action_when_any_error_names_no_action(helper):
+    actions = [action(n) for n in range(2)]
+    errors = ["Action 0: /devices/0 - Not found", "Something went wrong"]
+
+    retry, failed = helper.sort_failed_actions(actions, errors)
+
+    assert retry==[]
+    assert [entry['errors'] for entry in failed]==[errors, ["Something went wrong"]]
+
+def test_sort_failed_actions_treats_out_of_range_indexes_as_naming_no_action(helper):
+    actions = [action(n) for n in range(2)]
+
+    retry, failed = helper.sort_failed_actions(actions, ["Action 5: /devices/5 - timeout"])
+
+    assert retry==[]
+    assert len(failed)==2
+
+def test_sort_failed_actions_fails_a_batch_without_errors(helper):
+    retry, failed = helper.sort_failed_actions([action(0)], [])
+
+    assert retry==[]
+    assert failed[0]['errors']==['The action batch failed without any errors.']
+
+def test_is_retryable_needs_every_error_to_be_transient():
+    assert is_retryable(["Request timed out", "Rate limit exceeded"])
+    assert not is_retryable(["Request timed out", "Device not found"])
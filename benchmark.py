@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import time
+import runpy
+import argparse
+import tempfile
+import subprocess
+import mock_dashboard
+import pandas as pd
+from tabulate import tabulate
+
+ORG_ID = '1000'
+SRC_NET_ID = 'L_1'
+MODES = ['sync', 'async', 'batch', 'scheduled', 'camTagger', 'camTagger-targeted']
+
+def run_child(mode, base_url, result_path, networks, cameras, client_rate_limit=None):
+    """
+    Runs main.py in one write mode, or camTagger.py, against the mock Dashboard, then writes its wall time to
+    result_path. Runs in its own process, so every mode starts from freshly imported modules and clients.
+    :param mode: Write mode of main.py, or camTagger, or camTagger-targeted
+    :param base_url: Base URL of the mock Dashboard
+    :param result_path: Path of the JSON file the result is written to
+    :param networks: Number of target networks in the fleet, to generate cameras.csv for camTagger
+    :param cameras: Number of cameras in the fleet, to generate cameras.csv for camTagger
+    :param client_rate_limit: rate_limit of the clients, or None to keep the one in config.py
+    :return:
+    """
+    import config
+    config.api_key = 'benchmark'
+    config.base_url = base_url
+    config.src_org_id = ORG_ID
+    config.dst_org_id = ORG_ID
+    config.src_net_id = SRC_NET_ID
+    config.verbose = False
+    config.supervised = False
+    config.console_logging = False
+    config.cache_ttl = 0
+    config.journal_file = ''
+    config.metrics_file = ''
+    if client_rate_limit is not None:
+        config.rate_limit = client_rate_limit
+
+    start = time.perf_counter()
+    if mode.startswith('camTagger'):
+        # camTagger reads ./cameras.csv, so it runs from a scratch directory holding one that re-tags every camera
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'camTagger.py')
+        with tempfile.TemporaryDirectory() as scratch:
+            fleet = mock_dashboard.MockDashboard()
+            serials = fleet.generate_fleet(ORG_ID, SRC_NET_ID, networks=networks, cameras=cameras, seed=1)
+            pd.DataFrame([{"serial": serial, "model": fleet.devices[serial]['model'],
+                           "tags": ','.join(fleet.devices[serial]['tags'])} for serial in serials]) \
+                .to_csv(os.path.join(scratch, 'cameras.csv'), index=False)
+            os.chdir(scratch)
+            sys.argv = [script, '--targeted'] if mode=='camTagger-targeted' else [script]
+            try:
+                runpy.run_path(script, run_name='__main__')
+            except SystemExit:
+                # camTagger exits early when no camera needs new tags
+                pass
+    else:
+        config.write_mode = mode
+        import main
+        main.run(main.parse_args([]))
+    wall = time.perf_counter() - start
+
+    with open(result_path, 'w') as result_file:
+        json.dump({"wall_time": wall}, result_file)
+
+def benchmark(mode, mock, base_url, networks, cameras, show_output=False, client_rate_limit=None):
+    """
+    Benchmarks one mode against a freshly generated fleet
+    :param mode: Write mode of main.py, or camTagger, or camTagger-targeted
+    :param mock: MockDashboard served at base_url
+    :param base_url: Base URL of the mock Dashboard
+    :param networks: Number of target networks in the fleet
+    :param cameras: Number of cameras in the fleet
+    :param show_output: Show the output of the benchmarked script
+    :param client_rate_limit: rate_limit of the clients, or None to keep the one in config.py
+    :return: result: Dict with the wall time, API calls and 429 retries of the run
+    """
+    mock.reset()
+    mock.generate_fleet(ORG_ID, SRC_NET_ID, networks=networks, cameras=cameras)
+
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as result_file:
+        result_path = result_file.name
+    try:
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', mode, '--base-url', base_url,
+             '--result', result_path, '--networks', str(networks), '--cameras', str(cameras)] +
+            ([] if client_rate_limit is None else ['--client-rate-limit', str(client_rate_limit)]),
+            stdout=None if show_output else subprocess.DEVNULL,
+            stderr=None if show_output else subprocess.PIPE,
+        )
+        if child.returncode!=0:
+            print(f"Mode {mode} failed:")
+            print(child.stderr.decode('utf-8', 'replace') if child.stderr else '')
+            return {"mode": mode, "wall_time_s": None, "api_calls": sum(mock.calls.values()),
+                    "429_retries": sum(mock.throttled.values()), "bytes_received": mock.bytes_sent}
+        with open(result_path) as result_file:
+            wall_time = json.load(result_file)['wall_time']
+    finally:
+        os.remove(result_path)
+
+    return {
+        "mode": mode,
+        "wall_time_s": round(wall_time, 2),
+        "api_calls": sum(mock.calls.values()),
+        "429_retries": sum(mock.throttled.values()),
+        "bytes_received": mock.bytes_sent,
+        "calls_by_endpoint": dict(mock.calls),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark main.py and camTagger.py against a local mock Dashboard")
+    parser.add_argument('--networks', type=int, default=20, help="number of target networks")
+    parser.add_argument('--cameras', type=int, default=200, help="number of target cameras")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every request")
+    parser.add_argument('--rate-limit', type=float, default=10, help="requests per second per organization, 0 disables")
+    parser.add_argument('--client-rate-limit', type=float,
+                        help="requests per second the clients pace themselves at, instead of rate_limit in config.py")
+    parser.add_argument('--action-latency', type=float, default=0.01,
+                        help="seconds each action of an action batch takes to run")
+    parser.add_argument('--action-failure-rate', type=float, default=0.0,
+                        help="chance of each action of an action batch failing with a transient error")
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--show-output', action='store_true', help="show the output of the benchmarked scripts")
+    parser.add_argument('--json', metavar='PATH', help="also write the results, with calls by endpoint, to PATH")
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.base_url, args.result, args.networks, args.cameras, args.client_rate_limit)
+        sys.exit(0)
+
+    mock = mock_dashboard.MockDashboard(latency=args.latency, rate_limit=args.rate_limit,
+                                        action_latency=args.action_latency,
+                                        action_failure_rate=args.action_failure_rate, seed=1)
+    server = mock_dashboard.serve(mock)
+    print(f"Benchmarking {args.cameras} cameras in {args.networks} networks, {args.latency}s latency, "
+          f"{args.rate_limit} requests per second against {server.base_url}")
+
+    results = []
+    for mode in args.modes:
+        print(f"Running {mode}...")
+        results.append(benchmark(mode, mock, server.base_url, args.networks, args.cameras, args.show_output,
+                                 args.client_rate_limit))
+    server.shutdown()
+
+    print(tabulate(pd.DataFrame([{k: v for k, v in result.items() if k!='calls_by_endpoint'} for result in results]),
+                   headers='keys', tablefmt='fancy_grid'))
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
@@ -1,43 +1,88 @@
+import asyncio
+import argparse
 import config
+import clients
+import read_functions
+import inventory_cache
 import batch_helper
-import meraki
+import report
+import metrics
 import pandas as pd
 
-# Instantiate synchronous Meraki API client
-dashboard = meraki.DashboardAPI(
-    config.api_key,
-    base_url="https://api.meraki.com/api/v1",
-    log_file_prefix=__file__[:-3],
-    print_console=config.console_logging,
-    )
+dashboard = clients.dashboard()
 
-org_devices = dashboard.organizations.getOrganizationDevices(
-        organizationId=config.dst_org_id,
-        model='MV',
-        total_pages=-1
-    )
+parser = argparse.ArgumentParser(description="Tag cameras with the tags listed in cameras.csv")
+parser.add_argument('--refresh-cache', action='store_true',
+                    help="fetch organization devices from the API even if they are cached")
+parser.add_argument('--targeted', action='store_true',
+                    help="fetch only the cameras listed in cameras.csv, in concurrent requests filtered by serial, "
+                         "instead of every MV device in the organization")
+args = parser.parse_args()
+
+loop = asyncio.get_event_loop()
 
-cams = pd.read_csv('./cameras.csv')
+# Empty cells are read as empty strings instead of NaN, so a camera without tags in the CSV gets no 'nan' tag
+cams = pd.read_csv('./cameras.csv', keep_default_na=False)
 
 cams_list = cams.to_dict('records')
 
+async def get_listed_devices(serials):
+    """
+    Fetches only the cameras listed in the CSV, through concurrent requests of the async client
+    :param serials: List of serials in the CSV
+    :return: devices: List of the listed cameras found in the organization
+    """
+    return await read_functions.get_organization_devices_by_serial(clients.aiomeraki(), config.dst_org_id, serials)
+
+if args.targeted:
+    # The CSV is read first, so only its serials are fetched instead of every MV device in the organization
+    org_devices = loop.run_until_complete(
+        get_listed_devices([cam['serial'] for cam in cams_list]))
+else:
+    org_devices = inventory_cache.cached(
+        'getOrganizationDevices',
+        config.dst_org_id,
+        {"model": 'MV'},
+        lambda: dashboard.organizations.getOrganizationDevices(
+            organizationId=config.dst_org_id,
+            model='MV',
+            total_pages=-1
+        ),
+        args.refresh_cache
+    )
+
+# Index devices by serial, so every CSV row is matched with a single lookup
+devices_by_serial = {dev['serial']: dev for dev in org_devices}
+
+# Merge the tags of every CSV row into the tags its device will end up with, keeping the current tags first
+new_tags = {}
 for cam in cams_list:
-    for dev in org_devices:
-        if cam['serial']==dev['serial']:
-            dev['tags']=cam['tags'].split(',')+dev['tags']
+    dev = devices_by_serial.get(cam['serial'])
+    if dev is None:
+        print(f"Camera {cam['serial']} was not found in organization {config.dst_org_id}, skipping it.")
+        continue
+    tags = new_tags.setdefault(cam['serial'], list(dev['tags']))
+    for tag in str(cam['tags']).split(','):
+        tag = tag.strip()
+        if tag and tag not in tags:
+            tags.append(tag)
 
+# Only devices whose tag set changes get an action, and the action only carries their tags
 actions = []
-
-for dev in org_devices:
-    if 'camProfiler' in dev['tags']:
-        upd = {k: dev[k] for k in dev.keys() - {
-                    "serial"
-                }}
-        action = dashboard.batch.devices.updateDevice(serial=dev['serial'], **upd)
+for serial, tags in new_tags.items():
+    if config.dst_camera_tag in tags and set(tags)!=set(devices_by_serial[serial]['tags']):
+        action = dashboard.batch.devices.updateDevice(serial=serial, tags=tags)
         actions.append(action)
 
-test_helper = batch_helper.BatchHelper(
-    dashboard,
+print(f"{len(actions)} of {len(cams_list)} cameras in cameras.csv need new tags.")
+if len(actions)==0:
+    loop.run_until_complete(clients.close())
+    if config.metrics_file:
+        metrics.write(config.metrics_file)
+    exit()
+
+test_helper = batch_helper.AsyncBatchHelper(
+    clients.aiomeraki(),
     config.dst_org_id,
     actions,
     linear_new_batches=False,
@@ -45,13 +90,26 @@ test_helper = batch_helper.BatchHelper(
 )
 
 test_helper.prepare()
-test_helper.generate_preview()
-test_helper.execute()
+# Every batch is added to the preview as it's submitted, instead of all of them before the first is sent
+test_helper.stream_preview()
+loop.run_until_complete(test_helper.execute())
+loop.run_until_complete(clients.close())
+
+# Device tags changed, so cached device lists of this organization are stale
+inventory_cache.invalidate(config.dst_org_id)
 
 print(f'helper status is {test_helper.status}')
 
-batches_report = dashboard.organizations.getOrganizationActionBatches(config.dst_org_id)
-new_batches_statuses = [{'id': batch['id'], 'status': batch['status']} for batch in batches_report if
-                        batch['id'] in test_helper.submitted_new_batches_ids]
-failed_batch_ids = [batch['id'] for batch in new_batches_statuses if batch['status']['failed']]
-print(f'Failed batch IDs are as follows: {failed_batch_ids}')
\ No newline at end of file
+# Failed actions worth another try were already resubmitted by the helper, these failed for good
+print(f"{len(test_helper.completed_actions)} cameras tagged, {len(test_helper.failed_actions)} failed.")
+if len(test_helper.failed_actions)>0:
+    failed_rows = report.failed_action_rows(test_helper.failed_actions)
+    print("The following cameras could not be tagged:")
+    print(report.table(failed_rows))
+    # Written in the format of cameras.csv, so the failed cameras can be tagged again once fixed
+    failed_serials = set(row['serial'] for row in failed_rows)
+    cams[cams['serial'].isin(failed_serials)].to_csv('./cameras_failed.csv', index=False)
+    print("Their rows of cameras.csv were written to cameras_failed.csv")
+
+if config.metrics_file:
+    metrics.write(config.metrics_file)
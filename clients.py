@@ -0,0 +1,57 @@
+import os
+import config
+import rate_limiter
+import metrics
+import meraki
+import meraki.aio
+
+# Every client logs to the same file, instead of one file per module that creates a client
+LOG_FILE_PREFIX = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'merakiCamProfiler')
+
+_dashboard = None
+_aiomeraki = None
+
+def dashboard():
+    """
+    Returns the synchronous Dashboard API client shared by every module, creating it from config on first use
+    :return: dashboard: Dashboard API client instance
+    """
+    global _dashboard
+    if _dashboard is None:
+        _dashboard = metrics.attach(rate_limiter.attach(meraki.DashboardAPI(
+            config.api_key,
+            base_url=config.base_url,
+            log_file_prefix=LOG_FILE_PREFIX,
+            print_console=config.console_logging,
+            maximum_retries=config.max_retries,
+        )))
+    return _dashboard
+
+def aiomeraki():
+    """
+    Returns the async Dashboard API client shared by every module, creating it from config on first use. The read and
+    write phases of a run share it, so its pooled connections are reused instead of set up again for every phase.
+    Must be called from the event loop it will be used on.
+    :return: aiomeraki: Async Dashboard API client
+    """
+    global _aiomeraki
+    if _aiomeraki is None:
+        _aiomeraki = metrics.attach(rate_limiter.attach(meraki.aio.AsyncDashboardAPI(
+            config.api_key,
+            base_url=config.base_url,
+            log_file_prefix=LOG_FILE_PREFIX,
+            print_console=False,
+            maximum_retries=config.max_retries,
+            maximum_concurrent_requests=config.max_requests,
+        )))
+    return _aiomeraki
+
+async def close():
+    """
+    Closes the session of the async client, if one was created. A later call to aiomeraki creates a new one
+    :return:
+    """
+    global _aiomeraki
+    if _aiomeraki is not None:
+        await _aiomeraki._session.close()
+        _aiomeraki = None
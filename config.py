@@ -1,14 +1,14 @@
 # Authentication Config
 api_key = 'ENTER_API_KEY'
-base_url = 'https://api.meraki.cn/api/v1'
+base_url = 'https://api.meraki.com/api/v1' # Use https://api.meraki.cn/api/v1 for organizations in China
 
 # Orgs and Networks
 src_org_id = 'ENTER_SOURCE_ORG_ID'
 dst_org_id = 'ENTER_TARGET_ORG_ID' # can be the same as src_org_id if copying within the same org
 src_net_id = 'ENTER_NETWORK_ID'
 
-# Modules to Sync ----NOT IMPLEMENTED YET
-# Keep only the modules you want to sync
+# Modules to Sync
+# Keep only the modules you want to sync. Disabled modules are neither read, planned nor written
 # Available modules: quality_profiles, wireless_profiles, rtsp_settings
 modules = ['quality_profiles', 'wireless_profiles', 'rtsp_settings']
 
@@ -22,4 +22,35 @@ verbose = True # Will display information gathered about networks
 supervised = True # Will ask before applying any configuration changes
 console_logging = True # Will print API output to the console
 max_retries = 100 # Number of times the API will retry when finding errors like 429
-max_requests = 10 # Number of concurrent requests to the API
\ No newline at end of file
+max_requests = 10 # Number of concurrent requests to the API
+rate_limit = 10 # Requests per second shared by every API client, matching the Dashboard API budget per organization, 0 disables client-side pacing
+rate_limit_burst = 5 # Requests that may be sent back to back before pacing kicks in
+rate_limit_min = 1 # Requests per second the limiter never slows down below, however many 429 responses it gets
+rate_limit_increase = 0.1 # Requests per second the limiter speeds back up by after every successful request, up to rate_limit
+metrics_file = 'api_metrics' # Calls, retries, 429s, bytes and latency percentiles of every API operation are written to this path with .json and .prom (Prometheus text format) appended at the end of every run, empty disables it
+check_device_state = False # Will read the current settings of every target camera first, and skip cameras already matching their tags
+
+# Inventory Cache
+cache_dir = '.inventory_cache' # Directory storing organization devices and networks between runs
+cache_ttl = 600 # Seconds a cached device or network list is reused for, 0 disables the cache
+cache_max_entries = 50 # Least recently used entries beyond this many are deleted
+
+# Run Journal
+journal_file = 'run_journal.jsonl' # Every profile copy and camera assignment of a run is appended here as it completes, so `python main.py --resume` can skip them after an interrupted run, empty disables it
+
+# Multiple Organizations
+# `python main.py --all-orgs` syncs every organization below instead of the one above, in parallel worker processes,
+# each with its own API clients and rate limit budget. Every entry takes the dst_org_id and src_net_id of one target
+# organization, and its src_org_id, which defaults to its dst_org_id. An entry may also override any other setting
+# above for its organization, like api_key or write_mode. supervised must be False
+organizations = [] # e.g. [{'dst_org_id': '123456', 'src_net_id': 'L_123'}, {'dst_org_id': '654321', 'src_org_id': '123456', 'src_net_id': 'L_123', 'api_key': 'OTHER_API_KEY'}]
+org_workers = 4 # Organizations synced at the same time
+org_output_dir = 'organizations' # Directory the output, report, journal and metrics of every organization are written to, one subdirectory each
+
+# Write Mode
+# sync: assign profiles and RTSP settings to cameras one API call at a time, network by network
+# async: assign them to all cameras at the end of the run through the async client, up to max_requests at a time
+# batch: assign them to all cameras at the end of the run through action batches of 100 actions in dst_org_id
+# scheduled: sync every network concurrently through the async client, each network running its profile copies and
+# camera assignments as a task graph, with at most max_requests requests in flight across all networks
+write_mode = 'sync'
\ No newline at end of file
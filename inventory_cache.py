@@ -0,0 +1,143 @@
+import os
+import json
+import gzip
+import time
+import hashlib
+import config
+
+def cache_path(endpoint, organization_id, filters):
+    """
+    Builds the path of the cache file of an API call
+    :param endpoint: Name of the API operation, like getOrganizationDevices
+    :param organization_id: ID of the organization the call is made against
+    :param filters: Dict with the filters passed to the call
+    :return: path: Path of the cache file
+    """
+    key = json.dumps([endpoint, organization_id, filters], sort_keys=True)
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+    return os.path.join(config.cache_dir, f"{organization_id}_{digest}.json.gz")
+
+def get(endpoint, organization_id, filters):
+    """
+    Reads the cached result of an API call, if there is one younger than config.cache_ttl
+    :param endpoint: Name of the API operation, like getOrganizationDevices
+    :param organization_id: ID of the organization the call is made against
+    :param filters: Dict with the filters passed to the call
+    :return: data: Cached result of the call, or None if it isn't cached or has expired
+    """
+    path = cache_path(endpoint, organization_id, filters)
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as cache_file:
+            entry = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry['fetched_at'] > config.cache_ttl:
+        return None
+    # Mark the entry as recently used for eviction, unless another process sharing the cache just evicted it
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return entry['data']
+
+def put(endpoint, organization_id, filters, data):
+    """
+    Stores the result of an API call as compact, gzip compressed JSON, then evicts the least recently used entries
+    beyond config.cache_max_entries
+    :param endpoint: Name of the API operation, like getOrganizationDevices
+    :param organization_id: ID of the organization the call is made against
+    :param filters: Dict with the filters passed to the call
+    :param data: Result of the call
+    :return:
+    """
+    os.makedirs(config.cache_dir, exist_ok=True)
+    path = cache_path(endpoint, organization_id, filters)
+    entry = {
+        "endpoint": endpoint,
+        "organizationId": organization_id,
+        "filters": filters,
+        "fetched_at": time.time(),
+        "data": data,
+    }
+    # Write to a temporary file first, so an interrupted run never leaves a truncated entry behind. It's named after
+    # the process, as the workers of an --all-orgs run share the cache and may store the same entry at the same time
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(temporary_path, 'wt', encoding='utf-8') as cache_file:
+        json.dump(entry, cache_file, separators=(',', ':'))
+    os.replace(temporary_path, path)
+    evict()
+
+def evict():
+    """
+    Deletes the least recently used cache entries beyond config.cache_max_entries
+    :return:
+    """
+    entries = []
+    for name in os.listdir(config.cache_dir):
+        if not name.endswith('.json.gz'):
+            continue
+        path = os.path.join(config.cache_dir, name)
+        try:
+            entries.append((os.path.getmtime(path), path))
+        except OSError:
+            # Removed since it was listed, by another process sharing the cache, like a worker of an --all-orgs run
+            continue
+    entries.sort(reverse=True)
+    for mtime, path in entries[config.cache_max_entries:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def invalidate(organization_id):
+    """
+    Deletes every cache entry of an organization, for example after its device tags were changed
+    :param organization_id: ID of the organization
+    :return:
+    """
+    if not os.path.isdir(config.cache_dir):
+        return
+    for name in os.listdir(config.cache_dir):
+        if name.startswith(f"{organization_id}_"):
+            try:
+                os.remove(os.path.join(config.cache_dir, name))
+            except OSError:
+                pass
+
+def cached(endpoint, organization_id, filters, fetch, refresh=False):
+    """
+    Returns the cached result of an API call when it is fresh, otherwise makes the call and caches its result
+    :param endpoint: Name of the API operation, like getOrganizationDevices
+    :param organization_id: ID of the organization the call is made against
+    :param filters: Dict with the filters passed to the call
+    :param fetch: Function without arguments making the call
+    :param refresh: Ignore the cached result and make the call anyway
+    :return: data: Result of the call
+    """
+    data = None
+    if config.cache_ttl>0 and not refresh:
+        data = get(endpoint, organization_id, filters)
+    if data is None:
+        data = fetch()
+        if config.cache_ttl>0:
+            put(endpoint, organization_id, filters, data)
+    return data
+
+async def async_cached(endpoint, organization_id, filters, fetch, refresh=False):
+    """
+    Async version of cached, for calls made through the async Dashboard API client
+    :param endpoint: Name of the API operation, like getOrganizationDevices
+    :param organization_id: ID of the organization the call is made against
+    :param filters: Dict with the filters passed to the call
+    :param fetch: Async function without arguments making the call
+    :param refresh: Ignore the cached result and make the call anyway
+    :return: data: Result of the call
+    """
+    data = None
+    if config.cache_ttl>0 and not refresh:
+        data = get(endpoint, organization_id, filters)
+    if data is None:
+        data = await fetch()
+        if config.cache_ttl>0:
+            put(endpoint, organization_id, filters, data)
+    return data
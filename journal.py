@@ -0,0 +1,156 @@
+import os
+import json
+import time
+
+class RunJournal:
+    """
+    Append-only record of every write a run completed: profile creates and updates per network, and camera
+    assignments per serial. Each write is appended as one JSON line as soon as it succeeds, so a run that dies partway
+    leaves a journal another run can resume from, skipping what was already done.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        # Completed steps, with (kind, network, profile name) keys for profiles and (kind, serial) keys for cameras
+        self.steps = {}
+        if resume and os.path.exists(path):
+            with open(path, encoding='utf-8') as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # The last line of a run that died while writing it
+                        continue
+                    self.steps[self.key(entry['kind'], entry['network'], entry['serial'], entry['target'])] = entry
+        # Line buffered, so every step reaches the file as soon as it is recorded
+        self.file = open(path, 'a' if resume else 'w', encoding='utf-8', newline='', buffering=1)
+
+    @staticmethod
+    def key(kind, network, serial, target):
+        if serial is None:
+            return kind, network, target
+        return kind, serial
+
+    def record(self, kind, action, network=None, serial=None, target=None, profile_id=None):
+        """
+        Appends one completed step
+        :param kind: wireless_profiles, quality_profiles, qp_assignment, wp_assignment or rtsp_settings
+        :param action: create, update or assign
+        :param network: ID of the target network, required for profiles
+        :param serial: Serial of the camera, for camera assignments
+        :param target: Name of the profile, or value, created, updated or assigned
+        :param profile_id: ID of the profile, for profiles
+        :return:
+        """
+        entry = {"time": round(time.time(), 3), "kind": kind, "action": action, "network": network,
+                 "serial": serial, "target": target, "id": profile_id}
+        self.file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self.steps[self.key(kind, network, serial, target)] = entry
+
+    def completed(self, kind, network=None, serial=None, target=None):
+        """
+        Finds a completed step. Camera assignments only count when they assigned the same target
+        :return: entry: The recorded step, or None if it was not completed
+        """
+        entry = self.steps.get(self.key(kind, network, serial, target))
+        if entry is not None and serial is not None and entry['target']!=target:
+            return None
+        return entry
+
+    def close(self):
+        self.file.close()
+
+_journal = None
+
+def open_journal(path, resume=False):
+    """
+    Starts journaling the writes of the run to path
+    :param path: Path of the journal
+    :param resume: Keep the steps already in the journal, to skip them, instead of starting a new one
+    :return: steps: Number of steps already in the journal
+    """
+    global _journal
+    _journal = RunJournal(path, resume)
+    return len(_journal.steps)
+
+def close_journal():
+    """ Closes the journal of the run, if one was opened. """
+    global _journal
+    if _journal is not None:
+        _journal.close()
+        _journal = None
+
+def camera_target(kind, camera):
+    """
+    Describes what a camera assignment assigns, so a resumed run only skips it if it still assigns the same
+    :param kind: qp_assignment, wp_assignment or rtsp_settings
+    :param camera: Camera to be assigned, as planned by plan_functions.plan_network
+    :return: target: Name of the quality profile, names of the wireless profiles, or externalRtspEnabled
+    """
+    if kind=="qp_assignment":
+        return camera['quality_profile_name']
+    elif kind=="wp_assignment":
+        return ', '.join(camera['wireless_profile_names'].values())
+    return "externalRtspEnabled"
+
+def record_profile(kind, action, network, response):
+    """
+    Journals a profile created or updated in a network, if a journal was opened
+    :param kind: wireless_profiles or quality_profiles
+    :param action: create or update
+    :param network: ID of the target network
+    :param response: Profile returned by the create or update call
+    :return:
+    """
+    if _journal is not None:
+        _journal.record(kind, action, network, target=response['name'], profile_id=response['id'])
+
+def record_camera(kind, camera, network=None):
+    """
+    Journals a camera assignment, if a journal was opened
+    :param kind: qp_assignment, wp_assignment or rtsp_settings
+    :param camera: Camera that was assigned, as planned by plan_functions.plan_network
+    :param network: ID of the target network, if known
+    :return:
+    """
+    if _journal is not None:
+        _journal.record(kind, "assign", network, camera['serial'], camera_target(kind, camera))
+
+def skip_completed(plans):
+    """
+    Removes the steps the journal records as completed from every network plan as it streams through. Profiles it
+    records as created are added to the profiles of the network, with their ID, so cameras can still be assigned them
+    :param plans: Iterable of network plans, as returned by plan_functions.plan_network
+    :return: plans: The same plans without the completed steps, as a generator
+    """
+    for plan in plans:
+        if _journal is None:
+            yield plan
+            continue
+
+        key = plan['networkId']
+        skipped = 0
+        plan = dict(plan)
+        for kind, create, update, net, changes in [
+            ("wireless_profiles", 'create_wp', 'update_wp', 'net_wp', 'wp_changes'),
+            ("quality_profiles", 'create_qp', 'update_qp', 'net_qp', 'qp_changes'),
+        ]:
+            created = [_journal.completed(kind, key, target=prof['name']) for prof in plan[create]]
+            plan[net] = plan[net] + [{"name": entry['target'], "id": entry['id']} for entry in created if entry]
+            plan[create] = [prof for prof, entry in zip(plan[create], created) if entry is None]
+            updates = [prof for prof in plan[update] if _journal.completed(kind, key, target=prof['name']) is None]
+            plan[changes] = {name: change for name, change in plan[changes].items()
+                             if name in [prof['name'] for prof in updates]}
+            skipped += sum(1 for entry in created if entry) + len(plan[update]) - len(updates)
+            plan[update] = updates
+        for kind, assignments in [("qp_assignment", 'qp_assignments'), ("wp_assignment", 'wp_assignments'),
+                                  ("rtsp_settings", 'rtsp_assignments')]:
+            remaining = [camera for camera in plan[assignments]
+                         if _journal.completed(kind, serial=camera['serial'],
+                                               target=camera_target(kind, camera)) is None]
+            skipped += len(plan[assignments]) - len(remaining)
+            plan[assignments] = remaining
+
+        if skipped>0:
+            print(f"Skipping {skipped} changes to network {key} already applied by the interrupted run.")
+        yield plan
@@ -1,181 +1,260 @@
 import config
+import clients
+import rate_limiter
+import metrics
 import read_functions
 import write_functions
-from tabulate import tabulate
-import pandas as pd
+import plan_functions
+import scheduler
+import plan_file
+import report
+import journal
+import profiler
+import multi_org
 import asyncio
-import meraki.aio
-
-# Instantiate async Meraki API client
-aiomeraki = meraki.aio.AsyncDashboardAPI(
-            config.api_key,
-            base_url="https://api.meraki.com/api/v1",
-            log_file_prefix=__file__[:-3],
-            print_console=False,
-            maximum_retries=config.max_retries,
-            maximum_concurrent_requests=config.max_requests,
-)
-# Instantiate synchronous Meraki API client
-dashboard = meraki.DashboardAPI(
-    config.api_key,
-    base_url="https://api.meraki.com/api/v1",
-    log_file_prefix=__file__[:-3],
-    print_console=config.console_logging,
-    )
+import argparse
 
-if __name__ == "__main__":
-    # -------------------Gather camera specific data-------------------
-    loop = asyncio.get_event_loop()
-    target_devices, target_networks, src_quality_profiles, src_wireless_profiles, src_camera_alerts, net_attributes \
-        = loop.run_until_complete(read_functions.main(aiomeraki))
+async def assign_cameras(qp_device_list, wp_device_list, rtsp_device_list):
+    """
+    Assigns Quality Profiles, Wireless Profiles and RTSP settings to cameras through the async client, with at most
+    config.max_requests camera updates in flight at a time
+    :param qp_device_list: List of cameras to be assigned quality profiles
+    :param wp_device_list: List of cameras to be assigned wireless profiles
+    :param rtsp_device_list: List of cameras to have RTSP turned on
+    :return: results: Dict with the successes and failures of each assignment
+    """
+    # The write phase reuses the async client, and the pooled connections, of the read phase
+    aiomeraki = clients.aiomeraki()
+    semaphore = asyncio.Semaphore(config.max_requests)
+    results = {
+        "quality_profiles": await write_functions.async_cam_qp_assigner(
+            aiomeraki, qp_device_list, semaphore),
+        "wireless_profiles": await write_functions.async_cam_wp_assigner(
+            aiomeraki, wp_device_list, semaphore),
+        "rtsp_settings": await write_functions.async_cam_rtsp_enabler(
+            aiomeraki, rtsp_device_list, semaphore),
+    }
+    return results
 
+def sync_network(plan, assignments):
+    """
+    Applies the plan of a network: copies the profiles, then assigns them and RTSP settings to its cameras, for the
+    modules enabled in config.modules. In async and batch write modes, the camera assignments are collected instead of
+    sent
+    :param plan: Dict with the changes to the network, as returned by plan_functions.plan_network
+    :param assignments: Dict with lists collecting the camera assignments of every network, under qp, wp and rtsp
+    :return:
+    """
+    key = plan['networkId']
+    print("Working on network",key,":")
+    # Profiles and cameras of modules disabled in config.modules are left untouched
+    wp_registry = {}
+    qp_registry = {}
 
-    for key in net_attributes.keys():
-        print("Working on network",key,":")
-
+    with profiler.phase("profile_writes", key):
         # -------------------Copy Wireless Profiles-------------------
+        if 'wireless_profiles' in config.modules:
+            # In supervised mode the profile writers show these before asking, so they are only shown here otherwise
+            if config.verbose==True and config.supervised!=True:
+                print("Wireless Profiles to be Created:")
+                print(report.table(plan['create_wp']))
+                print("Wireless Profiles to be Updated:")
+                print(report.table(plan_functions.profile_change_rows(plan['wp_changes'])))
 
-        # Construct a set of the names in the template Wireless Profiles, and another of the names in the network
-        # Wireless Profiles. Compare both sets, and determine which profiles must be created and which must be updated
-        template_wp_set = set(wp['name'] for wp in src_wireless_profiles)
-        net_wp_set = set(wp['name'] for wp in net_attributes[key]['wireless_profiles'])
-        to_create = template_wp_set.difference(net_wp_set)
-        to_update = template_wp_set.difference(to_create)
-
-        # Construct list of wireless profiles to be created and updated based on the result of the previous set
-        # operation
-        create_wireless_profiles = [wp for wp in src_wireless_profiles if wp['name'] in to_create]
-        update_wireless_profiles = [wp for wp in src_wireless_profiles if wp['name'] in to_update]
-        for wp in update_wireless_profiles:
-            for wpn in net_attributes[key]['wireless_profiles']:
-                if wp['name']==wpn['name']:
-                    wp['id']=wpn['id']
-
-        print("Wireless Profiles to be Created:")
-        print(tabulate(pd.DataFrame(create_wireless_profiles), headers='keys', tablefmt='fancy_grid'))
-        print("Wireless Profiles to be Updated:")
-        print(tabulate(pd.DataFrame(update_wireless_profiles), headers='keys', tablefmt='fancy_grid'))
-
-        write_functions.cam_wireless_profiles(
-            dashboard=dashboard,
-            dst_net_id=key,
-            create_wp=create_wireless_profiles,
-            update_wp=update_wireless_profiles
-        )
-
-        print(f"Wireless Profiles copied to network {key} successfully.")
+            wp_registry = write_functions.cam_wireless_profiles(
+                dashboard=clients.dashboard(),
+                dst_net_id=key,
+                create_wp=plan['create_wp'],
+                update_wp=plan['update_wp'],
+                net_wp=plan['net_wp']
+            )
+
+            print(f"Wireless Profiles copied to network {key} successfully.")
 
         # -------------------Copy Quality Profiles-------------------
+        if 'quality_profiles' in config.modules:
+            if config.verbose==True and config.supervised!=True:
+                print("Quality Profiles to be Created:")
+                print(report.table(plan['create_qp']))
+                print("Quality Profiles to be Updated:")
+                print(report.table(plan_functions.profile_change_rows(plan['qp_changes'])))
+
+            qp_registry = write_functions.cam_quality_profiles(
+                dashboard=clients.dashboard(),
+                dst_net_id=key,
+                create_qp=plan['create_qp'],
+                update_qp=plan['update_qp'],
+                net_qp=plan['net_qp']
+            )
+
+            print(f"Quality Profiles copied to network {key} successfully.")
+
+    # In async and batch write modes this only collects the assignments, which are timed when sent at the end
+    with profiler.phase("assignments", key):
+        # -------------------Assign QPs to cameras-------------------
+        if 'quality_profiles' in config.modules:
+            qp_device_list = plan_functions.resolve_qp_ids(plan['qp_assignments'], qp_registry)
+
+            if config.write_mode in ('async', 'batch'):
+                assignments['qp'].extend(qp_device_list)
+            else:
+                write_functions.cam_qp_assigner(dashboard=clients.dashboard(), qp_device_list=qp_device_list)
+
+        # -------------------Assign WPs to cameras-------------------
+        if 'wireless_profiles' in config.modules:
+            wp_device_list = plan_functions.resolve_wp_ids(plan['wp_assignments'], wp_registry)
+
+            if config.write_mode in ('async', 'batch'):
+                assignments['wp'].extend(wp_device_list)
+            else:
+                write_functions.cam_wp_assigner(dashboard=clients.dashboard(), wp_device_list=wp_device_list)
+
+        # -------------------Assign RTSP Settings to cameras-------------------
+        if 'rtsp_settings' in config.modules:
+            if config.write_mode in ('async', 'batch'):
+                assignments['rtsp'].extend(plan['rtsp_assignments'])
+            else:
+                write_functions.cam_rtsp_enabler(dashboard=clients.dashboard(),
+                                                 rtsp_device_list=plan['rtsp_assignments'])
+
+def plan_networks(devices_by_network, src_quality_profiles, src_wireless_profiles, net_attributes):
+    """
+    Plans every target network as the plans are consumed, timing each one
+    :param devices_by_network: Dict with network IDs as keys, and lists of cameras as returned by parse_device as values
+    :param src_quality_profiles: List of quality profiles in the source network
+    :param src_wireless_profiles: List of wireless profiles in the source network
+    :param net_attributes: Dict with network IDs as keys, and the profiles currently in each network as values
+    :return: plans: Generator of network plans, as returned by plan_functions.plan_network
+    """
+    for key in net_attributes.keys():
+        with profiler.phase("plan", key):
+            plan = plan_functions.plan_network(
+                key, devices_by_network.get(key, []), src_quality_profiles, src_wireless_profiles, net_attributes[key])
+        yield plan
+
+def parse_args(argv=None):
+    """
+    Parses the command line arguments
+    :param argv: List of arguments, defaults to the ones the script was run with
+    :return: args: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Copy and assign camera quality and wireless profiles, and enable RTSP")
+    parser.add_argument('--refresh-cache', action='store_true',
+                        help="fetch organization devices and networks from the API even if they are cached")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--plan', metavar='PLAN_FILE',
+                      help="read the organizations and write every planned change to PLAN_FILE without applying it")
+    mode.add_argument('--apply', metavar='PLAN_FILE',
+                      help="apply the changes in PLAN_FILE without reading the organizations again")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip the profile copies and camera assignments an interrupted run already applied, as "
+                             "recorded in the journal_file of config.py")
+    parser.add_argument('--profile', action='store_true',
+                        help="time every phase of the run, in total and per network, and print the slowest ones")
+    parser.add_argument('--cprofile', metavar='STATS_FILE',
+                        help="also run under cProfile, write its stats to STATS_FILE and print the slowest functions")
+    parser.add_argument('--all-orgs', action='store_true',
+                        help="sync every organization in the organizations of config.py, in parallel worker processes")
+    parser.add_argument('--report', metavar='REPORT_FILE',
+                        help="stream a record of every planned and applied change to REPORT_FILE, as CSV if it ends in "
+                             ".csv and as JSON lines otherwise")
+    args = parser.parse_args(argv)
+    if args.all_orgs and (args.plan or args.apply or args.cprofile):
+        parser.error("--all-orgs can't be combined with --plan, --apply or --cprofile")
+    return args
 
-        # Construct a set of the names in the template Quality Profiles, and another of the names in the network
-        # Quality Profiles. Compare both sets, and determine which profiles must be created and which must be updated
-        template_qp_set = set(qp['name'] for qp in src_quality_profiles)
-        net_qp_set = set(qp['name'] for qp in net_attributes[key]['quality_profiles'])
-        to_create = template_qp_set.difference(net_qp_set)
-        to_update = template_qp_set.difference(to_create)
-
-        # Construct list of quality profiles to be created and updated based on the result of the previous set
-        # operation
-        create_quality_profiles = [qp for qp in src_quality_profiles if qp['name'] in to_create]
-        update_quality_profiles = [qp for qp in src_quality_profiles if qp['name'] in to_update]
-        for qp in update_quality_profiles:
-            for qpn in net_attributes[key]['quality_profiles']:
-                if qp['name']==qpn['name']:
-                    qp['id']=qpn['id']
-
-        print("Quality Profiles to be Created:")
-        print(tabulate(pd.DataFrame(create_quality_profiles), headers='keys', tablefmt='fancy_grid'))
-        print("Quality Profiles to be Updated:")
-        print(tabulate(pd.DataFrame(update_quality_profiles), headers='keys', tablefmt='fancy_grid'))
-
-        write_functions.cam_quality_profiles(
-            dashboard=dashboard,
-            dst_net_id=key,
-            create_qp=create_quality_profiles,
-            update_qp=update_quality_profiles
-        )
-
-        print(f"Quality Profiles copied to network {key} successfully.")
-
-        # -------------------Prepare QPs to assign to cameras-------------------
-        # From the list of target device, find those with tags starting with qp-
-        # Check that no device has more than 1 qp- tag
-        qp_target_devices = []
-        for dev in target_devices:
-            if dev['networkId']==key:
-                qp_tags = []
-                for tag in dev['tags']:
-                    if 'qp-' in tag:
-                        qp_tags.append(tag)
-                if len(qp_tags)>0 and len(qp_tags)<2:
-                    qp_target_devices.append(dev)
-                elif len(qp_tags)>1:
-                    print(f"Error - A given camera may only have a single qp- tag for quality profiles. Skipping camera {dev['serial']}")
-
-        # For every qp- tag, find a matching profile and assign it to the camera
-        net_qps = dashboard.camera.getNetworkCameraQualityRetentionProfiles(key)
-        qp_device_list = []
-        for dev in qp_target_devices:
-            for tag in dev['tags']:
-                for qp in net_qps:
-                    if tag in qp['name']:
-                        device = {"name": dev['name'], "serial": dev['serial'], "quality_profile_name": qp['name'], "quality_profile_id": qp['id']}
-                        qp_device_list.append(device)
-
-        write_functions.cam_qp_assigner(dashboard=dashboard, qp_device_list=qp_device_list)
-
-        # -------------------Prepare WPs to assign to cameras-------------------
-        # For every target device, find those tagged with wp-x-y-z
-        # Check that no device has more than 1 wp- tag
-        wp_target_devices = []
-        for dev in target_devices:
-            if dev['networkId']==key:
-                wp_tags = []
-                for tag in dev['tags']:
-                    if 'wp-' in tag:
-                        wp_tags.append(tag)
-                if len(wp_tags)>0 and len(wp_tags)<2:
-                    wp_target_devices.append(dev)
-                elif len(wp_tags)>1:
-                    print(f"Error - A given camera may only have a single wp- tag for wireless profiles. Skipping camera {dev['serial']}")
-
-        # For every wp- tag, check that it doesn't reference more than 3 wireless profiles, and that it references
-        # at least 2. Then, construct a dict of IDs by finding matches in the WPs of the network
-        net_wps = dashboard.camera.getNetworkCameraWirelessProfiles(key)
-        wp_device_list = []
-        for dev in wp_target_devices:
-            for tag in dev['tags']:
-                if 'wp-' in tag:
-                    wp_tag = tag.split("-")
-                    are_digits = all(ele.isdigit() for ele in wp_tag[1:])
-                    if len(wp_tag)>=3 and len(wp_tag)<=4 and are_digits==True:
-                        wps = []
-                        for wp in wp_tag[1:]:
-                            for prof in net_wps:
-                                if f"-{wp}-" in prof['name']:
-                                    wps.append(prof['id'])
-                        if len(wps)==2:
-                            ids = {"primary": wps[0], "secondary": wps[1]}
-                        elif len(wps)==3:
-                            ids = {"primary": wps[0], "secondary": wps[1], "backup": wps[2]}
-                        device = {"name": dev['name'], "serial": dev['serial'], "wireless_profiles": ids}
-                        wp_device_list.append(device)
-                    elif len(wp_tag)<3 and are_digits==True:
-                        print(f"Error - A given camera must have at least 2 different wireless profiles assigned. Camera {dev['serial']} only has {len(wp_tag)-1} WPs assigned.")
-                    elif len(wp_tag)>4 and are_digits==True:
-                        print(f"Error - A given camera may only have 3 different wireless profiles assigned. Skipping camera {dev['serial']}")
-                    elif are_digits==False:
-                        print(f"Error - The WP tag in a camera should contain dash (-) separated digits after wp only, like wp-2-1-3, where the digits reference the order of WPs to be assigned. Camera {dev['serial']} has the tag {tag} assigned.")
-
-        write_functions.cam_wp_assigner(dashboard=dashboard, wp_device_list=wp_device_list)
-
-        # -------------------Prepare RTSP Settings to assign to cameras-------------------
-        # From the target devices, find those tagged with "rtsp" and enable RTSP on those
-        rtsp_device_list = []
-        for dev in target_devices:
-            if dev['networkId'] == key:
-                if 'rtsp' in dev['tags']:
-                    device = {"name": dev['name'], "serial": dev['serial'], "rtsp_url": f"rtsp://{dev['lanIp']}:9000/live"}
-                    rtsp_device_list.append(device)
-
-        write_functions.cam_rtsp_enabler(dashboard=dashboard, rtsp_device_list=rtsp_device_list)
+def run(args):
+    """
+    Reads the organizations and plans every target network, or streams the plans of a plan file, then applies the plans
+    or writes them to a plan file
+    :param args: Parsed command line arguments, as returned by parse_args
+    :return:
+    """
+    unknown_modules = [module for module in config.modules if module not in plan_functions.MODULES]
+    if len(unknown_modules)>0:
+        print(f"Unknown modules {', '.join(unknown_modules)} in config.py. Available modules: "
+              f"{', '.join(plan_functions.MODULES)}. Aborting Script!")
+        return
+
+    loop = asyncio.get_event_loop()
+    if args.apply:
+        # -------------------Stream the plan of every network from the plan file-------------------
+        plans = plan_file.read_plan(args.apply)
+    else:
+        # -------------------Gather camera specific data-------------------
+        target_devices, target_networks, src_quality_profiles, src_wireless_profiles, net_attributes \
+            = loop.run_until_complete(read_functions.main(clients.aiomeraki(), args.refresh_cache))
+
+        # Bucket target cameras by network and parse their tags in a single pass
+        devices_by_network = plan_functions.partition_devices(target_devices)
+
+        # -------------------Plan the changes to every network-------------------
+        plans = plan_networks(devices_by_network, src_quality_profiles, src_wireless_profiles, net_attributes)
+
+    if config.journal_file and not args.plan:
+        # Every applied change is journaled as it completes. When resuming, the changes already journaled are left out
+        steps = journal.open_journal(config.journal_file, args.resume)
+        if args.resume:
+            print(f"Resuming from {steps} changes recorded in {config.journal_file}.")
+            plans = journal.skip_completed(plans)
+
+    if args.report:
+        # Planned changes are recorded as each network's plan streams through
+        report.open_report(args.report)
+        plans = report.record_plans(plans)
+
+    if args.plan:
+        count = plan_file.write_plan(args.plan, plans)
+        print(f"Plan for {count} networks written to {args.plan}. Apply it with: python main.py --apply {args.plan}")
+    elif config.write_mode=='scheduled':
+        # Every network's stages run concurrently, following the per-network task graph of scheduler.py
+        loop.run_until_complete(scheduler.run_networks(plans))
+    else:
+        # In async and batch write modes, camera assignments are collected across all networks and sent at the end
+        assignments = {"qp": [], "wp": [], "rtsp": []}
+        for plan in plans:
+            sync_network(plan, assignments)
+
+        if config.write_mode=='async':
+            with profiler.phase("assignments"):
+                loop.run_until_complete(assign_cameras(assignments['qp'], assignments['wp'], assignments['rtsp']))
+        elif config.write_mode=='batch':
+            with profiler.phase("assignments"):
+                write_functions.cam_batch_assigner(
+                    dashboard=clients.dashboard(),
+                    dst_org_id=config.dst_org_id,
+                    qp_device_list=assignments['qp'],
+                    wp_device_list=assignments['wp'],
+                    rtsp_device_list=assignments['rtsp']
+                )
+
+    if config.verbose==True and config.rate_limit>0:
+        print("Rate limiter:")
+        print(report.table([rate_limiter.shared_limiter().stats()]))
+    if config.verbose==True:
+        print("API calls by operation:")
+        print(report.table(metrics.shared_metrics().stats()))
+    if config.metrics_file:
+        metrics.write(config.metrics_file)
+
+    loop.run_until_complete(clients.close())
+    journal.close_journal()
+
+    if args.report:
+        report.close_report()
+        print(f"Report of planned and applied changes written to {args.report}")
+
+    profiler.summary()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.all_orgs:
+        multi_org.run_organizations(args)
+    elif args.profile or args.cprofile:
+        profiler.enable()
+        if args.cprofile:
+            profiler.run_profiled(run, args.cprofile, args)
+        else:
+            run(args)
+    else:
+        run(args)
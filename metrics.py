@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import threading
+import contextvars
+import meraki
+
+# Upper bounds, in seconds, of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Prefix of every metric in the Prometheus text file
+PROMETHEUS_PREFIX = 'merakicamprofiler_api'
+
+# Operation of the SDK call an HTTP request belongs to, set for the duration of the call. Being a context variable,
+# every asyncio task and thread sees the operation it is running
+_operation = contextvars.ContextVar('operation', default=None)
+
+class EndpointMetrics:
+    """
+    Counters of a single Dashboard API operation.
+
+    Attributes:
+        calls -- number of SDK calls, one per page for paginated calls
+        requests -- number of HTTP requests sent, retries included
+        throttled -- number of 429 responses received
+        errors -- number of calls that raised an error
+        bytes_sent -- bytes of the request bodies
+        bytes_received -- bytes of the response bodies
+        latencies -- seconds every call took, retries and rate limiting included
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latencies = []
+
+    def percentile(self, fraction):
+        """ Latency below which the given fraction of the calls finished, by nearest rank. """
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+    def stats(self):
+        """
+        Summarizes the operation for display and export
+        :return: stats: Dict with the counters, retries and latency percentiles of the operation
+        """
+        return {
+            "calls": self.calls,
+            "requests": self.requests,
+            "retries": max(0, self.requests - self.calls),
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency_p50_s": round(self.percentile(0.5) or 0, 4),
+            "latency_p90_s": round(self.percentile(0.9) or 0, 4),
+            "latency_p99_s": round(self.percentile(0.99) or 0, 4),
+            "latency_max_s": round(max(self.latencies, default=0), 4),
+            "latency_sum_s": round(sum(self.latencies), 4),
+        }
+
+class ApiMetrics:
+    """
+    Per-operation metrics of every Dashboard API call made by the sync and async clients it is attached to: call and
+    request counts, retries, 429 responses, errors, bytes transferred and latency percentiles. Written at the end of a
+    run as JSON and in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    def endpoint(self, operation):
+        # Requests sent outside of an SDK call, which the SDK never does, are still counted
+        operation = operation or 'unknown'
+        if operation not in self.endpoints:
+            self.endpoints[operation] = EndpointMetrics()
+        return self.endpoints[operation]
+
+    def call(self, operation, seconds, failed):
+        """
+        Records a finished SDK call
+        :param operation: Operation of the call, as named by the SDK
+        :param seconds: Seconds the call took
+        :param failed: Whether the call raised an error
+        :return:
+        """
+        with self.lock:
+            endpoint = self.endpoint(operation)
+            endpoint.calls += 1
+            endpoint.errors += 1 if failed else 0
+            endpoint.latencies.append(seconds)
+
+    def request(self, operation, status, bytes_sent, bytes_received):
+        """
+        Records an HTTP request sent during an SDK call
+        :param operation: Operation of the call, as named by the SDK
+        :param status: HTTP status code of the response
+        :param bytes_sent: Bytes of the request body
+        :param bytes_received: Bytes of the response body
+        :return:
+        """
+        with self.lock:
+            endpoint = self.endpoint(operation)
+            endpoint.requests += 1
+            endpoint.throttled += 1 if status==429 else 0
+            endpoint.bytes_sent += bytes_sent
+            endpoint.bytes_received += bytes_received
+
+    def stats(self):
+        """
+        Summarizes every operation, busiest first
+        :return: rows: List of dicts with the operation and its stats
+        """
+        with self.lock:
+            rows = [{"operation": operation, **endpoint.stats()} for operation, endpoint in self.endpoints.items()]
+        return sorted(rows, key=lambda row: row['latency_sum_s'], reverse=True)
+
+    def write_json(self, path):
+        """ Writes the stats of every operation to path as JSON. """
+        with open(path, 'w', encoding='utf-8') as metrics_file:
+            json.dump({"started": round(self.started, 3), "finished": round(time.time(), 3),
+                       "operations": self.stats()}, metrics_file, indent=2)
+
+    def prometheus(self):
+        """
+        Renders every operation in the Prometheus text exposition format
+        :return: text: Counters and latency histograms labelled by operation
+        """
+        counters = [
+            ("calls_total", "calls", "Dashboard API calls, one per page for paginated calls"),
+            ("requests_total", "requests", "HTTP requests sent to the Dashboard API, retries included"),
+            ("retries_total", "retries", "HTTP requests retried by the SDK"),
+            ("throttled_total", "throttled", "429 responses received"),
+            ("errors_total", "errors", "Dashboard API calls that raised an error"),
+            ("request_bytes_total", "bytes_sent", "Bytes of the request bodies"),
+            ("response_bytes_total", "bytes_received", "Bytes of the response bodies"),
+        ]
+        with self.lock:
+            endpoints = {operation: (endpoint.stats(), list(endpoint.latencies))
+                         for operation, endpoint in sorted(self.endpoints.items())}
+
+        lines = [f"# HELP {PROMETHEUS_PREFIX}_run_timestamp_seconds Time the run started",
+                 f"# TYPE {PROMETHEUS_PREFIX}_run_timestamp_seconds gauge",
+                 f"{PROMETHEUS_PREFIX}_run_timestamp_seconds {round(self.started, 3)}"]
+        for name, field, description in counters:
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {description}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} counter")
+            for operation, (stats, latencies) in endpoints.items():
+                lines.append(f'{PROMETHEUS_PREFIX}_{name}{{operation="{operation}"}} {stats[field]}')
+
+        name = f"{PROMETHEUS_PREFIX}_call_duration_seconds"
+        lines.append(f"# HELP {name} Seconds Dashboard API calls took, retries and rate limiting included")
+        lines.append(f"# TYPE {name} histogram")
+        for operation, (stats, latencies) in endpoints.items():
+            for bound in LATENCY_BUCKETS:
+                count = sum(1 for latency in latencies if latency<=bound)
+                lines.append(f'{name}_bucket{{operation="{operation}",le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{operation="{operation}",le="+Inf"}} {len(latencies)}')
+            lines.append(f'{name}_sum{{operation="{operation}"}} {round(sum(latencies), 6)}')
+            lines.append(f'{name}_count{{operation="{operation}"}} {len(latencies)}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """ Writes every operation to path in the Prometheus text exposition format. The file is replaced in one step,
+        so a textfile collector never reads it half written. """
+        with open(path + '.tmp', 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write(self.prometheus())
+        os.replace(path + '.tmp', path)
+
+_metrics = None
+
+def shared_metrics():
+    """
+    Returns the metrics shared by every client in the process, creating them on first use
+    :return: metrics: Shared ApiMetrics
+    """
+    global _metrics
+    if _metrics is None:
+        _metrics = ApiMetrics()
+    return _metrics
+
+def write(prefix, metrics=None):
+    """
+    Writes the metrics of the run to prefix.json and prefix.prom
+    :param prefix: Path of the files without extension
+    :param metrics: ApiMetrics to write, defaults to the shared metrics
+    :return:
+    """
+    metrics = metrics or shared_metrics()
+    metrics.write_json(prefix + '.json')
+    metrics.write_prometheus(prefix + '.prom')
+
+def attach(client, metrics=None):
+    """
+    Records the metrics of every call a Dashboard API client makes. Works with both meraki.DashboardAPI and
+    meraki.aio.AsyncDashboardAPI: calls are timed around the retry logic of the SDK, and every HTTP request underneath
+    it is counted against the operation of its call.
+    :param client: Sync or async Dashboard API client
+    :param metrics: ApiMetrics to use, defaults to the shared metrics
+    :return: client: The same client
+    """
+    metrics = metrics or shared_metrics()
+    rest_session = client._session
+    http_session = rest_session._req_session
+    send = http_session.request
+
+    if isinstance(client, meraki.DashboardAPI):
+        call = rest_session.request
+
+        def timed_call(metadata, method, url, **kwargs):
+            token = _operation.set(metadata['operation'])
+            start = time.perf_counter()
+            failed = True
+            try:
+                response = call(metadata, method, url, **kwargs)
+                failed = False
+                return response
+            finally:
+                metrics.call(metadata['operation'], time.perf_counter() - start, failed)
+                _operation.reset(token)
+
+        def request(method, url, *args, **kwargs):
+            response = send(method, url, *args, **kwargs)
+            body = response.request.body
+            metrics.request(_operation.get(), response.status_code, len(body) if body else 0, len(response.content))
+            return response
+
+        rest_session.request = timed_call
+    else:
+        # The concurrency semaphore of the SDK is taken in request, so calls are timed from _request, once they run
+        call = rest_session._request
+
+        async def timed_call(metadata, method, url, **kwargs):
+            token = _operation.set(metadata['operation'])
+            start = time.perf_counter()
+            failed = True
+            try:
+                response = await call(metadata, method, url, **kwargs)
+                failed = False
+                return response
+            finally:
+                metrics.call(metadata['operation'], time.perf_counter() - start, failed)
+                _operation.reset(token)
+
+        async def request(method, url, *args, **kwargs):
+            response = await send(method, url, *args, **kwargs)
+            # The SDK reads every body anyway, and aiohttp keeps it once read
+            body = await response.read()
+            sent = len(json.dumps(kwargs['json'])) if kwargs.get('json') is not None else 0
+            metrics.request(_operation.get(), response.status, sent, len(body))
+            return response
+
+        rest_session._request = timed_call
+
+    http_session.request = request
+    return client
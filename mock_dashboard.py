@@ -0,0 +1,495 @@
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Error Dashboard returns when an organization already has 5 confirmed batches that have not finished
+ACTION_BATCH_CONCURRENCY_ERROR = "Too many concurrently executing batches. Maximum is 5 confirmed but not yet executed batches."
+MAXIMUM_ACTIVE_ACTION_BATCHES = 5
+
+class TokenBucket:
+    """
+    Per-organization request budget, refilled at a constant rate like the Dashboard API rate limit.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """ Takes a token, returning 0 if there was one, or the seconds until the next one otherwise. """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+class MockDashboard:
+    """
+    In-memory stand-in for the Dashboard API endpoints used by main.py and camTagger.py: organization devices and
+    networks, camera quality and wireless profiles, per-camera settings, and action batches.
+    """
+
+    def __init__(self, latency=0.0, rate_limit=10, burst=None, action_latency=0.05, action_failure_rate=0.0,
+                 seed=None):
+        """
+        Creates an empty mock Dashboard.
+        @param latency: seconds added to every request
+        @param rate_limit: requests per second allowed per organization before answering 429, 0 disables rate limiting
+        @param burst: requests allowed in a burst per organization, defaults to rate_limit
+        @param action_latency: seconds each action of an asynchronous action batch takes to run
+        @param action_failure_rate: chance of each action of an action batch failing with a transient error, which
+        fails its whole batch
+        @param seed: seed of the transient action failures
+        """
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.burst = burst or rate_limit
+        self.action_latency = action_latency
+        self.action_failure_rate = action_failure_rate
+        self.failures = random.Random(seed)
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """ Deletes every organization and resets the counters. """
+        with self.lock:
+            self.networks = {}
+            self.devices = {}
+            self.device_orgs = {}
+            self.camera_settings = {}
+            self.quality_profiles = {}
+            self.wireless_profiles = {}
+            self.alerts = {}
+            self.action_batches = {}
+            self.buckets = {}
+            self.next_id = 1000
+            self.calls = Counter()
+            self.throttled = Counter()
+            self.bytes_sent = 0
+
+    def new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return str(self.next_id)
+
+    def generate_fleet(self, org_id, src_net_id, networks=10, cameras=100, profiles=3, tag='camProfiler', seed=0):
+        """
+        Populates an organization with a source network holding qp- and wp- profiles, and tagged target networks with
+        tagged cameras.
+        @param org_id: ID of the organization
+        @param src_net_id: ID of the source network
+        @param networks: number of target networks
+        @param cameras: number of cameras, spread evenly across the target networks
+        @param profiles: number of quality profiles and of wireless profiles in the source network
+        @param tag: tag of the target networks and cameras
+        @param seed: seed of the random tags of the cameras
+        @return: serials of the cameras
+        """
+        rng = random.Random(seed)
+        self.add_network(org_id, src_net_id, "Camera Profiles Template", [])
+        for number in range(1, profiles + 1):
+            self.add_quality_profile(src_net_id, {
+                "name": f"qp-{number}-profile{number}",
+                "motionBasedRetentionEnabled": False,
+                "restrictedBandwidthModeEnabled": False,
+                "audioRecordingEnabled": number % 2 == 0,
+                "cloudArchiveEnabled": False,
+                "motionDetectorVersion": 2,
+                "maxRetentionDays": 30 * number,
+                "videoSettings": {"MV12/MV22/MV72": {"quality": "High", "resolution": "1920x1080"}},
+            })
+            self.add_wireless_profile(src_net_id, {
+                "name": f"wp-{number}-ssid{number}",
+                "ssid": {"name": f"cameras-{number}", "authMode": "psk", "encryptionMode": "wpa2", "psk": "secret123"},
+            })
+
+        net_ids = [f"L_{100000 + number}" for number in range(networks)]
+        for number, net_id in enumerate(net_ids):
+            self.add_network(org_id, net_id, f"Site {number}", [tag])
+            # Half of the networks already have a stale copy of the first quality profile
+            if number % 2 == 0:
+                self.add_quality_profile(net_id, {"name": "qp-1-profile1", "maxRetentionDays": 7})
+
+        serials = []
+        for number in range(cameras):
+            serial = f"Q2MV-{number // 10000:04d}-{number % 10000:04d}"
+            primary, secondary = rng.sample(range(1, profiles + 1), 2) if profiles > 1 else (1, 1)
+            tags = [tag, f"qp-{rng.randint(1, profiles)}", f"wp-{primary}-{secondary}"]
+            if rng.random() < 0.5:
+                tags.append('rtsp')
+            self.add_device(org_id, net_ids[number % networks], {
+                "serial": serial,
+                "name": f"Camera {number}",
+                "model": "MV12WE",
+                "mac": f"4c:c8:a1:{number // 65536 % 256:02x}:{number // 256 % 256:02x}:{number % 256:02x}",
+                "lanIp": f"10.{number // 65536 % 256}.{number // 256 % 256}.{number % 256}",
+                "tags": tags,
+                "address": "",
+                "notes": "",
+                "lat": 37.4180951010362,
+                "lng": -122.098531723022,
+            })
+            serials.append(serial)
+        return serials
+
+    def add_network(self, org_id, net_id, name, tags):
+        self.networks[net_id] = {"id": net_id, "organizationId": org_id, "name": name, "tags": list(tags),
+                                 "productTypes": ["camera"]}
+        self.quality_profiles.setdefault(net_id, {})
+        self.wireless_profiles.setdefault(net_id, {})
+        self.alerts[net_id] = {"defaultDestinations": {"emails": [], "allAdmins": False}, "alerts": []}
+
+    def add_device(self, org_id, net_id, device):
+        self.devices[device['serial']] = dict(device, networkId=net_id)
+        self.device_orgs[device['serial']] = org_id
+        self.camera_settings[device['serial']] = {
+            "quality": {"profileId": None, "motionBasedRetentionEnabled": False},
+            "wireless": {"ids": {"primary": None, "secondary": None, "backup": None}},
+            "video": {"externalRtspEnabled": False, "rtspUrl": None},
+        }
+
+    def add_quality_profile(self, net_id, profile):
+        profile = dict(profile, id=self.new_id(), networkId=net_id)
+        self.quality_profiles[net_id][profile['id']] = profile
+        return profile
+
+    def add_wireless_profile(self, net_id, profile):
+        profile = dict(profile, id=self.new_id())
+        self.wireless_profiles[net_id][profile['id']] = profile
+        return profile
+
+    # Request handling
+    # --------------------------------------------------
+    def organization_of(self, path):
+        """ Finds the organization a request counts against for rate limiting. """
+        parts = path.strip('/').split('/')
+        if len(parts) >= 2 and parts[0] == 'organizations':
+            return parts[1]
+        if len(parts) >= 2 and parts[0] == 'networks' and parts[1] in self.networks:
+            return self.networks[parts[1]]['organizationId']
+        if len(parts) >= 2 and parts[0] == 'devices':
+            return self.device_orgs.get(parts[1], 'unknown')
+        return 'unknown'
+
+    def request(self, method, path, query, body):
+        """
+        Handles an API request.
+        @param method: HTTP method
+        @param path: path of the request, without the /api/v1 prefix
+        @param query: dict of query parameters as returned by parse_qs
+        @param body: parsed JSON body
+        @return: status code, JSON serializable response, dict of extra headers
+        """
+        route = self.match(method, path)
+        operation = route[0] if route else f"{method} {path}"
+        if self.rate_limit:
+            with self.lock:
+                org_id = self.organization_of(path)
+                bucket = self.buckets.setdefault(org_id, TokenBucket(self.rate_limit, self.burst))
+                wait = bucket.take()
+                if wait:
+                    self.throttled[operation] += 1
+            if wait:
+                return 429, {"errors": ["API rate limit exceeded for organization"]}, \
+                       {"Retry-After": str(max(1, math.ceil(wait)))}
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.calls[operation] += 1
+            if route is None:
+                return 404, {"errors": [f"No route for {method} {path}"]}, {}
+            operation, handler, params = route
+            try:
+                return handler(query, body, *params) + ({},)
+            except KeyError as e:
+                return 404, {"errors": [f"Not found: {e}"]}, {}
+
+    def match(self, method, path):
+        for route_method, pattern, operation, handler in self.routes():
+            if route_method == method:
+                found = re.fullmatch(pattern, path)
+                if found:
+                    return operation, handler, found.groups()
+        return None
+
+    def routes(self):
+        return [
+            ('GET', r'/organizations/([^/]+)/devices', 'getOrganizationDevices', self.get_organization_devices),
+            ('GET', r'/organizations/([^/]+)/networks', 'getOrganizationNetworks', self.get_organization_networks),
+            ('GET', r'/organizations/([^/]+)/actionBatches', 'getOrganizationActionBatches',
+             self.get_action_batches),
+            ('POST', r'/organizations/([^/]+)/actionBatches', 'createOrganizationActionBatch',
+             self.create_action_batch),
+            ('GET', r'/organizations/([^/]+)/actionBatches/([^/]+)', 'getOrganizationActionBatch',
+             self.get_action_batch),
+            ('GET', r'/networks/([^/]+)/camera/qualityRetentionProfiles',
+             'getNetworkCameraQualityRetentionProfiles', self.get_quality_profiles),
+            ('POST', r'/networks/([^/]+)/camera/qualityRetentionProfiles',
+             'createNetworkCameraQualityRetentionProfile', self.create_quality_profile),
+            ('PUT', r'/networks/([^/]+)/camera/qualityRetentionProfiles/([^/]+)',
+             'updateNetworkCameraQualityRetentionProfile', self.update_quality_profile),
+            ('GET', r'/networks/([^/]+)/camera/wirelessProfiles', 'getNetworkCameraWirelessProfiles',
+             self.get_wireless_profiles),
+            ('POST', r'/networks/([^/]+)/camera/wirelessProfiles', 'createNetworkCameraWirelessProfile',
+             self.create_wireless_profile),
+            ('PUT', r'/networks/([^/]+)/camera/wirelessProfiles/([^/]+)', 'updateNetworkCameraWirelessProfile',
+             self.update_wireless_profile),
+            ('GET', r'/networks/([^/]+)/alerts/settings', 'getNetworkAlertsSettings', self.get_alerts),
+            ('GET', r'/devices/([^/]+)', 'getDevice', self.get_device),
+            ('PUT', r'/devices/([^/]+)', 'updateDevice', self.update_device),
+            ('GET', r'/devices/([^/]+)/camera/qualityAndRetention', 'getDeviceCameraQualityAndRetention',
+             self.get_camera_setting('quality')),
+            ('PUT', r'/devices/([^/]+)/camera/qualityAndRetention', 'updateDeviceCameraQualityAndRetention',
+             self.update_camera_quality),
+            ('GET', r'/devices/([^/]+)/camera/wirelessProfiles', 'getDeviceCameraWirelessProfiles',
+             self.get_camera_setting('wireless')),
+            ('PUT', r'/devices/([^/]+)/camera/wirelessProfiles', 'updateDeviceCameraWirelessProfiles',
+             self.update_camera_wireless),
+            ('GET', r'/devices/([^/]+)/camera/video/settings', 'getDeviceCameraVideoSettings',
+             self.get_camera_setting('video')),
+            ('PUT', r'/devices/([^/]+)/camera/video/settings', 'updateDeviceCameraVideoSettings',
+             self.update_camera_video),
+        ]
+
+    # Organizations
+    # --------------------------------------------------
+    def get_organization_devices(self, query, body, org_id):
+        # Results come back in a single page, as the SDK only follows pagination links on meraki.com hosts
+        tags = set(query.get('tags[]', []))
+        serials = set(query.get('serials[]', []))
+        model = query.get('model', [None])[0]
+        devices = [dev for serial, dev in self.devices.items() if self.device_orgs[serial] == org_id
+                   and (not tags or tags & set(dev['tags']))
+                   and (not serials or serial in serials)
+                   and (not model or dev['model'].startswith(model))]
+        return 200, devices
+
+    def get_organization_networks(self, query, body, org_id):
+        tags = set(query.get('tags[]', []))
+        networks = [net for net in self.networks.values() if net['organizationId'] == org_id
+                    and (not tags or tags & set(net['tags']))]
+        return 200, networks
+
+    # Network camera profiles
+    # --------------------------------------------------
+    def get_quality_profiles(self, query, body, net_id):
+        return 200, list(self.quality_profiles[net_id].values())
+
+    def create_quality_profile(self, query, body, net_id):
+        if any(prof['name'] == body.get('name') for prof in self.quality_profiles[net_id].values()):
+            return 400, {"errors": ["Name has already been taken"]}
+        return 201, self.add_quality_profile(net_id, body)
+
+    def update_quality_profile(self, query, body, net_id, profile_id):
+        self.quality_profiles[net_id][profile_id].update(body)
+        return 200, self.quality_profiles[net_id][profile_id]
+
+    def get_wireless_profiles(self, query, body, net_id):
+        return 200, list(self.wireless_profiles[net_id].values())
+
+    def create_wireless_profile(self, query, body, net_id):
+        if any(prof['name'] == body.get('name') for prof in self.wireless_profiles[net_id].values()):
+            return 400, {"errors": ["Name has already been taken"]}
+        return 201, self.add_wireless_profile(net_id, body)
+
+    def update_wireless_profile(self, query, body, net_id, profile_id):
+        self.wireless_profiles[net_id][profile_id].update(body)
+        return 200, self.wireless_profiles[net_id][profile_id]
+
+    def get_alerts(self, query, body, net_id):
+        return 200, self.alerts[net_id]
+
+    # Devices
+    # --------------------------------------------------
+    def get_device(self, query, body, serial):
+        return 200, self.devices[serial]
+
+    def update_device(self, query, body, serial):
+        self.devices[serial].update({k: v for k, v in body.items() if k != 'serial'})
+        return 200, self.devices[serial]
+
+    def get_camera_setting(self, setting):
+        def handler(query, body, serial):
+            return 200, self.camera_settings[serial][setting]
+        return handler
+
+    def update_camera_quality(self, query, body, serial):
+        net_id = self.devices[serial]['networkId']
+        if 'profileId' in body and body['profileId'] not in self.quality_profiles[net_id]:
+            return 400, {"errors": [f"Quality and retention profile {body['profileId']} not found"]}
+        self.camera_settings[serial]['quality'].update(body)
+        return 200, self.camera_settings[serial]['quality']
+
+    def update_camera_wireless(self, query, body, serial):
+        net_id = self.devices[serial]['networkId']
+        ids = body.get('ids', {})
+        if any(wp_id not in self.wireless_profiles[net_id] for wp_id in ids.values()):
+            return 400, {"errors": ["Wireless profile not found"]}
+        self.camera_settings[serial]['wireless'] = {"ids": {"primary": ids.get('primary'),
+                                                            "secondary": ids.get('secondary'),
+                                                            "backup": ids.get('backup')}}
+        return 200, self.camera_settings[serial]['wireless']
+
+    def update_camera_video(self, query, body, serial):
+        self.camera_settings[serial]['video'].update(body)
+        if self.camera_settings[serial]['video'].get('externalRtspEnabled'):
+            self.camera_settings[serial]['video']['rtspUrl'] = f"rtsp://{self.devices[serial]['lanIp']}:9000/live"
+        return 200, self.camera_settings[serial]['video']
+
+    # Action batches
+    # --------------------------------------------------
+    def get_action_batches(self, query, body, org_id):
+        status = query.get('status', [None])[0]
+        batches = [batch for batch in self.action_batches.values() if batch['organizationId'] == org_id]
+        if status == 'pending':
+            batches = [batch for batch in batches
+                       if not batch['status']['completed'] and not batch['status']['failed']]
+        elif status == 'completed':
+            batches = [batch for batch in batches if batch['status']['completed']]
+        elif status == 'failed':
+            batches = [batch for batch in batches if batch['status']['failed']]
+        return 200, batches
+
+    def get_action_batch(self, query, body, org_id, batch_id):
+        return 200, self.action_batches[batch_id]
+
+    def create_action_batch(self, query, body, org_id):
+        active = [batch for batch in self.action_batches.values() if batch['organizationId'] == org_id
+                  and batch['confirmed'] and not batch['status']['completed'] and not batch['status']['failed']]
+        if body.get('confirmed') and len(active) >= MAXIMUM_ACTIVE_ACTION_BATCHES:
+            return 400, {"errors": [ACTION_BATCH_CONCURRENCY_ERROR]}
+        batch = {
+            "id": self.new_id(),
+            "organizationId": org_id,
+            "confirmed": bool(body.get('confirmed')),
+            "synchronous": bool(body.get('synchronous')),
+            "status": {"completed": False, "failed": False, "errors": [], "createdResources": []},
+            "actions": body.get('actions', []),
+        }
+        self.action_batches[batch['id']] = batch
+        if batch['confirmed'] and batch['synchronous']:
+            self.run_action_batch(batch)
+        elif batch['confirmed']:
+            timer = threading.Timer(self.action_latency * len(batch['actions']), self.run_action_batch, [batch])
+            timer.daemon = True
+            timer.start()
+        return 201, batch
+
+    def run_action_batch(self, batch):
+        """ Runs the actions of a batch atomically: if any action fails, none is applied. """
+        methods = {"create": "POST", "update": "PUT", "destroy": "DELETE"}
+        with self.lock:
+            # Batches still running when the mock was reset belong to a fleet that no longer exists
+            if self.action_batches.get(batch['id']) is not batch:
+                return
+            snapshot = json.dumps([self.devices, self.camera_settings, self.quality_profiles,
+                                   self.wireless_profiles])
+            errors = []
+            for index, action in enumerate(batch['actions']):
+                if self.failures.random() < self.action_failure_rate:
+                    errors.append(f"Action {index}: {action['resource']} - Internal server error, please try again")
+                    continue
+                route = self.match(methods.get(action['operation'], ''), action['resource'])
+                if route is None:
+                    errors.append(f"Action {index}: {action['resource']} - unsupported {action['operation']}")
+                    continue
+                operation, handler, params = route
+                try:
+                    status, response = handler({}, action.get('body', {}), *params)
+                except KeyError as e:
+                    status, response = 404, {"errors": [f"Not found: {e}"]}
+                if status >= 400:
+                    errors.append(f"Action {index}: {action['resource']} - {'; '.join(response['errors'])}")
+            if errors:
+                self.devices, self.camera_settings, self.quality_profiles, self.wireless_profiles = \
+                    json.loads(snapshot)
+                batch['status'].update({"failed": True, "errors": errors})
+            else:
+                batch['status']['completed'] = True
+
+class MockDashboardHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def dispatch(self, method):
+        parts = urlsplit(self.path)
+        path = parts.path
+        if path.startswith('/api/v1'):
+            path = path[len('/api/v1'):]
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+        status, payload, headers = self.server.dashboard.request(method, path, parse_qs(parts.query), body)
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(data)
+        with self.server.dashboard.lock:
+            self.server.dashboard.bytes_sent += len(data)
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(dashboard, host='127.0.0.1', port=0):
+    """
+    Serves a mock Dashboard from a background thread
+    :param dashboard: MockDashboard to serve
+    :param host: Address to listen on
+    :param port: Port to listen on, 0 picks a free one
+    :return: server: Running server, with the base URL to point the Dashboard API clients at under base_url
+    """
+    server = ThreadingHTTPServer((host, port), MockDashboardHandler)
+    server.daemon_threads = True
+    server.dashboard = dashboard
+    server.base_url = f"http://{server.server_address[0]}:{server.server_address[1]}/api/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Meraki Dashboard API")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--org-id', default='1000')
+    parser.add_argument('--src-net-id', default='L_1')
+    parser.add_argument('--networks', type=int, default=10)
+    parser.add_argument('--cameras', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument('--rate-limit', type=float, default=10, help="requests per second per organization, 0 disables")
+    parser.add_argument('--action-failure-rate', type=float, default=0.0,
+                        help="chance of each action of an action batch failing with a transient error")
+    args = parser.parse_args()
+
+    mock = MockDashboard(latency=args.latency, rate_limit=args.rate_limit,
+                         action_failure_rate=args.action_failure_rate)
+    mock.generate_fleet(args.org_id, args.src_net_id, networks=args.networks, cameras=args.cameras)
+    mock_server = serve(mock, port=args.port)
+    print(f"Mock Dashboard serving organization {args.org_id} at {mock_server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import traceback
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import config
+import report
+
+def org_directory(org):
+    """ Directory the output, report, journal and metrics of an organization are written to. """
+    return os.path.join(config.org_output_dir, str(org['dst_org_id']))
+
+def config_snapshot():
+    """
+    Captures the settings of config.py as the parent process sees them, so workers, which import config.py again, run
+    with any setting changed after it was imported
+    :return: settings: Dict with the name and value of every setting
+    """
+    return {name: value for name, value in vars(config).items()
+            if not name.startswith('_') and isinstance(value, (str, int, float, bool, list, tuple, dict, type(None)))}
+
+def applied_counts(path):
+    """
+    Counts the applied changes of an organization's report
+    :param path: Path of the JSON lines report
+    :return: counts: Dict with the number of changes applied and failed
+    """
+    counts = {"applied": 0, "failed": 0}
+    if not os.path.exists(path):
+        return counts
+    with open(path, encoding='utf-8') as org_report:
+        for line in org_report:
+            entry = json.loads(line)
+            if entry['phase']=='apply':
+                counts['applied' if entry['status']=='ok' else 'failed'] += 1
+    return counts
+
+def run_organization(org, settings, args):
+    """
+    Syncs one organization in a worker process: applies the settings of the parent and those of the organization to
+    config, sends everything the run prints to the output.log of the organization's directory, and runs main.run
+    :param org: Dict with the dst_org_id and src_net_id of the organization, and any other setting it overrides
+    :param settings: Settings of config.py in the parent process, as returned by config_snapshot
+    :param args: Parsed command line arguments, as returned by main.parse_args
+    :return: result: Dict with the organization, status, wall seconds, changes applied and failed, and API calls
+    """
+    directory = org_directory(org)
+    os.makedirs(directory, exist_ok=True)
+
+    for name, value in {**settings, "src_org_id": org['dst_org_id'], **org}.items():
+        setattr(config, name, value)
+    if config.journal_file:
+        config.journal_file = os.path.join(directory, os.path.basename(config.journal_file))
+    if config.metrics_file:
+        config.metrics_file = os.path.join(directory, os.path.basename(config.metrics_file))
+    # Every organization gets a JSON lines report, merged into args.report once all of them finish
+    args.report = os.path.join(directory, 'report.jsonl')
+
+    # Imported here, as main imports this module
+    import main
+    import metrics
+    import profiler
+    if args.profile:
+        profiler.enable()
+
+    status = "ok"
+    start = time.perf_counter()
+    with open(os.path.join(directory, 'output.log'), 'w', encoding='utf-8', buffering=1) as output:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            try:
+                main.run(args)
+            except (Exception, SystemExit) as e:
+                traceback.print_exc()
+                status = f"failed: {e!r}"
+    wall = time.perf_counter() - start
+
+    return {
+        "organization": org['dst_org_id'],
+        "source_network": org['src_net_id'],
+        "status": status,
+        "wall_s": round(wall, 3),
+        **applied_counts(args.report),
+        "api_calls": sum(row['calls'] for row in metrics.shared_metrics().stats()),
+    }
+
+def run_organizations(args):
+    """
+    Syncs every organization in config.organizations, up to config.org_workers at a time, each in its own worker
+    process with its own API clients and rate limit budget. Prints a summary of every organization as they finish,
+    and merges their reports into args.report
+    :param args: Parsed command line arguments, as returned by main.parse_args
+    :return: results: List of dicts with the result of every organization, as returned by run_organization
+    """
+    organizations = config.organizations
+    if not organizations:
+        print("No organizations to sync, add them to organizations in config.py.")
+        return []
+    if sys.version_info<(3, 11):
+        print(f"Syncing several organizations needs Python 3.11 or newer, this is Python {sys.version.split()[0]}.")
+        return []
+    if config.supervised==True:
+        print("Organizations are synced in worker processes that can't ask for confirmation, set supervised to False "
+              "in config.py to sync them.")
+        return []
+
+    settings = config_snapshot()
+    workers = max(1, min(config.org_workers, len(organizations)))
+    print(f"Syncing {len(organizations)} organizations, {workers} at a time. The output of each is written to "
+          f"{config.org_output_dir}/<organization>/output.log")
+
+    results = []
+    start = time.perf_counter()
+    # Spawned, so no worker inherits the clients, event loop or locks of the parent, and replaced after every
+    # organization, so none shares its clients, rate limiter or metrics with the next. max_tasks_per_child is what
+    # needs Python 3.11
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             max_tasks_per_child=1) as pool:
+        futures = {pool.submit(run_organization, org, settings, args): org for org in organizations}
+        for future in as_completed(futures):
+            org = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died
+                result = {"organization": org['dst_org_id'], "source_network": org['src_net_id'],
+                          "status": f"failed: {e!r}", "wall_s": None, "applied": 0, "failed": 0, "api_calls": 0}
+            print(f"Organization {result['organization']} finished in {result['wall_s']} seconds: {result['status']}")
+            results.append(result)
+    wall = time.perf_counter() - start
+
+    print(f"Synced {len(organizations)} organizations in {round(wall, 3)} seconds:")
+    print(report.table(results))
+
+    if args.report:
+        paths = {org['dst_org_id']: os.path.join(org_directory(org), 'report.jsonl') for org in organizations
+                 if os.path.exists(os.path.join(org_directory(org), 'report.jsonl'))}
+        records = report.merge_reports(paths, args.report)
+        print(f"Report of {records} planned and applied changes across {len(paths)} organizations written to "
+              f"{args.report}")
+    return results
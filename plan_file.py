@@ -0,0 +1,61 @@
+import json
+import gzip
+import time
+import config
+
+PLAN_VERSION = 1
+
+def write_plan(path, plans):
+    """
+    Writes network plans to a compact plan file: gzip compressed JSON lines, with a header line followed by one line per
+    network, so the file can be applied later without reading the organization again
+    :param path: Path of the plan file
+    :param plans: Iterable of network plans, as returned by plan_functions.plan_network
+    :return: count: Number of networks in the plan file
+    """
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as plan_file:
+        header = {
+            "version": PLAN_VERSION,
+            "created_at": time.time(),
+            "src_org_id": config.src_org_id,
+            "dst_org_id": config.dst_org_id,
+            "src_net_id": config.src_net_id,
+        }
+        plan_file.write(json.dumps(header, separators=(',', ':')) + "\n")
+        for plan in plans:
+            plan_file.write(json.dumps(plan, separators=(',', ':')) + "\n")
+            count += 1
+
+    return count
+
+def read_plan(path):
+    """
+    Checks the header of a plan file against config.py, then streams the network plans of the file, one network at a
+    time. The header is checked before the first plan is read, so nothing is journaled or applied from a plan made for
+    another organization or source network
+    :param path: Path of the plan file written by write_plan
+    :return: Generator of network plans
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as plan_file:
+        header = json.loads(plan_file.readline())
+    if header.get('version')!=PLAN_VERSION:
+        raise ValueError(f"Plan file {path} has version {header.get('version')}, expected {PLAN_VERSION}.")
+    for setting in ('dst_org_id', 'src_net_id'):
+        if header[setting]!=getattr(config, setting):
+            raise ValueError(f"Plan file {path} was created for {setting} {header[setting]}, but config.py has "
+                             f"{getattr(config, setting)}.")
+    print(f"Applying plan created at {time.ctime(header['created_at'])} from network {header['src_net_id']} "
+          f"for organization {header['dst_org_id']}.")
+    return stream_plans(path)
+
+def stream_plans(path):
+    """
+    Streams the network plans of a plan file, one network at a time, skipping its header
+    :param path: Path of the plan file written by write_plan
+    :return: Generator of network plans
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as plan_file:
+        plan_file.readline()
+        for line in plan_file:
+            yield json.loads(line)
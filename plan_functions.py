@@ -0,0 +1,309 @@
+import config
+
+# Modules config.modules may list
+MODULES = ('quality_profiles', 'wireless_profiles', 'rtsp_settings')
+
+def profile_diff(src_profile, net_profile, path=""):
+    """
+    Compares a source profile with its counterpart in a target network field by field, descending into nested
+    settings. The id and networkId fields are ignored, as they always differ between networks, and so are fields the
+    source profile does not have, as an update would not touch them
+    :param src_profile: Quality or wireless profile in the source template, or a nested dict of it
+    :param net_profile: Profile with the same name in the target network, or the matching nested dict of it
+    :param path: Dotted path of the nested dict being compared, empty for the whole profile
+    :return: changes: Dict with the dotted paths of the fields that differ as keys, and (current value, source value)
+    tuples as values. Empty when the network profile is already up to date
+    """
+    changes = {}
+    for field, src_value in src_profile.items():
+        if path=="" and field in ("id", "networkId"):
+            continue
+        field_path = f"{path}.{field}" if path else field
+        net_value = net_profile.get(field)
+        if isinstance(src_value, dict) and isinstance(net_value, dict):
+            changes.update(profile_diff(src_value, net_value, field_path))
+        elif src_value!=net_value:
+            changes[field_path] = (net_value, src_value)
+
+    return changes
+
+def plan_profiles(src_profiles, net_profiles):
+    """
+    Determines which profiles of the source template must be created and which must be updated in a target network.
+    Profiles whose content already matches the source are left out of the updates
+    :param src_profiles: List of quality or wireless profiles in the source template
+    :param net_profiles: List of quality or wireless profiles currently in the target network
+    :return: create_profiles: List of profiles to be created in the target network
+             update_profiles: List of profiles to be updated in the target network, carrying the ID they have in it
+             changes: Dict with the names of the profiles to be updated as keys, and the fields that change in each as
+             returned by profile_diff as values
+    """
+    # Construct a set of the names in the template profiles, and another of the names in the network profiles.
+    # Compare both sets, and determine which profiles must be created and which may need to be updated
+    template_set = set(prof['name'] for prof in src_profiles)
+    net_set = set(prof['name'] for prof in net_profiles)
+    to_create = template_set.difference(net_set)
+
+    # Construct list of profiles to be created based on the result of the previous set operation. Profiles existing
+    # on both sides are only updated when their content differs. Updates are copies, as the source profiles are shared
+    # by every target network
+    net_by_name = {prof['name']: prof for prof in net_profiles}
+    create_profiles = [prof for prof in src_profiles if prof['name'] in to_create]
+    update_profiles = []
+    changes = {}
+    for prof in src_profiles:
+        if prof['name'] in to_create:
+            continue
+        net_prof = net_by_name[prof['name']]
+        prof_changes = profile_diff(prof, net_prof)
+        if len(prof_changes)>0:
+            update_profiles.append(dict(prof, id=net_prof['id']))
+            changes[prof['name']] = prof_changes
+
+    return create_profiles, update_profiles, changes
+
+def profile_change_rows(changes):
+    """
+    Flattens the changes returned by plan_profiles into one row per changed field, for display
+    :param changes: Dict with profile names as keys, and the fields that change in each as values
+    :return: rows: List of dicts with the profile name, field, current value and source value
+    """
+    return [{"profile": prof_name, "field": field, "current": current, "source": source}
+            for prof_name, prof_changes in changes.items()
+            for field, (current, source) in prof_changes.items()]
+
+def profile_index(registry, prefix):
+    """
+    Indexes the profiles of a network by the number in their name, so that qp-1-highdef is found under 1 and tags
+    resolve with a single exact lookup instead of substring matches against every profile
+    :param registry: Dict with the names of the profiles in the network as keys, and their IDs as values
+    :param prefix: Prefix of the profile names to index, qp or wp
+    :return: index: Dict with profile numbers as keys, and (name, ID) tuples as values. Numbers shared by more than one
+    profile map to None, as they cannot be resolved unambiguously
+    """
+    index = {}
+    for prof_name, prof_id in registry.items():
+        name_parts = prof_name.split("-")
+        if len(name_parts)<2 or name_parts[0]!=prefix or not name_parts[1].isdigit():
+            continue
+        number = int(name_parts[1])
+        if number in index:
+            print(f"Error - More than one profile is numbered {prefix}-{number}-, including {prof_name}. Cameras tagged with it will be skipped.")
+            index[number] = None
+        else:
+            index[number] = (prof_name, prof_id)
+
+    return index
+
+def parse_device(dev):
+    """
+    Parses the qp-, wp- and RTSP tags of a camera into the directives the assignment stages act on, reporting any
+    malformed tags
+    :param dev: Target camera, as returned by getOrganizationDevices
+    :return: camera: Dict with the name, serial and LAN IP of the camera, the number of its quality profile under qp,
+    the numbers of its wireless profiles in priority order under wp, whether RTSP must be enabled under rtsp, and its
+    current settings under state if they were read. qp and wp are None when the camera has no valid tag for them
+    """
+    camera = {"name": dev['name'], "serial": dev['serial'], "lanIp": dev.get('lanIp'), "qp": None, "wp": None,
+              "rtsp": config.rtsp_enable_tag in dev['tags'], "state": dev.get('camera_state', {})}
+
+    # Check that no device has more than 1 qp- tag, and that it is qp followed by a number
+    qp_tags = [tag for tag in dev['tags'] if tag.startswith('qp-')]
+    if len(qp_tags)>1:
+        print(f"Error - A given camera may only have a single qp- tag for quality profiles. Skipping camera {dev['serial']}")
+    elif len(qp_tags)==1:
+        qp_tag = qp_tags[0].split("-")
+        if len(qp_tag)!=2 or not qp_tag[1].isdigit():
+            print(f"Error - The QP tag in a camera should be qp followed by a dash (-) and a digit, like qp-1. Camera {dev['serial']} has the tag {qp_tags[0]} assigned.")
+        else:
+            camera['qp'] = int(qp_tag[1])
+
+    # Check that no device has more than 1 wp- tag, that it doesn't reference more than 3 wireless profiles, and that
+    # it references at least 2 different ones
+    wp_tags = [tag for tag in dev['tags'] if tag.startswith('wp-')]
+    if len(wp_tags)>1:
+        print(f"Error - A given camera may only have a single wp- tag for wireless profiles. Skipping camera {dev['serial']}")
+    elif len(wp_tags)==1:
+        tag = wp_tags[0]
+        wp_tag = tag.split("-")
+        are_digits = all(ele.isdigit() for ele in wp_tag[1:])
+        if are_digits==False:
+            print(f"Error - The WP tag in a camera should contain dash (-) separated digits after wp only, like wp-2-1-3, where the digits reference the order of WPs to be assigned. Camera {dev['serial']} has the tag {tag} assigned.")
+        elif len(wp_tag)<3:
+            print(f"Error - A given camera must have at least 2 different wireless profiles assigned. Camera {dev['serial']} only has {len(wp_tag)-1} WPs assigned.")
+        elif len(wp_tag)>4:
+            print(f"Error - A given camera may only have 3 different wireless profiles assigned. Skipping camera {dev['serial']}")
+        elif len(set(int(wp) for wp in wp_tag[1:]))!=len(wp_tag)-1:
+            print(f"Error - A given camera must have different wireless profiles assigned. Camera {dev['serial']} has the tag {tag} assigned.")
+        else:
+            camera['wp'] = [int(wp) for wp in wp_tag[1:]]
+
+    return camera
+
+def partition_devices(target_devices):
+    """
+    Buckets the target cameras by network in a single pass, parsing the tags of each camera once
+    :param target_devices: List of target cameras across the whole organization
+    :return: devices_by_network: Dict with network IDs as keys, and lists of cameras as returned by parse_device as
+    values
+    """
+    devices_by_network = {}
+    for dev in target_devices:
+        devices_by_network.setdefault(dev['networkId'], []).append(parse_device(dev))
+
+    return devices_by_network
+
+def qp_device_list(cameras, qp_registry):
+    """
+    Matches the quality profile number of every camera with a quality profile of its network, leaving out cameras
+    whose current settings show they already have it
+    :param cameras: List of cameras in the network, as returned by parse_device
+    :param qp_registry: Dict with the names of the quality profiles in the network as keys, and their IDs as values.
+    Profiles not created yet have None as ID
+    :return: qp_device_list: List of cameras to be assigned quality profiles
+    """
+    qp_index = profile_index(qp_registry, 'qp')
+
+    qp_device_list = []
+    compliant = 0
+    for camera in cameras:
+        if camera['qp'] is None:
+            continue
+        qp = qp_index.get(camera['qp'])
+        if qp is None:
+            print(f"Error - The QP tag qp-{camera['qp']} of camera {camera['serial']} does not match a single quality profile in its network. Skipping camera {camera['serial']}")
+            continue
+        # Profiles still to be created have no ID, and a camera without a profile has none either
+        if qp[1] is not None and 'quality' in camera['state'] and camera['state']['quality'].get('profileId')==qp[1]:
+            compliant += 1
+            continue
+        device = {"name": camera['name'], "serial": camera['serial'], "quality_profile_name": qp[0], "quality_profile_id": qp[1]}
+        qp_device_list.append(device)
+
+    if compliant>0:
+        print(f"{compliant} cameras already have their Quality Profile assigned, skipping them.")
+    return qp_device_list
+
+def wp_device_list(cameras, wp_registry):
+    """
+    Matches the wireless profile numbers of every camera with the wireless profiles of its network, leaving out
+    cameras whose current settings show they already have them
+    :param cameras: List of cameras in the network, as returned by parse_device
+    :param wp_registry: Dict with the names of the wireless profiles in the network as keys, and their IDs as values.
+    Profiles not created yet have None as ID
+    :return: wp_device_list: List of cameras to be assigned wireless profiles
+    """
+    wp_index = profile_index(wp_registry, 'wp')
+
+    wp_device_list = []
+    compliant = 0
+    for camera in cameras:
+        if camera['wp'] is None:
+            continue
+        wps = [wp_index.get(wp) for wp in camera['wp']]
+        if None in wps:
+            print(f"Error - The WP tag wp-{'-'.join(str(wp) for wp in camera['wp'])} of camera {camera['serial']} references a number that does not match a single wireless profile in its network. Skipping camera {camera['serial']}")
+            continue
+        names = dict(zip(("primary", "secondary", "backup"), (wp[0] for wp in wps)))
+        ids = dict(zip(("primary", "secondary", "backup"), (wp[1] for wp in wps)))
+        current_ids = camera['state'].get('wireless', {}).get('ids') or {}
+        if None not in ids.values() and 'wireless' in camera['state'] \
+                and {k: v for k, v in current_ids.items() if v is not None}==ids:
+            compliant += 1
+            continue
+        device = {"name": camera['name'], "serial": camera['serial'], "wireless_profile_names": names, "wireless_profiles": ids}
+        wp_device_list.append(device)
+
+    if compliant>0:
+        print(f"{compliant} cameras already have their Wireless Profiles assigned, skipping them.")
+    return wp_device_list
+
+def rtsp_device_list(cameras):
+    """
+    Finds the cameras tagged to have RTSP enabled, leaving out cameras whose current settings show it already is
+    :param cameras: List of cameras in the network, as returned by parse_device
+    :return: rtsp_device_list: List of cameras to have RTSP turned on
+    """
+    rtsp_device_list = []
+    compliant = 0
+    for camera in cameras:
+        if camera['rtsp'] and camera['state'].get('video', {}).get('externalRtspEnabled')==True:
+            compliant += 1
+        elif camera['rtsp']:
+            device = {"name": camera['name'], "serial": camera['serial'], "rtsp_url": f"rtsp://{camera['lanIp']}:9000/live"}
+            rtsp_device_list.append(device)
+
+    if compliant>0:
+        print(f"{compliant} cameras already have RTSP enabled, skipping them.")
+    return rtsp_device_list
+
+def plan_network(net_id, cameras, src_quality_profiles, src_wireless_profiles, net_attributes):
+    """
+    Plans every change to a target network: the profiles to be created and updated in it, and the profiles and RTSP
+    settings to be assigned to its cameras. Cameras reference profiles by name, as profiles still to be created have no
+    ID until the plan is applied. Modules disabled in config.modules have no profiles fetched, and no assignments planned
+    :param net_id: ID of target network
+    :param cameras: List of cameras in the network, as returned by parse_device
+    :param src_quality_profiles: List of quality profiles in the source network
+    :param src_wireless_profiles: List of wireless profiles in the source network
+    :param net_attributes: Dict with the quality and wireless profiles currently in the network
+    :return: plan: JSON serializable dict with the changes to the network
+    """
+    create_wp, update_wp, wp_changes = plan_profiles(src_wireless_profiles, net_attributes['wireless_profiles'])
+    create_qp, update_qp, qp_changes = plan_profiles(src_quality_profiles, net_attributes['quality_profiles'])
+
+    # Profiles that will exist in the network once the plan is applied. Those to be created have no ID yet
+    net_wp = [{"name": prof['name'], "id": prof['id']} for prof in net_attributes['wireless_profiles']]
+    net_qp = [{"name": prof['name'], "id": prof['id']} for prof in net_attributes['quality_profiles']]
+    wp_names = {**{prof['name']: prof['id'] for prof in net_wp}, **{prof['name']: None for prof in create_wp}}
+    qp_names = {**{prof['name']: prof['id'] for prof in net_qp}, **{prof['name']: None for prof in create_qp}}
+
+    return {
+        "networkId": net_id,
+        "cameras": len(cameras),
+        "net_wp": net_wp,
+        "net_qp": net_qp,
+        "create_wp": create_wp,
+        "update_wp": update_wp,
+        "create_qp": create_qp,
+        "update_qp": update_qp,
+        "wp_changes": wp_changes,
+        "qp_changes": qp_changes,
+        "qp_assignments": qp_device_list(cameras, qp_names) if 'quality_profiles' in config.modules else [],
+        "wp_assignments": wp_device_list(cameras, wp_names) if 'wireless_profiles' in config.modules else [],
+        "rtsp_assignments": rtsp_device_list(cameras) if 'rtsp_settings' in config.modules else [],
+    }
+
+def resolve_qp_ids(qp_device_list, qp_registry):
+    """
+    Fills in the quality profile IDs of planned assignments from the registry returned by the profile writers
+    :param qp_device_list: List of cameras to be assigned quality profiles, as planned by plan_network
+    :param qp_registry: Dict with the names of the quality profiles in the network as keys, and their IDs as values
+    :return: qp_device_list: List of cameras to be assigned quality profiles, with their IDs
+    """
+    resolved = []
+    for device in qp_device_list:
+        qp_id = qp_registry.get(device['quality_profile_name'])
+        if qp_id is None:
+            print(f"Error - Quality profile {device['quality_profile_name']} does not exist in the network of camera {device['serial']}. Skipping camera {device['serial']}")
+            continue
+        resolved.append(dict(device, quality_profile_id=qp_id))
+
+    return resolved
+
+def resolve_wp_ids(wp_device_list, wp_registry):
+    """
+    Fills in the wireless profile IDs of planned assignments from the registry returned by the profile writers
+    :param wp_device_list: List of cameras to be assigned wireless profiles, as planned by plan_network
+    :param wp_registry: Dict with the names of the wireless profiles in the network as keys, and their IDs as values
+    :return: wp_device_list: List of cameras to be assigned wireless profiles, with their IDs
+    """
+    resolved = []
+    for device in wp_device_list:
+        ids = {priority: wp_registry.get(wp_name) for priority, wp_name in device['wireless_profile_names'].items()}
+        if None in ids.values():
+            print(f"Error - Not every wireless profile of camera {device['serial']} exists in its network. Skipping camera {device['serial']}")
+            continue
+        resolved.append(dict(device, wireless_profiles=ids))
+
+    return resolved
@@ -0,0 +1,113 @@
+import time
+import pstats
+import cProfile
+from contextlib import contextmanager
+import report
+
+class PhaseTimer:
+    """
+    Wall and CPU time spent in every phase of a run, in total and per network. CPU time is that of the whole process
+    while the phase ran, so phases running concurrently, like the networks of the scheduled write mode, share it.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # (phase, network) keys, [wall seconds, CPU seconds, times entered] values
+        self.phases = {}
+
+    def add(self, name, network, wall, cpu):
+        totals = self.phases.setdefault((name, network), [0.0, 0.0, 0])
+        totals[0] += wall
+        totals[1] += cpu
+        totals[2] += 1
+
+    def phase_rows(self):
+        """
+        Sums every phase across networks, slowest first. A phase also timed as a whole, which its networks ran
+        concurrently within, takes its time from that instead of the sum of its networks
+        :return: rows: List of dicts with the phase, the number of networks it ran for, and its wall and CPU seconds
+        """
+        phases = {}
+        for (name, network), (wall, cpu, count) in self.phases.items():
+            row = phases.setdefault(name, {"phase": name, "networks": 0, "wall_s": 0.0, "cpu_s": 0.0})
+            if network is not None:
+                row['networks'] += 1
+            if (name, None) not in self.phases or network is None:
+                row['wall_s'] += wall
+                row['cpu_s'] += cpu
+        rows = sorted(phases.values(), key=lambda row: row['wall_s'], reverse=True)
+        return [dict(row, wall_s=round(row['wall_s'], 3), cpu_s=round(row['cpu_s'], 3)) for row in rows]
+
+    def network_rows(self, top=5):
+        """
+        Sums every network across phases, slowest first
+        :param top: Number of networks to return
+        :return: rows: List of dicts with the network, its wall and CPU seconds, and the wall seconds of each phase
+        """
+        networks = {}
+        for (name, network), (wall, cpu, count) in self.phases.items():
+            if network is None:
+                continue
+            row = networks.setdefault(network, {"network": network, "wall_s": 0.0, "cpu_s": 0.0})
+            row['wall_s'] += wall
+            row['cpu_s'] += cpu
+            row[name] = round(row.get(name, 0.0) + wall, 3)
+        rows = sorted(networks.values(), key=lambda row: row['wall_s'], reverse=True)[:top]
+        return [dict(row, wall_s=round(row['wall_s'], 3), cpu_s=round(row['cpu_s'], 3)) for row in rows]
+
+    def summary(self, top=5):
+        """ Prints the time spent in every phase, and the slowest networks. """
+        print(f"Run took {round(time.perf_counter() - self.started, 3)} seconds. Time by phase:")
+        print(report.table(self.phase_rows()))
+        network_rows = self.network_rows(top)
+        if network_rows:
+            print(f"Slowest {len(network_rows)} networks:")
+            print(report.table(network_rows))
+
+_timer = None
+
+def enable():
+    """ Starts timing the phases of the run. Until it is called, phase does nothing. """
+    global _timer
+    _timer = PhaseTimer()
+
+@contextmanager
+def phase(name, network=None):
+    """
+    Times the code it wraps as a phase of the run, if phase timing was enabled
+    :param name: Name of the phase
+    :param network: ID of the network the phase ran for, if it ran for a single one
+    :return:
+    """
+    if _timer is None:
+        yield
+        return
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield
+    finally:
+        _timer.add(name, network, time.perf_counter() - wall, time.process_time() - cpu)
+
+def summary(top=5):
+    """ Prints the time spent in every phase and the slowest networks, if phase timing was enabled. """
+    if _timer is not None:
+        _timer.summary(top)
+
+def run_profiled(function, stats_path, *args, top=20):
+    """
+    Runs a function under cProfile, writes the stats to stats_path, and prints the functions with the highest
+    cumulative time. The stats can be explored further with python -m pstats stats_path
+    :param function: Function to run
+    :param stats_path: Path of the stats file
+    :param args: Arguments of the function
+    :param top: Number of functions to print
+    :return: result: Value returned by the function
+    """
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function, *args)
+    finally:
+        profile.dump_stats(stats_path)
+        print(f"Profile written to {stats_path}. Functions with the highest cumulative time:")
+        pstats.Stats(stats_path).strip_dirs().sort_stats('cumulative').print_stats(top)
@@ -0,0 +1,137 @@
+import time
+import asyncio
+import threading
+import config
+import meraki
+
+class RateLimiter:
+    """
+    Client-side token bucket pacing every request of the sync and async Dashboard API clients it is attached to.
+    Starts at config.rate_limit requests per second, halves its rate and pauses every client for Retry-After seconds
+    on each 429, and climbs back by config.rate_limit_increase requests per second on each successful request.
+
+    Attributes:
+        rate -- current requests per second
+        requests -- number of requests sent through the limiter
+        throttled -- number of 429 responses received
+        waited -- total seconds requests were held back
+    """
+
+    def __init__(self, rate, burst, min_rate, increase):
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.rate = rate
+        self.burst = burst
+        self.increase = increase
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+        # Theoretical arrival time of the next request: requests are spaced 1/rate seconds apart, and up to burst of
+        # them may go out ahead of it
+        self.next_arrival = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Reserves the next request slot
+        :return: delay: Seconds to wait before sending the request
+        """
+        with self.lock:
+            now = time.monotonic()
+            interval = 1 / self.rate
+            send_at = max(now, self.next_arrival - (self.burst - 1) * interval)
+            self.next_arrival = max(self.next_arrival, now) + interval
+            self.requests += 1
+            delay = send_at - now
+            self.waited += delay
+            return delay
+
+    def acquire(self):
+        """ Blocks until the next request may be sent. """
+        delay = self.reserve()
+        if delay>0:
+            time.sleep(delay)
+
+    async def async_acquire(self):
+        """ Waits without blocking the event loop until the next request may be sent. """
+        delay = self.reserve()
+        if delay>0:
+            await asyncio.sleep(delay)
+
+    def observe(self, status, retry_after=None):
+        """
+        Adapts the rate to the response of a request
+        :param status: HTTP status code of the response
+        :param retry_after: Value of the Retry-After header of the response, if any
+        :return:
+        """
+        with self.lock:
+            if status==429:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+                try:
+                    pause = float(retry_after)
+                except (TypeError, ValueError):
+                    pause = 1.0
+                # Nobody sends again before the pause is over
+                self.next_arrival = max(self.next_arrival,
+                                        time.monotonic() + pause + (self.burst - 1) / self.rate)
+            elif status<500:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def stats(self):
+        """
+        Summarizes the limiter for display
+        :return: stats: Dict with the current rate, requests sent, 429 responses and seconds spent waiting
+        """
+        return {
+            "rate": round(self.rate, 2),
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "waited_s": round(self.waited, 2),
+        }
+
+_limiter = None
+
+def shared_limiter():
+    """
+    Returns the limiter shared by every client in the process, creating it from config on first use
+    :return: limiter: Shared RateLimiter
+    """
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(config.rate_limit, config.rate_limit_burst, config.rate_limit_min,
+                               config.rate_limit_increase)
+    return _limiter
+
+def attach(client, limiter=None):
+    """
+    Paces every HTTP request a Dashboard API client sends through a limiter, and feeds the limiter the responses. Works
+    with both meraki.DashboardAPI and meraki.aio.AsyncDashboardAPI, wrapping the HTTP session underneath the retry
+    logic of the SDK, so retries are paced too.
+    :param client: Sync or async Dashboard API client
+    :param limiter: RateLimiter to use, defaults to the shared limiter
+    :return: client: The same client
+    """
+    if limiter is None:
+        if config.rate_limit<=0:
+            return client
+        limiter = shared_limiter()
+    http_session = client._session._req_session
+    send = http_session.request
+
+    if isinstance(client, meraki.DashboardAPI):
+        def request(method, url, *args, **kwargs):
+            limiter.acquire()
+            response = send(method, url, *args, **kwargs)
+            limiter.observe(response.status_code, response.headers.get('Retry-After'))
+            return response
+    else:
+        async def request(method, url, *args, **kwargs):
+            await limiter.async_acquire()
+            response = await send(method, url, *args, **kwargs)
+            limiter.observe(response.status, response.headers.get('Retry-After'))
+            return response
+
+    http_session.request = request
+    return client
@@ -1,27 +1,9 @@
 import asyncio
 import config
-import pandas as pd
-from tabulate import tabulate
+import inventory_cache
+import report
+import profiler
 import meraki
-import meraki.aio
-
-# Instantiate async Meraki API client
-aiomeraki = meraki.aio.AsyncDashboardAPI(
-            config.api_key,
-            base_url="https://api.meraki.com/api/v1",
-            log_file_prefix=__file__[:-3],
-            print_console=False,
-            maximum_retries=config.max_retries,
-            maximum_concurrent_requests=config.max_requests,
-)
-
-# Instantiate synchronous Meraki API client
-dashboard = meraki.DashboardAPI(
-    config.api_key,
-    base_url="https://api.meraki.com/api/v1",
-    log_file_prefix=__file__[:-3],
-    print_console=config.console_logging,
-    )
 
 async def get_network_template_quality_profiles(aiomeraki, net_id):
     """
@@ -45,15 +27,18 @@ async def get_network_template_wireless_profiles(aiomeraki, net_id):
     results = [result for result in results if 'wp-' in result['name']]
     return net_id, "wireless_profiles", results
 
-async def get_network_template_alerts(aiomeraki, net_id):
+# Profile reads of every module in config.modules that copies profiles. rtsp_settings copies none, so it needs no reads
+PROFILE_FETCHES = {
+    "quality_profiles": get_network_template_quality_profiles,
+    "wireless_profiles": get_network_template_wireless_profiles,
+}
+
+def profile_fetches():
     """
-    Async function wrapper for switch access policies
-    :param aiomeraki: Async Dashboard API client
-    :param net_id: network ID of target network
-    :return: Access policies belonging to this network ID
+    Finds the profile reads of the modules enabled in config.modules
+    :return: fetches: List of async functions taking the client and a network ID, for every enabled module
     """
-    results = await aiomeraki.networks.getNetworkAlertsSettings(net_id)
-    return net_id, "cam_alerts", results
+    return [fetch for module, fetch in PROFILE_FETCHES.items() if module in config.modules]
 
 async def get_target_network_data(aiomeraki, target_networks):
     """
@@ -61,31 +46,104 @@ async def get_target_network_data(aiomeraki, target_networks):
     :param aiomeraki: Async Dashboard API client
     :param target_networks: List containing all target networks
     :return: net_attributes: Dictionary with all of the networks as keys, and values are subdictionaries containing
-    each of the network parameters.
+    each of the network parameters. The profiles of disabled modules are left empty, so nothing is planned for them.
     """
-    net_attributes = {}
+    net_attributes = {network['id']: {"quality_profiles": [], "wireless_profiles": []} for network in target_networks}
+    fetches = profile_fetches()
+    if len(fetches)==0:
+        return net_attributes
+
+    async def get_network_data(net_id):
+        # Timed per network, from the start of its requests until the last of them returns
+        with profiler.phase("network_fetch", net_id):
+            return await asyncio.gather(*[fetch(aiomeraki, net_id) for fetch in fetches])
+
     # Build list of async functions to call
-    get_tasks = []
-    for network in target_networks:
-        get_tasks.append(get_network_template_quality_profiles(aiomeraki, network['id']))
-        get_tasks.append(get_network_template_wireless_profiles(aiomeraki, network['id']))
-        get_tasks.append(get_network_template_alerts(aiomeraki, network['id']))
+    get_tasks = [get_network_data(network['id']) for network in target_networks]
 
     # Await and sort
     for task in asyncio.as_completed(get_tasks):
-        net_id, action, result = await task
-        if net_id not in net_attributes.keys():
-            net_attributes[net_id] = {}
-        net_attributes[net_id][action] = result
+        for net_id, action, result in await task:
+            net_attributes[net_id][action] = result
 
     return net_attributes
 
-async def gather_camera_specific_data(aiomeraki):
+async def get_device_camera_state(aiomeraki, device):
+    """
+    Async function wrapper for the current camera settings the script assigns. Only the settings the camera's tags
+    ask for, in the modules enabled in config.modules, are fetched, concurrently. A setting that can't be fetched is
+    left out, so the camera is updated anyway for that module, and the settings that were fetched are kept
+    :param aiomeraki: Async Dashboard API client
+    :param device: Target camera
+    :return: Serial of the camera, and dict with its quality and retention, wireless profile and video settings
+    """
+    reads = {}
+    if 'quality_profiles' in config.modules and any(tag.startswith('qp-') for tag in device['tags']):
+        reads['quality'] = aiomeraki.camera.getDeviceCameraQualityAndRetention(device['serial'])
+    if 'wireless_profiles' in config.modules and any(tag.startswith('wp-') for tag in device['tags']):
+        reads['wireless'] = aiomeraki.camera.getDeviceCameraWirelessProfiles(device['serial'])
+    if 'rtsp_settings' in config.modules and config.rtsp_enable_tag in device['tags']:
+        reads['video'] = aiomeraki.camera.getDeviceCameraVideoSettings(device['serial'])
+
+    state = {}
+    results = await asyncio.gather(*reads.values(), return_exceptions=True)
+    for setting, result in zip(reads, results):
+        if isinstance(result, meraki.AsyncAPIError):
+            print(f"Could not read the current {setting} settings of camera {device['serial']}, they will be updated "
+                  f"anyway: {result}")
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            state[setting] = result
+    return device['serial'], state
+
+async def get_target_device_state(aiomeraki, target_devices):
+    """
+    Obtains the current camera settings of every target camera using async functions, and stores them in each camera
+    under camera_state, so cameras already matching their tags can be left untouched
+    :param aiomeraki: Async Dashboard API client
+    :param target_devices: List containing all target cameras
+    :return:
+    """
+    devices_by_serial = {dev['serial']: dev for dev in target_devices}
+    get_tasks = [get_device_camera_state(aiomeraki, dev) for dev in target_devices]
+
+    # Await and sort
+    for task in asyncio.as_completed(get_tasks):
+        serial, state = await task
+        devices_by_serial[serial]['camera_state'] = state
+
+async def get_organization_devices_by_serial(aiomeraki, org_id, serials, chunk_size=100):
+    """
+    Obtains only the listed MV devices of an organization, splitting the serials into chunks filtered on in
+    concurrent requests, instead of paging through every device of the organization
+    :param aiomeraki: Async Dashboard API client
+    :param org_id: ID of the organization
+    :param serials: List of serials of the devices to fetch
+    :param chunk_size: Number of serials filtered on per request, kept low enough for the query string to stay short
+    :return: devices: List of the devices found, serials not found in the organization are left out
+    """
+    serials = list(dict.fromkeys(serials))
+    get_tasks = [aiomeraki.organizations.getOrganizationDevices(
+        organizationId=org_id,
+        serials=serials[i:i + chunk_size],
+        model='MV',
+        total_pages=-1
+    ) for i in range(0, len(serials), chunk_size)]
+
+    # Await and sort
+    devices = []
+    for task in asyncio.as_completed(get_tasks):
+        devices.extend(await task)
+    return devices
+
+async def gather_camera_specific_data(aiomeraki, refresh=False):
     """
     Gathers the information necessary to propagate switch configs from the source template specified in the config.py
     file.
     :param aiomeraki: asyncio instance of the Dashboard API client with access to the source and target organizations,
     as well as the source configuration templates
+    :param refresh: Fetch the organization devices and networks from the API even if they are in the inventory cache
     :returns: target_devices: List of dicts containing each of the switches to be updated across the whole organization.
              target_networks: List of dicts containing each of the networks with switches to be updated across the
              whole organization.
@@ -102,23 +160,37 @@ async def gather_camera_specific_data(aiomeraki):
              target_switch_ports: List of dicts containing each of the switches to be updated along with the ports to
              update in each one.
     """
-    # Get list of MV devices in the organization with the tag specified in config.dst_cam_tag
-    org_devices = await aiomeraki.organizations.getOrganizationDevices(
-        organizationId=config.src_org_id,
-        tags=[config.dst_camera_tag],
-        model='MV',
-        total_pages=-1
-    )
+    with profiler.phase("inventory_fetch"):
+        # Get list of MV devices in the organization with the tag specified in config.dst_cam_tag
+        org_devices = await inventory_cache.async_cached(
+            'getOrganizationDevices',
+            config.src_org_id,
+            {"tags": [config.dst_camera_tag], "model": 'MV'},
+            lambda: aiomeraki.organizations.getOrganizationDevices(
+                organizationId=config.src_org_id,
+                tags=[config.dst_camera_tag],
+                model='MV',
+                total_pages=-1
+            ),
+            refresh
+        )
 
-    # Obtain list of networks in the organization with the config.dst_network_tag
-    org_networks = await aiomeraki.organizations.getOrganizationNetworks(
-        organizationId=config.src_org_id,
-        tags=[config.dst_network_tag],
-        total_pages=-1
-    )
+        # Obtain list of networks in the organization with the config.dst_network_tag
+        org_networks = await inventory_cache.async_cached(
+            'getOrganizationNetworks',
+            config.src_org_id,
+            {"tags": [config.dst_network_tag]},
+            lambda: aiomeraki.organizations.getOrganizationNetworks(
+                organizationId=config.src_org_id,
+                tags=[config.dst_network_tag],
+                total_pages=-1
+            ),
+            refresh
+        )
 
-    # Obtain src_quality_profiles, src_wireless_profiles and src_camera_alerts
-    src_quality_profiles, src_wireless_profiles, src_camera_alerts = await gather_template_network_data(aiomeraki)
+    # Obtain src_quality_profiles and src_wireless_profiles
+    with profiler.phase("template_fetch"):
+        src_quality_profiles, src_wireless_profiles = await gather_template_network_data(aiomeraki)
 
     # Obtain set of networks those MV devices are mapped to
     device_nets = [*set(d['networkId'] for d in org_devices)]
@@ -136,22 +208,30 @@ async def gather_camera_specific_data(aiomeraki):
 
     if config.verbose==True:
         print("Target Devices:")
-        print(tabulate(pd.DataFrame(target_devices), headers='keys', tablefmt ='fancy_grid'))
+        print(report.table(target_devices))
         print("Target Networks:")
-        print(tabulate(pd.DataFrame(target_networks), headers='keys', tablefmt='fancy_grid'))
+        print(report.table(target_networks))
 
     # Build dictionary with target networks as keys, and access policies and port schedules as subkeys
-    net_attributes = await get_target_network_data(aiomeraki, target_networks)
+    with profiler.phase("network_fetch"):
+        net_attributes = await get_target_network_data(aiomeraki, target_networks)
+
+    # Read the current settings of the target cameras, to skip those already matching their tags
+    if config.check_device_state==True:
+        with profiler.phase("device_state_fetch"):
+            await get_target_device_state(aiomeraki, target_devices)
 
     if config.verbose == True:
         for key in net_attributes.keys():
-            print(f"Quality Profiles currently in Network {key}:")
-            print(tabulate(pd.DataFrame(net_attributes[key]['quality_profiles']), headers='keys', tablefmt='fancy_grid'))
-            print(f"Wireless Profiles currently in Network {key}:")
-            print(tabulate(pd.DataFrame(net_attributes[key]['wireless_profiles']), headers='keys', tablefmt='fancy_grid'))
+            if 'quality_profiles' in config.modules:
+                print(f"Quality Profiles currently in Network {key}:")
+                print(report.table(net_attributes[key]['quality_profiles']))
+            if 'wireless_profiles' in config.modules:
+                print(f"Wireless Profiles currently in Network {key}:")
+                print(report.table(net_attributes[key]['wireless_profiles']))
 
 
-    return target_devices, target_networks, src_quality_profiles, src_wireless_profiles, src_camera_alerts, net_attributes
+    return target_devices, target_networks, src_quality_profiles, src_wireless_profiles, net_attributes
 
 async def gather_template_network_data(aiomeraki):
     """
@@ -159,50 +239,39 @@ async def gather_template_network_data(aiomeraki):
     file.
     :param aiomeraki: asyncio instance of the Dashboard API client with access to the source and target organizations,
     as well as the source configuration templates
-    :returns: src_quality_profiles: List of quality profiles in the source network
-              src_wireless_profiles: List of wireless profiles in the source network
-              src_camera_alerts: List of alerts in the source network
+    :returns: src_quality_profiles: List of quality profiles in the source network, empty if the module is disabled
+              src_wireless_profiles: List of wireless profiles in the source network, empty if the module is disabled
     """
-    # Network attributes to be obtained from template
-    get_tasks = [
-        get_network_template_quality_profiles(aiomeraki, config.src_net_id),
-        get_network_template_wireless_profiles(aiomeraki, config.src_net_id),
-        get_network_template_alerts(aiomeraki, config.src_net_id),
-    ]
+    # Network attributes to be obtained from template, for the modules enabled in config.modules
+    src_profiles = {"quality_profiles": [], "wireless_profiles": []}
+    get_tasks = [fetch(aiomeraki, config.src_net_id) for fetch in profile_fetches()]
 
     # Await and sort
     for task in asyncio.as_completed(get_tasks):
         net_id, action, result = await task
-        if action=='quality_profiles':
-            src_quality_profiles = result
-        elif action=='wireless_profiles':
-            src_wireless_profiles = result
-        elif action=='cam_alerts':
-            src_camera_alerts = result
+        src_profiles[action] = result
+    src_quality_profiles = src_profiles['quality_profiles']
+    src_wireless_profiles = src_profiles['wireless_profiles']
 
     if config.verbose==True:
-        print("Source Template Camera Quality Profiles:")
-        try:
-            print(tabulate(pd.DataFrame(src_quality_profiles), headers='keys', tablefmt='fancy_grid'))
-        except:
-            print("No Quality Profiles Found!")
-        print("Source Template Camera Wireless Profiles:")
-        try:
-            print(tabulate(pd.DataFrame(src_wireless_profiles), headers='keys', tablefmt='fancy_grid'))
-        except:
-            print("No Wireless Profiles Found!")
-        print("Source Template Camera Alerts:")
-        try:
-            print(tabulate(pd.DataFrame(src_camera_alerts["alerts"]), headers='keys', tablefmt='fancy_grid'))
-        except:
-            print("No Camera Alerts Found!")
-
-    return src_quality_profiles, src_wireless_profiles, src_camera_alerts
-
-
-async def main(aiomeraki):
-    async with aiomeraki:
-        target_devices, target_networks, src_quality_profiles, src_wireless_profiles, src_camera_alerts, net_attributes \
-            = await gather_camera_specific_data(aiomeraki)
-
-    return target_devices, target_networks, src_quality_profiles, src_wireless_profiles, src_camera_alerts, net_attributes
+        if 'quality_profiles' in config.modules:
+            print("Source Template Camera Quality Profiles:")
+            if len(src_quality_profiles)>0:
+                print(report.table(src_quality_profiles))
+            else:
+                print("No Quality Profiles Found!")
+        if 'wireless_profiles' in config.modules:
+            print("Source Template Camera Wireless Profiles:")
+            if len(src_wireless_profiles)>0:
+                print(report.table(src_wireless_profiles))
+            else:
+                print("No Wireless Profiles Found!")
+
+    return src_quality_profiles, src_wireless_profiles
+
+
+async def main(aiomeraki, refresh=False):
+    target_devices, target_networks, src_quality_profiles, src_wireless_profiles, net_attributes \
+        = await gather_camera_specific_data(aiomeraki, refresh)
+
+    return target_devices, target_networks, src_quality_profiles, src_wireless_profiles, net_attributes
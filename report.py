@@ -0,0 +1,210 @@
+import csv
+import json
+import time
+from tabulate import tabulate
+
+# Columns of every report record
+FIELDS = ["time", "phase", "network", "serial", "kind", "action", "target", "status", "detail"]
+
+# Kind of camera assignment each action batch resource suffix corresponds to
+BATCH_RESOURCE_KINDS = {
+    "/camera/qualityAndRetention": "qp_assignment",
+    "/camera/wirelessProfiles": "wp_assignment",
+    "/camera/video/settings": "rtsp_settings",
+}
+
+def table(rows):
+    """
+    Renders a list of dicts as the fancy_grid table the scripts print. Only call it right before printing, so tables
+    that are not shown are never rendered
+    :param rows: List of dicts, one per row, with the column names as keys
+    :return: table: Rendered table
+    """
+    return tabulate(rows, headers='keys', tablefmt='fancy_grid', showindex=True)
+
+class RunReport:
+    """
+    Machine-readable record of a run, streamed to a JSON lines file, or to a CSV file if the path ends in .csv, one
+    record per planned or applied change to a network or camera. Records are written as they happen, so only the
+    network of every planned camera is kept in memory, and an interrupted run still leaves a usable report.
+    """
+
+    def __init__(self, path, fields=FIELDS):
+        self.path = path
+        # Line buffered, so every record reaches the file as soon as it is written
+        self.file = open(path, 'w', encoding='utf-8', newline='', buffering=1)
+        # Network of every camera recorded with one, by serial
+        self.networks = {}
+        self.writer = None
+        if path.endswith('.csv'):
+            self.writer = csv.DictWriter(self.file, fieldnames=fields)
+            self.writer.writeheader()
+
+    def record(self, phase, kind, action, status, network=None, serial=None, target=None, detail=None):
+        """
+        Writes one record
+        :param phase: plan or apply
+        :param kind: wireless_profiles, quality_profiles, qp_assignment, wp_assignment or rtsp_settings
+        :param action: create, update or assign, or None for a failed stage
+        :param status: planned, ok, failed or submitted
+        :param network: ID of the target network, if known. Cameras planned in a network are recorded in it without it
+        :param serial: Serial of the camera, for camera assignments
+        :param target: Name of the profile, or value, being created, updated or assigned
+        :param detail: Changed fields, or error message
+        :return:
+        """
+        if serial is not None:
+            # The assigners of the sync, async and batch write modes only know the cameras they assign, so their
+            # records take the network of each camera from its planned records
+            if network is None:
+                network = self.networks.get(serial)
+            else:
+                self.networks[serial] = network
+        entry = {
+            "time": round(time.time(), 3),
+            "phase": phase,
+            "network": network,
+            "serial": serial,
+            "kind": kind,
+            "action": action,
+            "target": target,
+            "status": status,
+            "detail": detail,
+        }
+        self.write(entry)
+
+    def write(self, entry):
+        """ Writes a record that is already built, like one read back from another report. """
+        if self.writer:
+            self.writer.writerow(entry)
+        else:
+            self.file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def close(self):
+        self.file.close()
+
+_report = None
+
+def open_report(path):
+    """
+    Starts streaming the records of the run to path
+    :param path: Path of the report, written as CSV if it ends in .csv, and as JSON lines otherwise
+    :return:
+    """
+    global _report
+    _report = RunReport(path)
+
+def close_report():
+    """ Closes the report of the run, if one was opened. """
+    global _report
+    if _report is not None:
+        _report.close()
+        _report = None
+
+def record(phase, kind, action, status, network=None, serial=None, target=None, detail=None):
+    """
+    Writes one record to the report of the run, if one was opened. See RunReport.record for the parameters
+    """
+    if _report is not None:
+        _report.record(phase, kind, action, status, network, serial, target, detail)
+
+def merge_reports(paths, path):
+    """
+    Merges the JSON lines reports of several organizations into a single report, adding the organization to every
+    record
+    :param paths: Dict with organization IDs as keys, and the paths of their reports as values
+    :param path: Path of the merged report, written as CSV if it ends in .csv, and as JSON lines otherwise
+    :return: records: Number of records merged
+    """
+    merged = RunReport(path, ["organization"] + FIELDS)
+    records = 0
+    for org_id, org_path in paths.items():
+        with open(org_path, encoding='utf-8') as org_report:
+            for line in org_report:
+                merged.write({"organization": org_id, **json.loads(line)})
+                records += 1
+    merged.close()
+    return records
+
+def record_plans(plans):
+    """
+    Records the planned changes of every network plan as it streams through
+    :param plans: Iterable of network plans, as returned by plan_functions.plan_network
+    :return: plans: The same plans, as a generator
+    """
+    for plan in plans:
+        if _report is not None:
+            key = plan['networkId']
+            for kind, create, update, changes in [
+                ("wireless_profiles", plan['create_wp'], plan['update_wp'], plan['wp_changes']),
+                ("quality_profiles", plan['create_qp'], plan['update_qp'], plan['qp_changes']),
+            ]:
+                for prof in create:
+                    record("plan", kind, "create", "planned", key, target=prof['name'])
+                for prof in update:
+                    record("plan", kind, "update", "planned", key, target=prof['name'],
+                           detail=', '.join(changes.get(prof['name'], {}).keys()))
+            for camera in plan['qp_assignments']:
+                record("plan", "qp_assignment", "assign", "planned", key, camera['serial'],
+                       camera['quality_profile_name'])
+            for camera in plan['wp_assignments']:
+                record("plan", "wp_assignment", "assign", "planned", key, camera['serial'],
+                       ', '.join(camera['wireless_profile_names'].values()))
+            for camera in plan['rtsp_assignments']:
+                record("plan", "rtsp_settings", "assign", "planned", key, camera['serial'], "externalRtspEnabled")
+        yield plan
+
+def record_camera_results(kind, results, network=None):
+    """
+    Records the outcome of a concurrent camera update
+    :param kind: qp_assignment, wp_assignment or rtsp_settings
+    :param results: Dict of successes and failures as returned by write_functions.update_cameras
+    :param network: ID of the target network, if the update was limited to one
+    :return:
+    """
+    if _report is None:
+        return
+    for camera in results['successes']:
+        record("apply", kind, "assign", "ok", network, camera['serial'])
+    for camera in results['failures']:
+        record("apply", kind, "assign", "failed", network, camera['serial'], detail=camera['error'])
+
+def batch_action_target(action):
+    """
+    Finds the camera and the kind of assignment an action batch action is for
+    :param action: Action batch action
+    :return: serial: Serial of the camera. kind: Kind of assignment, or the resource of the action if it is unknown
+    """
+    serial = action['resource'].split('/')[2]
+    kind = next((kind for suffix, kind in BATCH_RESOURCE_KINDS.items()
+                 if action['resource'].endswith(suffix)), action['resource'])
+    return serial, kind
+
+def failed_action_rows(failed_actions):
+    """
+    Lists the actions that failed for good, one row per action, to be shown as a table
+    :param failed_actions: List of failed actions as collected by batch_helper.BatchHelper
+    :return: rows: List of dicts with the serial, kind, attempts and errors of every action
+    """
+    rows = []
+    for failure in failed_actions:
+        serial, kind = batch_action_target(failure['action'])
+        rows.append({"serial": serial, "kind": kind, "attempts": failure['attempts'],
+                     "errors": '; '.join(failure['errors'])})
+    return rows
+
+def record_batch_actions(completed_actions, failed_actions):
+    """
+    Records the outcome of every action submitted in action batches, after retries
+    :param completed_actions: List of actions of the batches that completed
+    :param failed_actions: List of failed actions as collected by batch_helper.BatchHelper
+    :return:
+    """
+    if _report is None:
+        return
+    for action in completed_actions:
+        serial, kind = batch_action_target(action)
+        record("apply", kind, "assign", "ok", serial=serial)
+    for row in failed_action_rows(failed_actions):
+        record("apply", row['kind'], "assign", "failed", serial=row['serial'],
+               detail=f"{row['errors']} (after {row['attempts']} attempts)")
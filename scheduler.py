@@ -0,0 +1,180 @@
+import asyncio
+import config
+import clients
+import plan_functions
+import write_functions
+import report
+import profiler
+
+# Module of config.modules every stage of a network belongs to
+STAGE_MODULES = {
+    "wireless_profiles": "wireless_profiles",
+    "quality_profiles": "quality_profiles",
+    "qp_assignment": "quality_profiles",
+    "wp_assignment": "wireless_profiles",
+    "rtsp_settings": "rtsp_settings",
+}
+
+class DependencyFailedError(Exception):
+    """
+    Raised instead of running a stage when one of the stages it depends on failed.
+
+    Attributes:
+        stage -- the stage that was skipped
+        dependency -- the stage that failed
+        message -- explanation of the error
+    """
+
+    def __init__(self, stage, dependency):
+        self.stage = stage
+        self.dependency = dependency
+        self.message = f'Stage {stage} was skipped because stage {dependency} failed.'
+        super().__init__(self.message)
+
+async def run_graph(graph):
+    """
+    Runs a task graph, starting every stage as soon as all of the stages it depends on have finished
+    :param graph: Dict with stage names as keys, and tuples of (list of names of the stages it depends on, async
+    function without arguments running the stage) as values
+    :return: results: Dict with stage names as keys, and the value returned by each stage, or the exception it raised,
+    as values
+    """
+    tasks = {}
+
+    async def run_stage(name):
+        dependencies, stage = graph[name]
+        for dependency in dependencies:
+            try:
+                await tasks[dependency]
+            except Exception:
+                raise DependencyFailedError(name, dependency)
+        return await stage()
+
+    # Every task is created before any of them runs, so dependencies can always be looked up
+    for name in graph.keys():
+        tasks[name] = asyncio.ensure_future(run_stage(name))
+    results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    return dict(zip(tasks.keys(), results))
+
+def network_graph(aiomeraki, net_id, plan, semaphore):
+    """
+    Builds the task graph of the sync stages of a network. Quality Profile assignment depends on Quality Profile
+    creation, Wireless Profile assignment depends on Wireless Profile creation, and RTSP depends on neither.
+    :param aiomeraki: Async Dashboard API client
+    :param net_id: ID of target network
+    :param plan: Dict with the changes to the network, as returned by plan_functions.plan_network
+    :param semaphore: asyncio.Semaphore shared by every network, capping concurrent requests
+    :return: graph: Task graph to be run by run_graph
+    """
+    # Profile stages return the name to ID registry of the network, which the assignment stages depending on them
+    # use to resolve the tags of the cameras
+    registries = {}
+
+    async def wireless_profiles():
+        registries['wireless_profiles'] = await write_functions.async_cam_wireless_profiles(
+            aiomeraki, net_id, plan['create_wp'], plan['update_wp'], plan['net_wp'], semaphore)
+
+    async def quality_profiles():
+        registries['quality_profiles'] = await write_functions.async_cam_quality_profiles(
+            aiomeraki, net_id, plan['create_qp'], plan['update_qp'], plan['net_qp'], semaphore)
+
+    async def qp_assignment():
+        qp_device_list = plan_functions.resolve_qp_ids(plan['qp_assignments'], registries['quality_profiles'])
+        return await write_functions.update_cameras(
+            aiomeraki, qp_device_list, write_functions.update_camera_quality_profile, semaphore)
+
+    async def wp_assignment():
+        wp_device_list = plan_functions.resolve_wp_ids(plan['wp_assignments'], registries['wireless_profiles'])
+        return await write_functions.update_cameras(
+            aiomeraki, wp_device_list, write_functions.update_camera_wireless_profiles, semaphore)
+
+    async def rtsp_settings():
+        return await write_functions.update_cameras(
+            aiomeraki, plan['rtsp_assignments'], write_functions.update_camera_rtsp, semaphore)
+
+    def timed(name, stage):
+        # Stages are timed per network, their totals overlap as networks run concurrently
+        async def timed_stage():
+            with profiler.phase(name, net_id):
+                return await stage()
+        return timed_stage
+
+    graph = {
+        "wireless_profiles": ([], timed("wireless_profiles", wireless_profiles)),
+        "quality_profiles": ([], timed("quality_profiles", quality_profiles)),
+        "qp_assignment": (["quality_profiles"], timed("qp_assignment", qp_assignment)),
+        "wp_assignment": (["wireless_profiles"], timed("wp_assignment", wp_assignment)),
+        "rtsp_settings": ([], timed("rtsp_settings", rtsp_settings)),
+    }
+    # Stages of modules disabled in config.modules are left out of the graph
+    return {name: stage for name, stage in graph.items() if STAGE_MODULES[name] in config.modules}
+
+def stage_status(result):
+    """
+    Summarizes the result of a stage for display
+    :param result: Value returned by the stage, or exception raised by it
+    :return: status: Short description of the result
+    """
+    if isinstance(result, Exception):
+        return f"failed: {result}"
+    elif isinstance(result, dict):
+        return f"{len(result['successes'])} ok, {len(result['failures'])} failed"
+    return "ok"
+
+async def run_networks(plans):
+    """
+    Runs the task graph of every target network concurrently, under a global budget of config.max_requests
+    concurrent requests
+    :param plans: Iterable of network plans, as returned by plan_functions.plan_network
+    :return: results: Dict with every target network as key, and the results of each of its stages as values
+    """
+    plans = {plan['networkId']: plan for plan in plans}
+
+    # Networks run concurrently, so instead of prompting per network, confirmation is asked once for the whole run
+    if config.supervised==True or config.verbose==True:
+        summary = [{
+            "network": key,
+            "wireless_profiles_to_create": len(plan['create_wp']),
+            "wireless_profiles_to_update": len(plan['update_wp']),
+            "quality_profiles_to_create": len(plan['create_qp']),
+            "quality_profiles_to_update": len(plan['update_qp']),
+            "cameras": plan['cameras'],
+        } for key, plan in plans.items()]
+        print("Script will sync the following Networks concurrently:")
+        print(report.table(summary))
+        for key, plan in plans.items():
+            changes = plan_functions.profile_change_rows({**plan['wp_changes'], **plan['qp_changes']})
+            if len(changes)>0:
+                print(f"Profile changes in Network {key}:")
+                print(report.table(changes))
+    if config.supervised==True:
+        proceed = input("Do you wish to proceed? (Y/N):")
+        if proceed=='N':
+            print("Skipping configuration of all networks. Aborting Script!")
+            return {}
+        elif proceed!='Y':
+            print("Unexpected Input! Aborting Script!")
+            return {}
+
+    aiomeraki = clients.aiomeraki()
+    semaphore = asyncio.Semaphore(config.max_requests)
+    with profiler.phase("apply"):
+        network_results = await asyncio.gather(
+            *[run_graph(network_graph(aiomeraki, key, plan, semaphore)) for key, plan in plans.items()])
+    results = dict(zip(plans.keys(), network_results))
+
+    print("Network sync results:")
+    print(report.table([{"network": key, **{stage: stage_status(result) for stage, result in stages.items()}}
+                        for key, stages in results.items()]))
+    for key, stages in results.items():
+        for stage, result in stages.items():
+            if isinstance(result, dict):
+                report.record_camera_results(stage, result, key)
+            elif isinstance(result, Exception):
+                report.record("apply", stage, None, "failed", key, detail=str(result))
+            if isinstance(result, dict) and len(result['failures'])>0:
+                print(f"Failed cameras in stage {stage} of network {key}:")
+                print(report.table(result['failures']))
+
+    return results
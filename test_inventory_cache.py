@@ -0,0 +1,45 @@
+import os
+import pytest
+import config
+import inventory_cache
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'cache_dir', str(tmp_path))
+    monkeypatch.setattr(config, 'cache_ttl', 600)
+    monkeypatch.setattr(config, 'cache_max_entries', 2)
+    return tmp_path
+
+def test_evict_keeps_the_most_recently_used_entries(cache_dir):
+    for number in range(3):
+        inventory_cache.put('getOrganizationNetworks', str(number), {}, [number])
+        path = inventory_cache.cache_path('getOrganizationNetworks', str(number), {})
+        os.utime(path, (1000 + number, 1000 + number))
+    inventory_cache.evict()
+
+    assert inventory_cache.get('getOrganizationNetworks', '0', {}) is None
+    assert inventory_cache.get('getOrganizationNetworks', '2', {})==[2]
+
+def test_evict_skips_entries_removed_by_another_process(cache_dir, monkeypatch):
+    monkeypatch.setattr(config, 'cache_max_entries', 5)
+    for number in range(3):
+        inventory_cache.put('getOrganizationNetworks', str(number), {}, [number])
+    vanished = inventory_cache.cache_path('getOrganizationNetworks', '1', {})
+    getmtime = os.path.getmtime
+
+    def removed_by_another_process(path):
+        if path==vanished:
+            os.remove(path)
+        return getmtime(path)
+
+    monkeypatch.setattr(os.path, 'getmtime', removed_by_another_process)
+    inventory_cache.evict()
+
+    assert sorted(os.listdir(cache_dir))==sorted(os.path.basename(inventory_cache.cache_path(
+        'getOrganizationNetworks', number, {})) for number in ('0', '2'))
+
+def test_put_leaves_no_temporary_file(cache_dir):
+    inventory_cache.put('getOrganizationDevices', '1', {"model": 'MV'}, [{"serial": "Q2MV-0000-0001"}])
+
+    assert [name for name in os.listdir(cache_dir) if name.endswith('.tmp')]==[]
+    assert inventory_cache.get('getOrganizationDevices', '1', {"model": 'MV'})==[{"serial": "Q2MV-0000-0001"}]
@@ -0,0 +1,100 @@
+import pytest
+import journal
+
+@pytest.fixture
+def journal_path(tmp_path):
+    yield str(tmp_path / 'run_journal.jsonl')
+    journal.close_journal()
+
+def plan(**changes):
+    return {
+        "networkId": "L_1",
+        "cameras": 2,
+        "net_wp": [],
+        "net_qp": [{"name": "qp-1-old", "id": "10"}],
+        "create_wp": [{"name": "wp-1-ssid1"}],
+        "update_wp": [],
+        "create_qp": [{"name": "qp-2-new"}],
+        "update_qp": [{"name": "qp-1-old", "id": "10"}],
+        "wp_changes": {},
+        "qp_changes": {"qp-1-old": {"maxRetentionDays": [7, 30]}},
+        "qp_assignments": [{"serial": "Q2MV-0000-0001", "quality_profile_name": "qp-2-new"}],
+        "wp_assignments": [{"serial": "Q2MV-0000-0001",
+                            "wireless_profile_names": {"primary": "wp-1-ssid1", "secondary": "wp-2-ssid2"}}],
+        "rtsp_assignments": [{"serial": "Q2MV-0000-0002"}],
+        **changes,
+    }
+
+def interrupted_run(path, record):
+    """ Journals the steps of a run, then resumes from its journal. """
+    journal.open_journal(path)
+    record()
+    journal.close_journal()
+    return journal.open_journal(path, resume=True)
+
+def test_skip_completed_passes_plans_through_without_a_journal():
+    assert list(journal.skip_completed([plan()]))==[plan()]
+
+def test_skip_completed_leaves_out_created_profiles_and_keeps_their_ids(journal_path):
+    interrupted_run(journal_path, lambda: journal.record_profile(
+        "quality_profiles", "create", "L_1", {"name": "qp-2-new", "id": "20"}))
+
+    resumed, = journal.skip_completed([plan()])
+
+    assert resumed['create_qp']==[]
+    assert resumed['net_qp']==[{"name": "qp-1-old", "id": "10"}, {"name": "qp-2-new", "id": "20"}]
+    assert resumed['create_wp']==[{"name": "wp-1-ssid1"}]
+
+def test_skip_completed_leaves_out_updated_profiles_and_their_changes(journal_path):
+    interrupted_run(journal_path, lambda: journal.record_profile(
+        "quality_profiles", "update", "L_1", {"name": "qp-1-old", "id": "10"}))
+
+    resumed, = journal.skip_completed([plan()])
+
+    assert (resumed['update_qp'], resumed['qp_changes'])==([], {})
+
+def test_skip_completed_only_matches_profiles_of_the_same_network(journal_path):
+    interrupted_run(journal_path, lambda: journal.record_profile(
+        "quality_profiles", "create", "L_2", {"name": "qp-2-new", "id": "20"}))
+
+    resumed, = journal.skip_completed([plan()])
+
+    assert resumed['create_qp']==[{"name": "qp-2-new"}]
+
+def test_skip_completed_leaves_out_camera_assignments_of_the_same_target(journal_path):
+    cameras = plan()
+    def record():
+        journal.record_camera("qp_assignment", cameras['qp_assignments'][0])
+        journal.record_camera("wp_assignment", cameras['wp_assignments'][0])
+        journal.record_camera("rtsp_settings", cameras['rtsp_assignments'][0])
+    interrupted_run(journal_path, record)
+
+    resumed, = journal.skip_completed([plan()])
+
+    assert (resumed['qp_assignments'], resumed['wp_assignments'], resumed['rtsp_assignments'])==([], [], [])
+
+def test_skip_completed_keeps_camera_assignments_whose_target_changed(journal_path):
+    interrupted_run(journal_path, lambda: journal.record_camera(
+        "qp_assignment", {"serial": "Q2MV-0000-0001", "quality_profile_name": "qp-1-old"}))
+
+    resumed, = journal.skip_completed([plan()])
+
+    assert resumed['qp_assignments']==plan()['qp_assignments']
+
+def test_resumed_journal_skips_a_line_cut_short(journal_path):
+    journal.open_journal(journal_path)
+    journal.record_camera("rtsp_settings", {"serial": "Q2MV-0000-0002"})
+    journal.close_journal()
+    with open(journal_path, 'a', encoding='utf-8') as journal_file:
+        journal_file.write('{"time": 1, "kind": "qp_assi')
+
+    assert journal.open_journal(journal_path, resume=True)==1
+
+def test_new_journal_forgets_the_steps_of_the_last_run(journal_path):
+    steps = interrupted_run(journal_path, lambda: journal.record_camera("rtsp_settings", {"serial": "Q2MV-0000-0002"}))
+    journal.close_journal()
+
+    assert steps==1
+    assert journal.open_journal(journal_path)==0
+    resumed, = journal.skip_completed([plan()])
+    assert resumed['rtsp_assignments']==[{"serial": "Q2MV-0000-0002"}]
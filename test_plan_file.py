@@ -0,0 +1,23 @@
+import pytest
+import config
+import plan_file
+
+@pytest.fixture
+def plan_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'src_org_id', '100')
+    monkeypatch.setattr(config, 'dst_org_id', '200')
+    monkeypatch.setattr(config, 'src_net_id', 'L_1')
+    path = str(tmp_path / 'plan.jsonl.gz')
+    plan_file.write_plan(path, [{"networkId": "L_2"}, {"networkId": "L_3"}])
+    return path
+
+def test_read_plan_streams_the_plans_written(plan_path):
+    assert list(plan_file.read_plan(plan_path))==[{"networkId": "L_2"}, {"networkId": "L_3"}]
+
+@pytest.mark.parametrize('setting', ['dst_org_id', 'src_net_id'])
+def test_read_plan_rejects_a_plan_for_another_organization_or_network(plan_path, monkeypatch, setting):
+    monkeypatch.setattr(config, setting, 'other')
+
+    # Raised before the first plan is read, so nothing is journaled or applied
+    with pytest.raises(ValueError, match=setting):
+        plan_file.read_plan(plan_path)
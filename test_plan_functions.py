@@ -0,0 +1,141 @@
+import config
+import plan_functions
+
+def camera(qp=None, wp=None, rtsp=False, state=None):
+    return {"name": "Camera", "serial": "Q2MV-0000-0001", "lanIp": "10.0.0.1", "qp": qp, "wp": wp, "rtsp": rtsp,
+            "state": state or {}}
+
+def device(tags, serial="Q2MV-0000-0001", network="L_1"):
+    return {"name": "Camera", "serial": serial, "lanIp": "10.0.0.1", "networkId": network, "tags": tags}
+
+def test_qp_device_list_assigns_unassigned_camera_a_profile_to_be_created():
+    # The profile has no ID until it is created, and the camera has no profile, so neither has an ID
+    cameras = [camera(qp=1, state={"quality": {"profileId": None}})]
+
+    devices = plan_functions.qp_device_list(cameras, {"qp-1-highdef": None})
+
+    assert devices==[{"name": "Camera", "serial": "Q2MV-0000-0001", "quality_profile_name": "qp-1-highdef",
+                      "quality_profile_id": None}]
+
+def test_qp_device_list_skips_camera_already_assigned_its_profile():
+    cameras = [camera(qp=1, state={"quality": {"profileId": "42"}})]
+
+    assert plan_functions.qp_device_list(cameras, {"qp-1-highdef": "42"})==[]
+
+def test_qp_device_list_assigns_camera_with_another_profile():
+    cameras = [camera(qp=1, state={"quality": {"profileId": "7"}})]
+
+    assert len(plan_functions.qp_device_list(cameras, {"qp-1-highdef": "42"}))==1
+
+def test_wp_device_list_assigns_unassigned_camera_profiles_to_be_created():
+    cameras = [camera(wp=[1, 2], state={"wireless": {"ids": {"primary": None, "secondary": None, "backup": None}}})]
+
+    devices = plan_functions.wp_device_list(cameras, {"wp-1-ssid1": None, "wp-2-ssid2": None})
+
+    assert [device['wireless_profile_names'] for device in devices]==[{"primary": "wp-1-ssid1",
+                                                                        "secondary": "wp-2-ssid2"}]
+
+def test_rtsp_device_list_skips_camera_with_rtsp_enabled():
+    cameras = [camera(rtsp=True, state={"video": {"externalRtspEnabled": True}}), camera(rtsp=True)]
+
+    assert len(plan_functions.rtsp_device_list(cameras))==1
+
+def test_profile_index_indexes_profiles_by_number():
+    index = plan_functions.profile_index({"qp-1-highdef": "11", "qp-2-lowdef": "12", "wp-1-ssid1": "21"}, 'qp')
+
+    assert index=={1: ("qp-1-highdef", "11"), 2: ("qp-2-lowdef", "12")}
+
+def test_profile_index_ignores_names_without_a_number():
+    index = plan_functions.profile_index({"qp-highdef": "11", "qp": "12", "myqp-1-x": "13", "qp-3": "14"}, 'qp')
+
+    assert index=={3: ("qp-3", "14")}
+
+def test_profile_index_maps_ambiguous_numbers_to_none():
+    index = plan_functions.profile_index({"qp-1-highdef": "11", "qp-1-lowdef": "12", "qp-2-x": "13"}, 'qp')
+
+    assert index=={1: None, 2: ("qp-2-x", "13")}
+
+def test_qp_device_list_skips_cameras_with_an_ambiguous_number():
+    cameras = [camera(qp=1)]
+
+    assert plan_functions.qp_device_list(cameras, {"qp-1-highdef": "11", "qp-1-lowdef": "12"})==[]
+
+def test_parse_device_parses_qp_wp_and_rtsp_tags():
+    parsed = plan_functions.parse_device(device(["camProfiler", "qp-2", "wp-3-1", config.rtsp_enable_tag]))
+
+    assert (parsed['qp'], parsed['wp'], parsed['rtsp'], parsed['state'])==(2, [3, 1], True, {})
+
+def test_parse_device_keeps_the_state_read_from_the_camera():
+    dev = dict(device(["qp-1"]), camera_state={"quality": {"profileId": "11"}})
+
+    assert plan_functions.parse_device(dev)['state']=={"quality": {"profileId": "11"}}
+
+def test_parse_device_rejects_malformed_qp_tags():
+    assert plan_functions.parse_device(device(["qp-1", "qp-2"]))['qp'] is None
+    assert plan_functions.parse_device(device(["qp-x"]))['qp'] is None
+    assert plan_functions.parse_device(device(["qp-1-2"]))['qp'] is None
+
+def test_parse_device_rejects_malformed_wp_tags():
+    for tags in (["wp-1-2", "wp-2-1"], ["wp-1-x"], ["wp-1"], ["wp-1-2-3-4"], ["wp-1-1"]):
+        assert plan_functions.parse_device(device(tags))['wp'] is None, tags
+    assert plan_functions.parse_device(device(["wp-1-2-3"]))['wp']==[1, 2, 3]
+
+def test_parse_device_without_tags():
+    parsed = plan_functions.parse_device(device([]))
+
+    assert (parsed['qp'], parsed['wp'], parsed['rtsp'])==(None, None, False)
+
+def test_partition_devices_buckets_parsed_cameras_by_network():
+    devices = [device(["qp-1"], "Q2MV-0000-0001", "L_1"), device(["qp-2"], "Q2MV-0000-0002", "L_2"),
+               device(["qp-3"], "Q2MV-0000-0003", "L_1")]
+
+    partitioned = plan_functions.partition_devices(devices)
+
+    assert {net: [(cam['serial'], cam['qp']) for cam in cams] for net, cams in partitioned.items()}=={
+        "L_1": [("Q2MV-0000-0001", 1), ("Q2MV-0000-0003", 3)],
+        "L_2": [("Q2MV-0000-0002", 2)],
+    }
+
+def test_partition_devices_of_no_devices():
+    assert plan_functions.partition_devices([])=={}
+
+def test_profile_diff_of_matching_profiles_is_empty():
+    src = {"id": "1", "networkId": "L_1", "name": "qp-1-x", "maxRetentionDays": 30}
+    net = {"id": "9", "networkId": "L_9", "name": "qp-1-x", "maxRetentionDays": 30}
+
+    assert plan_functions.profile_diff(src, net)=={}
+
+def test_profile_diff_reports_nested_fields_by_dotted_path():
+    src = {"name": "qp-1-x", "videoSettings": {"MV12": {"quality": "High", "resolution": "1920x1080"}}}
+    net = {"name": "qp-1-x", "videoSettings": {"MV12": {"quality": "Standard", "resolution": "1920x1080"}}}
+
+    assert plan_functions.profile_diff(src, net)=={"videoSettings.MV12.quality": ("Standard", "High")}
+
+def test_profile_diff_reports_fields_missing_from_the_network_profile():
+    src = {"name": "qp-1-x", "audioRecordingEnabled": True, "videoSettings": {"MV12": {"quality": "High"}}}
+    net = {"name": "qp-1-x"}
+
+    assert plan_functions.profile_diff(src, net)=={"audioRecordingEnabled": (None, True),
+                                                  "videoSettings": (None, {"MV12": {"quality": "High"}})}
+
+def test_profile_diff_ignores_fields_only_the_network_profile_has():
+    assert plan_functions.profile_diff({"name": "qp-1-x"}, {"name": "qp-1-x", "extra": 1})=={}
+
+def test_profile_diff_only_ignores_ids_at_the_top_level():
+    src = {"name": "wp-1-x", "ssid": {"id": "a"}}
+    net = {"name": "wp-1-x", "ssid": {"id": "b"}}
+
+    assert plan_functions.profile_diff(src, net)=={"ssid.id": ("b", "a")}
+
+def test_plan_profiles_creates_missing_and_updates_changed_profiles():
+    src = [{"id": "1", "name": "qp-1-x", "maxRetentionDays": 30}, {"id": "2", "name": "qp-2-y", "maxRetentionDays": 7},
+           {"id": "3", "name": "qp-3-z", "maxRetentionDays": 1}]
+    net = [{"id": "8", "name": "qp-1-x", "maxRetentionDays": 30}, {"id": "9", "name": "qp-2-y", "maxRetentionDays": 1}]
+
+    create, update, changes = plan_functions.plan_profiles(src, net)
+
+    assert [prof['name'] for prof in create]==["qp-3-z"]
+    assert update==[{"id": "9", "name": "qp-2-y", "maxRetentionDays": 7}]
+    assert changes=={"qp-2-y": {"maxRetentionDays": (1, 7)}}
+    # The source profiles are shared by every network, so updates are copies
+    assert src[1]['id']=="2"
@@ -0,0 +1,58 @@
+import asyncio
+import meraki
+import config
+import read_functions
+
+class Camera:
+    """ Stands in for the camera endpoints of the async client, failing the reads listed in fail. """
+
+    def __init__(self, fail=()):
+        self.fail = fail
+        self.in_flight = 0
+        self.most_in_flight = 0
+
+    async def read(self, setting, result):
+        self.in_flight += 1
+        self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        await asyncio.sleep(0)
+        self.in_flight -= 1
+        if setting in self.fail:
+            raise meraki.AsyncAPIError({"tags": ["camera"], "operation": setting}, None, "Internal server error")
+        return result
+
+    def getDeviceCameraQualityAndRetention(self, serial):
+        return self.read('quality', {"profileId": "11"})
+
+    def getDeviceCameraWirelessProfiles(self, serial):
+        return self.read('wireless', {"ids": {"primary": "21"}})
+
+    def getDeviceCameraVideoSettings(self, serial):
+        return self.read('video', {"externalRtspEnabled": True})
+
+class Client:
+    def __init__(self, camera):
+        self.camera = camera
+
+device = {"serial": "Q2MV-0000-0001", "tags": ["qp-1", "wp-1-2", config.rtsp_enable_tag]}
+
+def test_get_device_camera_state_reads_every_setting_concurrently():
+    camera = Camera()
+
+    serial, state = asyncio.run(read_functions.get_device_camera_state(Client(camera), device))
+
+    assert serial=="Q2MV-0000-0001"
+    assert state=={"quality": {"profileId": "11"}, "wireless": {"ids": {"primary": "21"}},
+                   "video": {"externalRtspEnabled": True}}
+    assert camera.most_in_flight==3
+
+def test_get_device_camera_state_keeps_the_settings_read_when_one_read_fails():
+    serial, state = asyncio.run(read_functions.get_device_camera_state(Client(Camera(fail=('quality',))), device))
+
+    assert state=={"wireless": {"ids": {"primary": "21"}}, "video": {"externalRtspEnabled": True}}
+
+def test_get_device_camera_state_only_reads_enabled_modules(monkeypatch):
+    monkeypatch.setattr(config, 'modules', ['rtsp_settings'])
+
+    serial, state = asyncio.run(read_functions.get_device_camera_state(Client(Camera()), device))
+
+    assert state=={"video": {"externalRtspEnabled": True}}
@@ -0,0 +1,17 @@
+import json
+import report
+
+def test_camera_records_take_the_network_of_their_planned_records(tmp_path):
+    path = str(tmp_path / 'report.jsonl')
+    report.open_report(path)
+    try:
+        report.record("plan", "qp_assignment", "assign", "planned", "L_1", "Q2MV-0000-0001", "qp-1-x")
+        report.record_camera_results("qp_assignment", {"successes": [{"serial": "Q2MV-0000-0001"}],
+                                                       "failures": [{"serial": "Q2MV-0000-0002", "error": "404"}]})
+    finally:
+        report.close_report()
+
+    with open(path, encoding='utf-8') as report_file:
+        records = [json.loads(line) for line in report_file]
+    assert [(record['phase'], record['serial'], record['network']) for record in records]==[
+        ("plan", "Q2MV-0000-0001", "L_1"), ("apply", "Q2MV-0000-0001", "L_1"), ("apply", "Q2MV-0000-0002", None)]
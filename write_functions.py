@@ -1,22 +1,28 @@
-import time
+import asyncio
 import config
-import pandas as pd
-from tabulate import tabulate
+import meraki
+import clients
+import batch_helper
+import report
+import journal
 
-def cam_wireless_profiles(dashboard, dst_net_id, create_wp, update_wp):
+def cam_wireless_profiles(dashboard, dst_net_id, create_wp, update_wp, net_wp=()):
     """
     Copies port schedules from source template to target network
     :param dashboard: Dashboard API client instance
     :param dst_net_id: ID of target network
     :param create_wp: Wireless Profiles to be created in target network
     :param update_wp: Wireless Profiles to be updated in target network
-    :return:
+    :param net_wp: Wireless Profiles currently in target network
+    :return: registry: Dict with the names of the Wireless Profiles in the target network as keys, and their IDs as
+    values, built from the existing profiles and the responses to the create and update calls
     """
+    registry = {prof['name']: prof['id'] for prof in net_wp}
     if config.supervised==True:
         print("Script will create the following Wireless Profiles:")
-        print(tabulate(pd.DataFrame(create_wp), headers='keys', tablefmt='fancy_grid'))
+        print(report.table(create_wp))
         print("Script will update the following Wireless Profiles:")
-        print(tabulate(pd.DataFrame(update_wp), headers='keys', tablefmt='fancy_grid'))
+        print(report.table(update_wp))
         proceed = input("Do you wish to proceed? (Y/N):")
         if proceed == 'Y':
             for cwp in create_wp:
@@ -25,11 +31,14 @@ def cam_wireless_profiles(dashboard, dst_net_id, create_wp, update_wp):
                     "networkId",
                     "name"
                 }}
-                dashboard.camera.createNetworkCameraWirelessProfile(
+                response = dashboard.camera.createNetworkCameraWirelessProfile(
                     networkId=dst_net_id,
                     name=cwp['name'],
                     **upd,
                 )
+                registry[response['name']] = response['id']
+                report.record("apply", "wireless_profiles", "create", "ok", dst_net_id, target=response['name'])
+                journal.record_profile("wireless_profiles", "create", dst_net_id, response)
             for uwp in update_wp:
                 wp_id = uwp['id']
                 upd = {k: uwp[k] for k in uwp.keys() - {
@@ -37,11 +46,14 @@ def cam_wireless_profiles(dashboard, dst_net_id, create_wp, update_wp):
                     "networkId",
                     "name"
                 }}
-                dashboard.camera.updateNetworkCameraWirelessProfile(
+                response = dashboard.camera.updateNetworkCameraWirelessProfile(
                     networkId=dst_net_id,
                     wirelessProfileId=wp_id,
                     **upd,
                 )
+                registry[response['name']] = response['id']
+                report.record("apply", "wireless_profiles", "update", "ok", dst_net_id, target=response['name'])
+                journal.record_profile("wireless_profiles", "update", dst_net_id, response)
         elif proceed=='N':
             print("Skipping configuration of Wireless Profiles can cause conflicts with camera configurations! Aborting Script!")
             exit()
@@ -55,11 +67,14 @@ def cam_wireless_profiles(dashboard, dst_net_id, create_wp, update_wp):
                 "networkId",
                 "name"
             }}
-            dashboard.camera.createNetworkCameraWirelessProfile(
+            response = dashboard.camera.createNetworkCameraWirelessProfile(
                 networkId=dst_net_id,
                 name=cwp['name'],
                 **upd,
             )
+            registry[response['name']] = response['id']
+            report.record("apply", "wireless_profiles", "create", "ok", dst_net_id, target=response['name'])
+            journal.record_profile("wireless_profiles", "create", dst_net_id, response)
         for uwp in update_wp:
             wp_id = uwp['id']
             upd = {k: uwp[k] for k in uwp.keys() - {
@@ -67,26 +82,33 @@ def cam_wireless_profiles(dashboard, dst_net_id, create_wp, update_wp):
                 "networkId",
                 "name"
             }}
-            dashboard.camera.updateNetworkCameraWirelessProfile(
+            response = dashboard.camera.updateNetworkCameraWirelessProfile(
                 networkId=dst_net_id,
                 wirelessProfileId=wp_id,
                 **upd,
             )
+            registry[response['name']] = response['id']
+            report.record("apply", "wireless_profiles", "update", "ok", dst_net_id, target=response['name'])
+            journal.record_profile("wireless_profiles", "update", dst_net_id, response)
+    return registry
 
-def cam_quality_profiles(dashboard, dst_net_id, create_qp, update_qp):
+def cam_quality_profiles(dashboard, dst_net_id, create_qp, update_qp, net_qp=()):
     """
     Copies port schedules from source template to target network
     :param dashboard: Dashboard API client instance
     :param dst_net_id: ID of target network
     :param create_qp: Quality Profiles to be created in target network
     :param update_qp: Quality Profiles to be updated in target network
-    :return:
+    :param net_qp: Quality Profiles currently in target network
+    :return: registry: Dict with the names of the Quality Profiles in the target network as keys, and their IDs as
+    values, built from the existing profiles and the responses to the create and update calls
     """
+    registry = {prof['name']: prof['id'] for prof in net_qp}
     if config.supervised==True:
         print("Script will create the following Wireless Profiles:")
-        print(tabulate(pd.DataFrame(create_qp), headers='keys', tablefmt='fancy_grid'))
+        print(report.table(create_qp))
         print("Script will update the following Wireless Profiles:")
-        print(tabulate(pd.DataFrame(update_qp), headers='keys', tablefmt='fancy_grid'))
+        print(report.table(update_qp))
         proceed = input("Do you wish to proceed? (Y/N):")
         if proceed == 'Y':
             for cqp in create_qp:
@@ -95,11 +117,14 @@ def cam_quality_profiles(dashboard, dst_net_id, create_qp, update_qp):
                     "networkId",
                     "name"
                 }}
-                dashboard.camera.createNetworkCameraQualityRetentionProfile(
+                response = dashboard.camera.createNetworkCameraQualityRetentionProfile(
                     networkId=dst_net_id,
                     name=cqp['name'],
                     **upd,
                 )
+                registry[response['name']] = response['id']
+                report.record("apply", "quality_profiles", "create", "ok", dst_net_id, target=response['name'])
+                journal.record_profile("quality_profiles", "create", dst_net_id, response)
             for uqp in update_qp:
                 qp_id = uqp['id']
                 upd = {k: uqp[k] for k in uqp.keys() - {
@@ -107,11 +132,14 @@ def cam_quality_profiles(dashboard, dst_net_id, create_qp, update_qp):
                     "networkId",
                     "name"
                 }}
-                dashboard.camera.updateNetworkCameraQualityRetentionProfile(
+                response = dashboard.camera.updateNetworkCameraQualityRetentionProfile(
                     networkId=dst_net_id,
                     qualityRetentionProfileId=qp_id,
                     **upd,
                 )
+                registry[response['name']] = response['id']
+                report.record("apply", "quality_profiles", "update", "ok", dst_net_id, target=response['name'])
+                journal.record_profile("quality_profiles", "update", dst_net_id, response)
         elif proceed=='N':
             print("Skipping configuration of Wireless Profiles can cause conflicts with camera configurations! Aborting Script!")
             exit()
@@ -125,11 +153,14 @@ def cam_quality_profiles(dashboard, dst_net_id, create_qp, update_qp):
                 "networkId",
                 "name"
             }}
-            dashboard.camera.createNetworkCameraQualityRetentionProfile(
+            response = dashboard.camera.createNetworkCameraQualityRetentionProfile(
                 networkId=dst_net_id,
                 name=cqp['name'],
                 **upd,
             )
+            registry[response['name']] = response['id']
+            report.record("apply", "quality_profiles", "create", "ok", dst_net_id, target=response['name'])
+            journal.record_profile("quality_profiles", "create", dst_net_id, response)
         for uqp in update_qp:
             qp_id = uqp['id']
             upd = {k: uqp[k] for k in uqp.keys() - {
@@ -137,11 +168,15 @@ def cam_quality_profiles(dashboard, dst_net_id, create_qp, update_qp):
                 "networkId",
                 "name"
             }}
-            dashboard.camera.updateNetworkCameraQualityRetentionProfile(
+            response = dashboard.camera.updateNetworkCameraQualityRetentionProfile(
                 networkId=dst_net_id,
                 qualityRetentionProfileId=qp_id,
                 **upd,
             )
+            registry[response['name']] = response['id']
+            report.record("apply", "quality_profiles", "update", "ok", dst_net_id, target=response['name'])
+            journal.record_profile("quality_profiles", "update", dst_net_id, response)
+    return registry
 
 def cam_qp_assigner(dashboard, qp_device_list):
     """
@@ -152,7 +187,7 @@ def cam_qp_assigner(dashboard, qp_device_list):
     """
     if config.supervised==True:
         print("Script will assign Quality Profiles to the following Cameras:")
-        print(tabulate(pd.DataFrame(qp_device_list), headers='keys', tablefmt='fancy_grid'))
+        print(report.table(qp_device_list))
         proceed = input("Do you wish to proceed? (Y/N):")
         if proceed == 'Y':
             for camera in qp_device_list:
@@ -160,6 +195,8 @@ def cam_qp_assigner(dashboard, qp_device_list):
                     serial=camera['serial'],
                     profileId=camera['quality_profile_id']
                 )
+                report.record("apply", "qp_assignment", "assign", "ok", serial=camera['serial'])
+                journal.record_camera("qp_assignment", camera)
         elif proceed=='N':
             print("Skipping assignment of Quality Profiles for these cameras.")
         else:
@@ -167,12 +204,14 @@ def cam_qp_assigner(dashboard, qp_device_list):
     else:
         if config.verbose==True:
             print("Script will assign Quality Profiles to the following Cameras:")
-            print(tabulate(pd.DataFrame(qp_device_list), headers='keys', tablefmt='fancy_grid'))
+            print(report.table(qp_device_list))
         for camera in qp_device_list:
             dashboard.camera.updateDeviceCameraQualityAndRetention(
                 serial=camera['serial'],
                 profileId=camera['quality_profile_id']
             )
+            report.record("apply", "qp_assignment", "assign", "ok", serial=camera['serial'])
+            journal.record_camera("qp_assignment", camera)
 
 def cam_wp_assigner(dashboard, wp_device_list):
     """
@@ -183,7 +222,7 @@ def cam_wp_assigner(dashboard, wp_device_list):
     """
     if config.supervised==True:
         print("Script will assign Quality Profiles to the following Cameras:")
-        print(tabulate(pd.DataFrame(wp_device_list), headers='keys', tablefmt='fancy_grid'))
+        print(report.table(wp_device_list))
         proceed = input("Do you wish to proceed? (Y/N):")
         if proceed == 'Y':
             for camera in wp_device_list:
@@ -191,6 +230,8 @@ def cam_wp_assigner(dashboard, wp_device_list):
                     serial=camera['serial'],
                     ids=camera['wireless_profiles']
                 )
+                report.record("apply", "wp_assignment", "assign", "ok", serial=camera['serial'])
+                journal.record_camera("wp_assignment", camera)
         elif proceed=='N':
             print("Skipping assignment of Wireless Profiles for these cameras.")
         else:
@@ -198,12 +239,14 @@ def cam_wp_assigner(dashboard, wp_device_list):
     else:
         if config.verbose==True:
             print("Script will assign Wireless Profiles to the following Cameras:")
-            print(tabulate(pd.DataFrame(wp_device_list), headers='keys', tablefmt='fancy_grid'))
+            print(report.table(wp_device_list))
         for camera in wp_device_list:
             dashboard.camera.updateDeviceCameraWirelessProfiles(
                 serial=camera['serial'],
                 ids=camera['wireless_profiles']
             )
+            report.record("apply", "wp_assignment", "assign", "ok", serial=camera['serial'])
+            journal.record_camera("wp_assignment", camera)
 
 def cam_rtsp_enabler(dashboard, rtsp_device_list):
     """
@@ -214,14 +257,16 @@ def cam_rtsp_enabler(dashboard, rtsp_device_list):
     """
     if config.supervised==True:
         print("Script will activate RTSP in the following Cameras:")
-        print(tabulate(pd.DataFrame(rtsp_device_list), headers='keys', tablefmt='fancy_grid'))
+        print(report.table(rtsp_device_list))
         proceed = input("Do you wish to proceed? (Y/N):")
         if proceed == 'Y':
             for camera in rtsp_device_list:
                 dashboard.camera.updateDeviceCameraVideoSettings(
                     serial=camera['serial'],
-                    externalRstpEnabled=True
+                    externalRtspEnabled=True
                 )
+                report.record("apply", "rtsp_settings", "assign", "ok", serial=camera['serial'])
+                journal.record_camera("rtsp_settings", camera)
         elif proceed=='N':
             print("Skipping activation of RTSP for these cameras.")
         else:
@@ -229,45 +274,355 @@ def cam_rtsp_enabler(dashboard, rtsp_device_list):
     else:
         if config.verbose==True:
             print("Script will activate RTSP in the following Cameras:")
-            print(tabulate(pd.DataFrame(rtsp_device_list), headers='keys', tablefmt='fancy_grid'))
+            print(report.table(rtsp_device_list))
         for camera in rtsp_device_list:
             dashboard.camera.updateDeviceCameraVideoSettings(
                 serial=camera['serial'],
-                externalRstpEnabled=True
+                externalRtspEnabled=True
             )
+            report.record("apply", "rtsp_settings", "assign", "ok", serial=camera['serial'])
+            journal.record_camera("rtsp_settings", camera)
 
-def cam_batcher(dashboard, dst_org_id, actions):
+async def async_cam_wireless_profiles(aiomeraki, dst_net_id, create_wp, update_wp, net_wp=(), semaphore=None):
     """
-    Copies port schedules from source template to target network
+    Copies wireless profiles from source template to target network concurrently. Unlike cam_wireless_profiles, it
+    does not ask for confirmation, which is left to the caller
+    :param aiomeraki: Async Dashboard API client
+    :param dst_net_id: ID of target network
+    :param create_wp: Wireless Profiles to be created in target network
+    :param update_wp: Wireless Profiles to be updated in target network
+    :param net_wp: Wireless Profiles currently in target network
+    :param semaphore: asyncio.Semaphore capping concurrent requests, defaults to one sized by config.max_requests
+    :return: registry: Dict with the names of the Wireless Profiles in the target network as keys, and their IDs as
+    values, built from the existing profiles and the responses to the create and update calls
+    """
+    registry = {prof['name']: prof['id'] for prof in net_wp}
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(config.max_requests)
+
+    async def create(cwp):
+        upd = {k: cwp[k] for k in cwp.keys() - {
+            "id",
+            "networkId",
+            "name"
+        }}
+        async with semaphore:
+            response = await aiomeraki.camera.createNetworkCameraWirelessProfile(
+                networkId=dst_net_id,
+                name=cwp['name'],
+                **upd,
+            )
+            registry[response['name']] = response['id']
+            report.record("apply", "wireless_profiles", "create", "ok", dst_net_id, target=response['name'])
+            journal.record_profile("wireless_profiles", "create", dst_net_id, response)
+
+    async def update(uwp):
+        upd = {k: uwp[k] for k in uwp.keys() - {
+            "id",
+            "networkId",
+            "name"
+        }}
+        async with semaphore:
+            response = await aiomeraki.camera.updateNetworkCameraWirelessProfile(
+                networkId=dst_net_id,
+                wirelessProfileId=uwp['id'],
+                **upd,
+            )
+            registry[response['name']] = response['id']
+            report.record("apply", "wireless_profiles", "update", "ok", dst_net_id, target=response['name'])
+            journal.record_profile("wireless_profiles", "update", dst_net_id, response)
+
+    await asyncio.gather(*[create(cwp) for cwp in create_wp], *[update(uwp) for uwp in update_wp])
+    return registry
+
+async def async_cam_quality_profiles(aiomeraki, dst_net_id, create_qp, update_qp, net_qp=(), semaphore=None):
+    """
+    Copies quality profiles from source template to target network concurrently. Unlike cam_quality_profiles, it
+    does not ask for confirmation, which is left to the caller
+    :param aiomeraki: Async Dashboard API client
+    :param dst_net_id: ID of target network
+    :param create_qp: Quality Profiles to be created in target network
+    :param update_qp: Quality Profiles to be updated in target network
+    :param net_qp: Quality Profiles currently in target network
+    :param semaphore: asyncio.Semaphore capping concurrent requests, defaults to one sized by config.max_requests
+    :return: registry: Dict with the names of the Quality Profiles in the target network as keys, and their IDs as
+    values, built from the existing profiles and the responses to the create and update calls
+    """
+    registry = {prof['name']: prof['id'] for prof in net_qp}
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(config.max_requests)
+
+    async def create(cqp):
+        upd = {k: cqp[k] for k in cqp.keys() - {
+            "id",
+            "networkId",
+            "name"
+        }}
+        async with semaphore:
+            response = await aiomeraki.camera.createNetworkCameraQualityRetentionProfile(
+                networkId=dst_net_id,
+                name=cqp['name'],
+                **upd,
+            )
+            registry[response['name']] = response['id']
+            report.record("apply", "quality_profiles", "create", "ok", dst_net_id, target=response['name'])
+            journal.record_profile("quality_profiles", "create", dst_net_id, response)
+
+    async def update(uqp):
+        upd = {k: uqp[k] for k in uqp.keys() - {
+            "id",
+            "networkId",
+            "name"
+        }}
+        async with semaphore:
+            response = await aiomeraki.camera.updateNetworkCameraQualityRetentionProfile(
+                networkId=dst_net_id,
+                qualityRetentionProfileId=uqp['id'],
+                **upd,
+            )
+            registry[response['name']] = response['id']
+            report.record("apply", "quality_profiles", "update", "ok", dst_net_id, target=response['name'])
+            journal.record_profile("quality_profiles", "update", dst_net_id, response)
+
+    await asyncio.gather(*[create(cqp) for cqp in create_qp], *[update(uqp) for uqp in update_qp])
+    return registry
+
+async def update_cameras(aiomeraki, device_list, update, semaphore=None):
+    """
+    Runs one camera update per device concurrently, never exceeding the concurrency cap
+    :param aiomeraki: Async Dashboard API client
+    :param device_list: List of cameras to be updated, each containing at least its serial
+    :param update: Async function receiving the Async Dashboard API client and a camera, that applies the update
+    :param semaphore: asyncio.Semaphore capping concurrent updates, defaults to one sized by config.max_requests
+    :return: results: Dict with a list of cameras that were updated under "successes", and a list of cameras that
+    could not be updated along with their error under "failures"
+    """
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(config.max_requests)
+
+    async def update_camera(camera):
+        async with semaphore:
+            try:
+                await update(aiomeraki, camera)
+            except meraki.AsyncAPIError as e:
+                return camera, e
+        return camera, None
+
+    results = {"successes": [], "failures": []}
+    # Await and sort
+    for task in asyncio.as_completed([update_camera(camera) for camera in device_list]):
+        camera, error = await task
+        if error is None:
+            results["successes"].append(camera)
+        else:
+            results["failures"].append({"name": camera['name'], "serial": camera['serial'], "error": str(error)})
+
+    return results
+
+def print_camera_results(action, results):
+    """
+    Prints a summary of the results of an async camera update
+    :param action: Description of the update, used in the summary
+    :param results: Dict of successes and failures as returned by update_cameras
+    :return:
+    """
+    print(f"{action}: {len(results['successes'])} cameras updated, {len(results['failures'])} failed.")
+    if len(results['failures'])>0:
+        print(report.table(results['failures']))
+
+async def update_camera_quality_profile(aiomeraki, camera):
+    await aiomeraki.camera.updateDeviceCameraQualityAndRetention(
+        serial=camera['serial'],
+        profileId=camera['quality_profile_id']
+    )
+    journal.record_camera("qp_assignment", camera)
+
+async def update_camera_wireless_profiles(aiomeraki, camera):
+    await aiomeraki.camera.updateDeviceCameraWirelessProfiles(
+        serial=camera['serial'],
+        ids=camera['wireless_profiles']
+    )
+    journal.record_camera("wp_assignment", camera)
+
+async def update_camera_rtsp(aiomeraki, camera):
+    await aiomeraki.camera.updateDeviceCameraVideoSettings(
+        serial=camera['serial'],
+        externalRtspEnabled=True
+    )
+    journal.record_camera("rtsp_settings", camera)
+
+async def async_cam_qp_assigner(aiomeraki, qp_device_list, semaphore=None):
+    """
+    Assigns Quality Profiles to Cameras concurrently
+    :param aiomeraki: Async Dashboard API client
+    :param qp_device_list: List of cameras to be assigned quality profiles
+    :param semaphore: asyncio.Semaphore capping concurrent updates, defaults to one sized by config.max_requests
+    :return: results: Dict of successes and failures as returned by update_cameras
+    """
+    results = {"successes": [], "failures": []}
+    if config.supervised==True:
+        print("Script will assign Quality Profiles to the following Cameras:")
+        print(report.table(qp_device_list))
+        proceed = input("Do you wish to proceed? (Y/N):")
+        if proceed == 'Y':
+            results = await update_cameras(aiomeraki, qp_device_list, update_camera_quality_profile, semaphore)
+        elif proceed=='N':
+            print("Skipping assignment of Quality Profiles for these cameras.")
+        else:
+            print("Unexpected Input! Skipping assignment of Quality Profiles for these cameras!")
+    else:
+        if config.verbose==True:
+            print("Script will assign Quality Profiles to the following Cameras:")
+            print(report.table(qp_device_list))
+        results = await update_cameras(aiomeraki, qp_device_list, update_camera_quality_profile, semaphore)
+
+    print_camera_results("Quality Profile assignment", results)
+    report.record_camera_results("qp_assignment", results)
+    return results
+
+async def async_cam_wp_assigner(aiomeraki, wp_device_list, semaphore=None):
+    """
+    Assigns Wireless Profiles to Cameras concurrently
+    :param aiomeraki: Async Dashboard API client
+    :param wp_device_list: List of cameras to be assigned wireless profiles
+    :param semaphore: asyncio.Semaphore capping concurrent updates, defaults to one sized by config.max_requests
+    :return: results: Dict of successes and failures as returned by update_cameras
+    """
+    results = {"successes": [], "failures": []}
+    if config.supervised==True:
+        print("Script will assign Wireless Profiles to the following Cameras:")
+        print(report.table(wp_device_list))
+        proceed = input("Do you wish to proceed? (Y/N):")
+        if proceed == 'Y':
+            results = await update_cameras(aiomeraki, wp_device_list, update_camera_wireless_profiles, semaphore)
+        elif proceed=='N':
+            print("Skipping assignment of Wireless Profiles for these cameras.")
+        else:
+            print("Unexpected Input! Skipping assignment of Wireless Profiles for these cameras!")
+    else:
+        if config.verbose==True:
+            print("Script will assign Wireless Profiles to the following Cameras:")
+            print(report.table(wp_device_list))
+        results = await update_cameras(aiomeraki, wp_device_list, update_camera_wireless_profiles, semaphore)
+
+    print_camera_results("Wireless Profile assignment", results)
+    report.record_camera_results("wp_assignment", results)
+    return results
+
+async def async_cam_rtsp_enabler(aiomeraki, rtsp_device_list, semaphore=None):
+    """
+    Activates RTSP in cameras concurrently
+    :param aiomeraki: Async Dashboard API client
+    :param rtsp_device_list: List of cameras to have RTSP turned on
+    :param semaphore: asyncio.Semaphore capping concurrent updates, defaults to one sized by config.max_requests
+    :return: results: Dict of successes and failures as returned by update_cameras
+    """
+    results = {"successes": [], "failures": []}
+    if config.supervised==True:
+        print("Script will activate RTSP in the following Cameras:")
+        print(report.table(rtsp_device_list))
+        proceed = input("Do you wish to proceed? (Y/N):")
+        if proceed == 'Y':
+            results = await update_cameras(aiomeraki, rtsp_device_list, update_camera_rtsp, semaphore)
+        elif proceed=='N':
+            print("Skipping activation of RTSP for these cameras.")
+        else:
+            print("Unexpected Input! Skipping activation of RTSP for these cameras!")
+    else:
+        if config.verbose==True:
+            print("Script will activate RTSP in the following Cameras:")
+            print(report.table(rtsp_device_list))
+        results = await update_cameras(aiomeraki, rtsp_device_list, update_camera_rtsp, semaphore)
+
+    print_camera_results("RTSP activation", results)
+    report.record_camera_results("rtsp_settings", results)
+    return results
+
+def cam_batch_actions(dashboard, qp_device_list, wp_device_list, rtsp_device_list):
+    """
+    Builds the action batch actions for assigning profiles and RTSP settings to cameras
+    :param dashboard: Dashboard API client instance
+    :param qp_device_list: List of cameras to be assigned quality profiles
+    :param wp_device_list: List of cameras to be assigned wireless profiles
+    :param rtsp_device_list: List of cameras to have RTSP turned on
+    :return: actions: List of actions, one per camera and setting
+    """
+    actions = []
+    for camera in qp_device_list:
+        actions.append(dashboard.batch.camera.updateDeviceCameraQualityAndRetention(
+            serial=camera['serial'],
+            profileId=camera['quality_profile_id']
+        ))
+    for camera in wp_device_list:
+        actions.append(dashboard.batch.camera.updateDeviceCameraWirelessProfiles(
+            serial=camera['serial'],
+            ids=camera['wireless_profiles']
+        ))
+    for camera in rtsp_device_list:
+        actions.append(dashboard.batch.camera.updateDeviceCameraVideoSettings(
+            serial=camera['serial'],
+            externalRtspEnabled=True
+        ))
+    return actions
+
+def cam_batch_assigner(dashboard, dst_org_id, qp_device_list, wp_device_list, rtsp_device_list):
+    """
+    Assigns Quality Profiles, Wireless Profiles and RTSP settings to cameras through action batches of up to 100
+    actions each, submitted through the BatchHelper
     :param dashboard: Dashboard API client instance
     :param dst_org_id: ID of target organization
-    :param actions: list of actions to create the action batch
-    :return:
+    :param qp_device_list: List of cameras to be assigned quality profiles
+    :param wp_device_list: List of cameras to be assigned wireless profiles
+    :param rtsp_device_list: List of cameras to have RTSP turned on
+    :return: failed_actions: List of the actions that failed for good, with their errors and number of attempts
     """
-    for i in range(0, len(actions), 100):
-        if i>=4:
-            time.sleep(2)
-        # Check for unfinished batches
-        j = False
-        while not j:
-            print("Checking for unfinished batches...")
-            pending_batches = dashboard.organizations.getOrganizationActionBatches(dst_org_id, status='pending')
-            print("Current pending batches:",pending_batches)
-            if len(pending_batches) > 4:
-                j = False
-                print(f"You have {len(pending_batches)} unfinished batches:")
-                for item in pending_batches:
-                    print(item['id'])
-                print("Waiting to complete some of these before scheduling a new one!")
-                time.sleep(10)
-            elif len(pending_batches) <= 4:
-                j = True
-        subactions = actions[i:i + 100]
-        print("Creating Camera Settings Action Batch...")
-        dashboard.organizations.createOrganizationActionBatch(
-            organizationId=dst_org_id,
-            actions=subactions,
-            confirmed=True,
-            synchronous=False
-        )
-        time.sleep(1)
+    if config.supervised==True or config.verbose==True:
+        print("Script will assign Quality Profiles to the following Cameras:")
+        print(report.table(qp_device_list))
+        print("Script will assign Wireless Profiles to the following Cameras:")
+        print(report.table(wp_device_list))
+        print("Script will activate RTSP in the following Cameras:")
+        print(report.table(rtsp_device_list))
+    if config.supervised==True:
+        proceed = input("Do you wish to proceed? (Y/N):")
+        if proceed=='N':
+            print("Skipping assignment of profiles and RTSP settings for these cameras.")
+            return []
+        elif proceed!='Y':
+            print("Unexpected Input! Skipping assignment of profiles and RTSP settings for these cameras!")
+            return []
+
+    actions = cam_batch_actions(dashboard, qp_device_list, wp_device_list, rtsp_device_list)
+    if len(actions)==0:
+        print("No camera settings to assign.")
+        return []
+
+    # The async helper keeps every free action batch slot of the organization busy
+    helper = batch_helper.AsyncBatchHelper(
+        clients.aiomeraki(),
+        dst_org_id,
+        actions,
+        linear_new_batches=False,
+        actions_per_new_batch=batch_helper.MAX_ACTIONS_ASYNC
+    )
+    helper.prepare()
+    print(f"Submitting {len(actions)} camera actions in {len(helper.new_batches)} action batches...")
+    asyncio.get_event_loop().run_until_complete(helper.execute())
+
+    print(f'helper status is {helper.status}')
+
+    # Failed actions worth another try were already resubmitted by the helper, these failed for good
+    print(f"{len(helper.completed_actions)} camera actions applied, {len(helper.failed_actions)} failed.")
+    if len(helper.failed_actions)>0:
+        print("The following camera actions failed:")
+        print(report.table(report.failed_action_rows(helper.failed_actions)))
+    report.record_batch_actions(helper.completed_actions, helper.failed_actions)
+
+    # Actions are built in the order of the camera lists, which tells which camera each completed action assigned
+    cameras = [("qp_assignment", camera) for camera in qp_device_list] + \
+              [("wp_assignment", camera) for camera in wp_device_list] + \
+              [("rtsp_settings", camera) for camera in rtsp_device_list]
+    cameras_by_action = {id(action): camera for action, camera in zip(actions, cameras)}
+    for action in helper.completed_actions:
+        journal.record_camera(*cameras_by_action[id(action)])
+    return helper.failed_actions